@@ -0,0 +1,153 @@
+"""Báo cáo thời gian import và khởi động lạnh của API.
+
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --repeat 5 --output cold_start.json
+
+Mỗi lần đo chạy trong một tiến trình Python mới (không có gì nạp sẵn):
+  - import main: tổng thời gian và các module tốn nhất theo -X importtime
+  - khởi động tới lúc phục vụ được: import main, tải catalog (load_catalog với
+    inventory cố định từ file) và dựng chỉ mục của snapshot
+
+và so sánh các chế độ:
+  compiled -- thông số đọc từ file biên dịch (python spec_artifact.py)
+  csv      -- parse lại SPECS_CSV (không có file biên dịch)
+  eager    -- như csv nhưng import gspread/oauth2client ngay từ đầu (như trước khi import lười)
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+EAGER_IMPORTS = "import gspread\nfrom oauth2client.service_account import ServiceAccountCredentials\n"
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+{eager}import main
+from catalog import CatalogSnapshot
+imported = time.perf_counter()
+update = main.load_catalog()
+loaded = time.perf_counter()
+main.prepare_snapshot(CatalogSnapshot(1, update.specs_dfs))
+ready = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "load_ms": (loaded - imported) * 1000,
+    "prepare_ms": (ready - loaded) * 1000,
+    "ready_ms": (ready - started) * 1000,
+    "gspread_loaded": "gspread" in sys.modules,
+}}))
+"""
+
+
+def run_child(code: str, env: Dict[str, str], args: List[str] = ()) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args, "-c", code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True)
+
+
+def import_profile(env: Dict[str, str], top: int) -> Dict[str, Any]:
+    """Thời gian import main và các module cấp cao nhất tốn nhất (cumulative, ms)."""
+    stderr = run_child("import main", env, ["-X", "importtime"]).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        # Mức lồng nhau theo số khoảng trắng đầu tên; mức 1 là các import trực tiếp của main
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append((depth, name.strip(), int(cumulative) / 1000))
+    total = next((ms for depth, name, ms in modules if name == "main"), None)
+    direct = sorted(((name, ms) for depth, name, ms in modules if depth == 1), key=lambda x: -x[1])
+    return {
+        "main_ms": round(total, 1) if total is not None else None,
+        "top_imports_ms": {name: round(ms, 1) for name, ms in direct[:top]},
+    }
+
+
+def cold_start(env: Dict[str, str], eager: bool, repeat: int) -> Dict[str, Any]:
+    code = CHILD.format(eager=EAGER_IMPORTS if eager else "")
+    runs = [json.loads(run_child(code, env).stdout.strip().splitlines()[-1]) for _ in range(repeat)]
+    report = {key: round(float(np.median([r[key] for r in runs])), 1) for key in ("import_ms", "load_ms", "prepare_ms", "ready_ms")}
+    report["gspread_loaded"] = runs[-1]["gspread_loaded"]
+    return report
+
+
+def parse_timings(repeat: int) -> Dict[str, float]:
+    """parse_specs trong tiến trình hiện tại (đã import xong): parse CSV so với đọc file biên dịch."""
+    import time
+
+    from main import SPECS_CSV
+    from spec_artifact import compile_specs, load_specs, parse_spec_table
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "specs.rcs")
+        compile_specs(path, SPECS_CSV)
+        samples = {"csv_ms": [], "compiled_ms": []}
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for category, text in SPECS_CSV.items():
+                parse_spec_table(category, text)
+            samples["csv_ms"].append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            load_specs(path, SPECS_CSV)
+            samples["compiled_ms"].append((time.perf_counter() - started) * 1000)
+    return {key: round(float(np.median(values)), 3) for key, values in samples.items()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="số tiến trình mỗi chế độ (lấy trung vị)")
+    parser.add_argument("--top", type=int, default=10, help="số module tốn nhất được liệt kê")
+    parser.add_argument("--output", help="ghi báo cáo JSON ra file")
+    args = parser.parse_args()
+
+    import logging
+
+    logging.disable(logging.WARNING)
+    from main import SPECS_CSV
+    from spec_artifact import compile_specs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Inventory cố định: mọi model trong SPECS_CSV đều có hàng
+        inventory_path = os.path.join(tmp, "inventory.json")
+        models = [line.split(",", 1)[0] for text in SPECS_CSV.values() for line in text.splitlines()[1:]]
+        with open(inventory_path, "w", encoding="utf-8") as f:
+            json.dump([{"Model": m, "Price": "1000", "Colour": "Black", "Condition": "New", "Series": "", "Free Gift": ""} for m in models], f)
+        artifact_path = os.path.join(tmp, "specs.rcs")
+        compile_specs(artifact_path, SPECS_CSV)
+
+        base_env = {**os.environ, "INVENTORY_SOURCE": "file", "INVENTORY_FILE": inventory_path, "CATALOG_SNAPSHOT_PATH": "", "PYTHONWARNINGS": "ignore"}
+        base_env.pop("CATALOG_SHARED_DIR", None)
+        compiled_env = {**base_env, "SPECS_ARTIFACT_PATH": artifact_path}
+        csv_env = {**base_env, "SPECS_ARTIFACT_PATH": ""}
+
+        report = {
+            "meta": {"python": sys.version.split()[0], "repeat": args.repeat},
+            "imports": import_profile(compiled_env, args.top),
+            "parse_specs": parse_timings(max(args.repeat, 5)),
+            "cold_start": {
+                "compiled": cold_start(compiled_env, False, args.repeat),
+                "csv": cold_start(csv_env, False, args.repeat),
+                "eager": cold_start(csv_env, True, args.repeat),
+            },
+        }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,384 @@
+"""Load test đầu-cuối của FastAPI app: nhiều request /recommend đồng thời từ một bộ sinh tải asyncio.
+
+    python benchmarks/load_harness.py
+    python benchmarks/load_harness.py --workers 1 4 --concurrency 1 8 32 --requests 500 --output load.json
+    python benchmarks/load_harness.py --server uvicorn --workers 2 --rows 10000
+    python benchmarks/load_harness.py --mix cameras=4,lenses=2,gimbals=1 --unique 20 --compare load_baseline.json
+
+Google Sheets được thay bằng StubSheetSource: inventory cố định (mỗi model
+của catalog một dòng) trả về sau --sheet-latency giây như một lần gọi API.
+--rows dùng catalog tổng hợp (synthetic.py) thay cho SPECS_CSV.
+
+Cách chạy app:
+  inprocess -- app trong chính tiến trình này qua httpx.ASGITransport; workers
+               là số thread của WorkerPool (RECOMMEND_WORKERS)
+  uvicorn   -- uvicorn trên cổng local với workers tiến trình, mỗi tiến trình tự tải catalog
+
+Với mỗi cấu hình (workers x concurrency), app được khởi động lại từ đầu và đo:
+  cold  -- catalog chưa tải, concurrency request đến cùng lúc (stampede):
+           latency của đợt đầu và số lần gọi sheet (inprocess)
+  load  -- concurrency client đóng vòng (gửi tiếp khi nhận xong) trên hỗn hợp
+           traffic: RPS, p50/p95/p99, tỉ lệ lỗi theo mã HTTP, theo category
+  stall -- (inprocess) event loop thức dậy muộn bao lâu so với một nhịp
+           asyncio.sleep(--stall-interval), trong từng pha
+
+--compare so sánh RPS và latency (--metric) của từng cấu hình với baseline;
+chậm hơn --tolerance là regression, exit code 1.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from replay_traces import percentiles  # noqa: E402
+from sources import InventorySource  # noqa: E402
+from synthetic import base_specs, criteria_mix, synthetic_inventory, synthetic_specs  # noqa: E402
+
+DEFAULT_MIX = "cameras=4,lenses=3,drones=1,gimbals=1,action_cameras=1"
+
+
+class StubSheetSource(InventorySource):
+    """Thay GoogleSheetSource: trả các dòng cố định sau latency giây và đếm số lần được gọi."""
+
+    name = "stub-sheet"
+
+    def __init__(self, records: List[Dict[str, Any]], latency: float = 0.0):
+        self.records = records
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch_records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return [dict(r) for r in self.records]
+
+    def describe(self) -> str:
+        return f"{self.name} ({len(self.records)} rows, {self.latency}s)"
+
+
+def catalog_specs(rows: Optional[int], seed: int):
+    """Bảng thông số dùng cho lần chạy: SPECS_CSV hoặc catalog tổng hợp rows sản phẩm mỗi category."""
+    return synthetic_specs(rows, seed=seed) if rows else base_specs()
+
+
+def install_stub(rows: Optional[int], latency: float, seed: int) -> StubSheetSource:
+    """Cho main tải inventory từ StubSheetSource (và thông số tổng hợp nếu có rows)."""
+    import main
+
+    specs = catalog_specs(rows, seed)
+    source = StubSheetSource(synthetic_inventory(specs, seed=seed), latency)
+    main.inventory_source = source
+    if rows:
+        parse_specs = main.parse_specs
+        main.parse_specs = lambda specs_override=None: parse_specs(specs if specs_override is None else specs_override)
+    return source
+
+
+def stub_app():
+    """App factory cho uvicorn (--server uvicorn): cấu hình stub lấy từ biến môi trường."""
+    import logging
+
+    import main
+
+    logging.disable(logging.WARNING)
+    rows = int(os.environ.get("LOAD_HARNESS_ROWS", 0)) or None
+    install_stub(rows, float(os.environ.get("LOAD_HARNESS_SHEET_LATENCY", 0)), int(os.environ.get("LOAD_HARNESS_SEED", 0)))
+    return main.app
+
+
+def traffic(mix: Dict[str, float], rows: Optional[int], count: int, unique: int, seed: int,
+            limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """count request body theo tỉ lệ category của mix; mỗi category có unique bộ tiêu chí khác nhau."""
+    rng = np.random.default_rng(seed)
+    specs = catalog_specs(rows, seed)
+    pools = {category: criteria_mix(category, specs[category], unique, seed=seed) for category in mix}
+    categories = list(mix)
+    weights = np.array([mix[c] for c in categories], dtype=np.float64)
+    picks = rng.choice(len(categories), size=count, p=weights / weights.sum())
+    bodies = [{"category": categories[i], "criteria": pools[categories[i]][int(rng.integers(unique))]} for i in picks]
+    if limit:
+        for body in bodies:
+            body["limit"] = limit
+    return bodies
+
+
+class StallMonitor:
+    """Đo độ trễ của event loop: mỗi nhịp ngủ interval giây, phần thức dậy muộn là thời gian loop bị chặn."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> Dict[str, float]:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return percentiles(self.samples)
+
+
+async def send(client: httpx.AsyncClient, body: Dict[str, Any]) -> Tuple[str, int, float]:
+    started = time.perf_counter()
+    try:
+        response = await client.post("/recommend", json=body)
+        status = response.status_code
+    except httpx.HTTPError:
+        status = 0
+    return body["category"], status, time.perf_counter() - started
+
+
+def summarize(samples: List[Tuple[str, int, float]], wall: float) -> Dict[str, Any]:
+    statuses = Counter(status for _, status, _ in samples)
+    errors = sum(count for status, count in statuses.items() if status != 200)
+    by_category = defaultdict(list)
+    for category, status, seconds in samples:
+        if status == 200:
+            by_category[category].append(seconds)
+    return {
+        "requests": len(samples),
+        "wall_s": round(wall, 3),
+        "rps": round(len(samples) / wall, 1) if wall else None,
+        "latency": percentiles([seconds for _, status, seconds in samples if status == 200]),
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        # 0 là lỗi kết nối/timeout phía client
+        "status": {str(status): count for status, count in sorted(statuses.items())},
+        "categories": {category: percentiles(values) for category, values in sorted(by_category.items())},
+    }
+
+
+async def cold_wave(client: httpx.AsyncClient, bodies: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(send(client, bodies[i % len(bodies)]) for i in range(concurrency)))
+    return summarize(list(samples), time.perf_counter() - started)
+
+
+async def closed_loop(client: httpx.AsyncClient, bodies: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    samples: List[Tuple[str, int, float]] = []
+    pending = iter(bodies)
+
+    async def client_loop():
+        for body in pending:
+            samples.append(await send(client, body))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def reset_app(workers: int, max_queue: int):
+    """Trạng thái như một tiến trình vừa khởi động: catalog chưa tải, pool/cache mới."""
+    import main
+    from concurrency import SingleFlight, WorkerPool
+
+    main.catalogs = {store: main.catalog_manager(main.store_sources.get(store), snapshot_path=None, prepare=main.prepare_snapshot)
+                     for store in main.STORES}
+    main.pool = WorkerPool(workers=workers, max_queue=max_queue, retry_after=main.pool.retry_after)
+    main.flights = SingleFlight()
+    main.catalog_waiter = ThreadPoolExecutor(max_workers=len(main.STORES), thread_name_prefix="catalog-wait")
+    main.result_cache.clear()
+
+
+async def run_inprocess(args, workers: int, concurrency: int, bodies: List[Dict[str, Any]], source: StubSheetSource) -> Dict[str, Any]:
+    import main
+
+    source.calls = 0
+    reset_app(workers, args.max_queue)
+    monitor = StallMonitor(args.stall_interval)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://harness", timeout=args.timeout) as client:
+        main.start_catalog()
+        try:
+            monitor.start()
+            cold = await cold_wave(client, bodies, concurrency)
+            cold["stall"] = await monitor.stop()
+            cold["sheet_calls"] = source.calls
+            monitor.start()
+            load = await closed_loop(client, bodies, concurrency)
+            load["stall"] = await monitor.stop()
+        finally:
+            main.stop_catalog()
+    return {"cold": cold, "load": load}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(args, workers: int) -> Tuple[subprocess.Popen, int]:
+    port = free_port()
+    env = {
+        **os.environ,
+        "LOAD_HARNESS_ROWS": str(args.rows or 0),
+        "LOAD_HARNESS_SHEET_LATENCY": str(args.sheet_latency),
+        "LOAD_HARNESS_SEED": str(args.seed),
+        "CATALOG_SNAPSHOT_PATH": "",
+        "RECOMMEND_MAX_QUEUE": str(args.max_queue),
+    }
+    env.pop("CATALOG_SHARED_DIR", None)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "load_harness:stub_app", "--factory", "--app-dir", BENCH_DIR,
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(BENCH_DIR), env=env,
+    )
+    # Chờ cổng mở (app đã import xong, catalog có thể chưa tải)
+    deadline = time.time() + args.timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return process, port
+        except OSError:
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start in time")
+
+
+async def run_uvicorn(args, workers: int, concurrency: int, bodies: List[Dict[str, Any]], source: None = None) -> Dict[str, Any]:
+    process, port = start_uvicorn(args, workers)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+            cold = await cold_wave(client, bodies, concurrency)
+            load = await closed_loop(client, bodies, concurrency)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return {"cold": cold, "load": load}
+
+
+def compare(baseline: Dict[str, Any], report: Dict[str, Any], tolerance: float, metric: str) -> List[str]:
+    regressions = []
+    current = {run["config"]: run for run in report["runs"]}
+    for base in baseline.get("runs", []):
+        run = current.get(base["config"])
+        if run is None:
+            continue
+        base_rps, rps = base["load"]["rps"], run["load"]["rps"]
+        if base_rps and rps is not None and rps < base_rps * (1 - tolerance):
+            regressions.append(f"{base['config']}/rps: {base_rps} -> {rps} ({(rps / base_rps - 1) * 100:.0f}%)")
+        for phase in ("load", "cold"):
+            base_ms, ms = base[phase]["latency"].get(metric), run[phase]["latency"].get(metric)
+            if base_ms and ms is not None and ms > base_ms * (1 + tolerance):
+                regressions.append(f"{base['config']}/{phase}/{metric}: {base_ms} -> {ms} (+{(ms / base_ms - 1) * 100:.0f}%)")
+        if run["load"]["error_rate"] > base["load"]["error_rate"] + 0.01:
+            regressions.append(f"{base['config']}/error_rate: {base['load']['error_rate']} -> {run['load']['error_rate']}")
+    return regressions
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        category, _, weight = item.partition("=")
+        mix[category.strip()] = float(weight or 1)
+    return mix
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="thread của pool (inprocess) hoặc tiến trình uvicorn")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="số client đồng thời")
+    parser.add_argument("--requests", type=int, default=300, help="số request của pha load mỗi cấu hình")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="tỉ lệ traffic theo category, vd. cameras=4,lenses=1")
+    parser.add_argument("--unique", type=int, default=50, help="số bộ tiêu chí khác nhau mỗi category (ít thì cache trúng nhiều)")
+    parser.add_argument("--limit", type=int, help="limit của mỗi request (mặc định trả toàn bộ như client React)")
+    parser.add_argument("--rows", type=int, help="catalog tổng hợp rows sản phẩm mỗi category thay cho SPECS_CSV")
+    parser.add_argument("--sheet-latency", type=float, default=0.5, help="số giây một lần đọc sheet (stub)")
+    parser.add_argument("--max-queue", type=int, default=64, help="RECOMMEND_MAX_QUEUE của app")
+    parser.add_argument("--stall-interval", type=float, default=0.005, help="nhịp đo độ trễ event loop (giây)")
+    parser.add_argument("--timeout", type=float, default=60, help="timeout mỗi request (giây)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="ghi báo cáo JSON ra file")
+    parser.add_argument("--save-baseline", help="ghi báo cáo làm baseline")
+    parser.add_argument("--compare", help="baseline để so sánh")
+    parser.add_argument("--metric", choices=["p50_ms", "p95_ms", "p99_ms"], default="p95_ms", help="percentile dùng khi so sánh")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="mức chậm hơn cho phép (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    import logging
+
+    logging.disable(logging.WARNING)
+    mix = parse_mix(args.mix)
+    bodies = traffic(mix, args.rows, args.requests, args.unique, args.seed, args.limit)
+    if args.server == "inprocess":
+        runner, source = run_inprocess, install_stub(args.rows, args.sheet_latency, args.seed)
+    else:
+        runner, source = run_uvicorn, None
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "server": args.server,
+            "mix": mix,
+            "requests": args.requests,
+            "unique": args.unique,
+            "limit": args.limit,
+            "rows": args.rows,
+            "sheet_latency_s": args.sheet_latency,
+            "seed": args.seed,
+        },
+        "runs": [],
+    }
+    for workers in args.workers:
+        for concurrency in args.concurrency:
+            print(f"{args.server}: {workers} workers, concurrency {concurrency}...", file=sys.stderr)
+            result = asyncio.run(runner(args, workers, concurrency, bodies, source))
+            report["runs"].append({"config": f"{args.server}/w{workers}/c{concurrency}", "workers": workers,
+                                   "concurrency": concurrency, **result})
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+    if not args.output:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance, args.metric)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("no regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""Benchmark pipeline gợi ý trên catalog tổng hợp, từ 10^2 tới 10^6 sản phẩm mỗi category.
+
+    python benchmarks/run_benchmarks.py --sizes 100 1000 10000 100000
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+
+Với mỗi kích thước: đo load_data (parse + merge), dựng chỉ mục của snapshot,
+rồi chạy một tập tiêu chí ngẫu nhiên cho từng category và báo p50/p95/p99 của
+từng bước (filter, score, explain, format, serialize), dung lượng cấp phát
+đỉnh (tracemalloc) và RSS đỉnh của tiến trình.
+
+--compare so sánh percentile (--metric, mặc định p50) của từng bước, thời gian
+load/dựng chỉ mục và cấp phát đỉnh với baseline; vượt quá --tolerance (và lớn
+hơn --min-delta-ms) được coi là regression, exit code 1.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from catalog import CatalogSnapshot  # noqa: E402
+from main import PURPOSES_PER_CATEGORY, build_recommendations, category_index, load_data, prepare_snapshot  # noqa: E402
+from replay_traces import percentiles  # noqa: E402
+from result_cache import canonical_criteria  # noqa: E402
+from sources import MemorySource  # noqa: E402
+from synthetic import criteria_mix, synthetic_inventory, synthetic_specs  # noqa: E402
+
+STAGES = ["filter", "score", "explain", "format", "serialize", "total"]
+
+
+def timed(fn, *args, repeat: int = 1, **kwargs):
+    """(kết quả lần cuối, trung vị số giây) qua repeat lần gọi."""
+    samples = []
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        samples.append(time.perf_counter() - started)
+    return result, float(np.median(samples))
+
+
+def peak_alloc_kb(fn, *args, **kwargs) -> float:
+    """Cấp phát đỉnh (KB) của một lần gọi; đo riêng vì tracemalloc làm chậm đáng kể."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def run_query(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], limit: int) -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+    result = build_recommendations(snapshot, category, criteria, limit=limit, timings=timings)
+    stage_start = time.perf_counter()
+    json.dumps(jsonable_encoder(result), ensure_ascii=False)
+    timings["serialize"] = time.perf_counter() - stage_start
+    timings["total"] = time.perf_counter() - started
+    timings["results"] = result.get("total", 0)
+    return timings
+
+
+def bench_size(rows: int, queries: int, limit: int, seed: int, alloc_queries: int, repeat: int) -> Dict[str, Any]:
+    specs = synthetic_specs(rows, seed=seed)
+    inventory = synthetic_inventory(specs, seed=seed)
+
+    specs_dfs, load_s = timed(load_data, MemorySource(inventory), specs, repeat=repeat)
+    load_kb = peak_alloc_kb(load_data, MemorySource(inventory), specs)
+    _, prepare_s = timed(lambda: prepare_snapshot(CatalogSnapshot(1, specs_dfs)), repeat=repeat)
+    prepare_kb = peak_alloc_kb(lambda: prepare_snapshot(CatalogSnapshot(1, specs_dfs)))
+    snapshot = CatalogSnapshot(1, specs_dfs)
+    prepare_snapshot(snapshot)
+
+    categories = {}
+    for category, df in snapshot.specs_dfs.items():
+        index = category_index(snapshot, category)
+        mixes = [
+            canonical_criteria(c, PURPOSES_PER_CATEGORY.get(category, []), index.price_range)
+            for c in criteria_mix(category, specs[category], queries, seed=seed)
+        ]
+        # Lượt chạy nóng: dựng bộ nhớ đệm giải thích, nạp code path
+        for criteria in mixes[:5]:
+            run_query(snapshot, category, criteria, limit)
+
+        samples = defaultdict(list)
+        for criteria in mixes:
+            for stage, value in run_query(snapshot, category, criteria, limit).items():
+                samples[stage].append(value)
+
+        alloc = [peak_alloc_kb(run_query, snapshot, category, criteria, limit) for criteria in mixes[:alloc_queries]]
+
+        categories[category] = {
+            "rows": len(df),
+            "stages": {stage: percentiles(samples[stage]) for stage in STAGES if samples[stage]},
+            "mean_results": round(float(np.mean(samples["results"])), 1) if samples["results"] else 0,
+            "alloc_peak_kb": {"mean": round(float(np.mean(alloc)), 1), "max": round(float(np.max(alloc)), 1)} if alloc else {},
+        }
+
+    return {
+        "load": {"ms": round(load_s * 1000, 3), "alloc_peak_kb": load_kb},
+        "prepare": {"ms": round(prepare_s * 1000, 3), "alloc_peak_kb": prepare_kb},
+        "categories": categories,
+        # ru_maxrss tính bằng KB trên Linux; là đỉnh của cả tiến trình tới thời điểm này
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(baseline: Dict[str, Any], report: Dict[str, Any], tolerance: float, min_delta_ms: float, metric: str = "p50_ms") -> List[str]:
+    regressions = []
+
+    def check(label: str, base: float, current: float, min_delta: float):
+        if base is not None and current is not None and current > base * (1 + tolerance) and current - base > min_delta:
+            regressions.append(f"{label}: {base} -> {current} (+{(current / base - 1) * 100 if base else float('inf'):.0f}%)")
+
+    for size, base_size in baseline.get("results", {}).items():
+        current_size = report["results"].get(size)
+        if current_size is None:
+            continue
+        for step in ("load", "prepare"):
+            check(f"{size}/{step}/ms", base_size[step]["ms"], current_size[step]["ms"], min_delta_ms)
+            check(f"{size}/{step}/alloc_peak_kb", base_size[step]["alloc_peak_kb"], current_size[step]["alloc_peak_kb"], 64)
+        for category, base_cat in base_size["categories"].items():
+            current_cat = current_size["categories"].get(category)
+            if current_cat is None:
+                continue
+            for stage, base_pct in base_cat["stages"].items():
+                current_pct = current_cat["stages"].get(stage)
+                if current_pct:
+                    check(f"{size}/{category}/{stage}/{metric}", base_pct[metric], current_pct[metric], min_delta_ms)
+            if base_cat.get("alloc_peak_kb") and current_cat.get("alloc_peak_kb"):
+                check(f"{size}/{category}/alloc_peak_kb", base_cat["alloc_peak_kb"]["max"], current_cat["alloc_peak_kb"]["max"], 64)
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000], help="số sản phẩm mỗi category")
+    parser.add_argument("--queries", type=int, default=200, help="số truy vấn mỗi category")
+    parser.add_argument("--limit", type=int, default=20, help="limit của mỗi truy vấn")
+    parser.add_argument("--alloc-queries", type=int, default=20, help="số truy vấn đo cấp phát bằng tracemalloc")
+    parser.add_argument("--repeat", type=int, default=3, help="số lần đo load_data/dựng chỉ mục (lấy trung vị)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="ghi báo cáo JSON ra file")
+    parser.add_argument("--save-baseline", help="ghi báo cáo làm baseline")
+    parser.add_argument("--compare", help="baseline để so sánh")
+    parser.add_argument("--metric", choices=["p50_ms", "p95_ms", "p99_ms"], default="p50_ms", help="percentile dùng khi so sánh")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="mức chậm hơn cho phép (0.25 = 25%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="bỏ qua chênh lệch nhỏ hơn (ms)")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "queries": args.queries,
+            "limit": args.limit,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    for rows in sorted(args.sizes):
+        print(f"benchmarking {rows} rows per category...", file=sys.stderr)
+        report["results"][str(rows)] = bench_size(rows, args.queries, args.limit, args.seed, args.alloc_queries, args.repeat)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+    if not args.output:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.tolerance, args.min_delta_ms, args.metric)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("no regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Sinh catalog, inventory và tiêu chí tổng hợp giữ nguyên schema của từng category.
+
+Mỗi sản phẩm tổng hợp là một dòng trong SPECS_CSV được lấy mẫu lại: cột số
+dao động quanh giá trị gốc, điểm purpose được làm nhiễu trong [0, 1], tên
+model được đánh số để không trùng. Inventory có đúng một dòng cho mỗi model
+theo định dạng của Google Sheet (giá "$1,234,000").
+"""
+import os
+import sys
+from io import StringIO
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from filters import category_filters  # noqa: E402
+from main import PURPOSES_PER_CATEGORY, SPECS_CSV  # noqa: E402
+
+# Cột số giữ nguyên (năm, số trục) thay vì làm nhiễu
+FIXED_NUMERIC = {"Release Year", "Number of Stabilization Axes"}
+COLOURS = ["Black", "Silver", "White", "Graphite"]
+CONDITIONS = ["New", "Used"]
+SERIES = ["X Series", "GFX", "Osmo", "Mavic", "Ronin"]
+GIFTS = ["Bag", "SD card", "Strap", ""]
+
+
+def base_specs() -> Dict[str, pd.DataFrame]:
+    return {category: pd.read_csv(StringIO(data)) for category, data in SPECS_CSV.items()}
+
+
+def synthetic_specs(rows: int, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """rows sản phẩm cho mỗi category, cùng cột và kiểu giá trị với SPECS_CSV."""
+    rng = np.random.default_rng(seed)
+    result = {}
+    for category, base in base_specs().items():
+        picks = rng.integers(0, len(base), size=rows)
+        df = base.iloc[picks].reset_index(drop=True)
+        purposes = {p.lower() for p in PURPOSES_PER_CATEGORY.get(category, [])}
+        for column in df.columns:
+            if not pd.api.types.is_numeric_dtype(df[column]) or column in FIXED_NUMERIC:
+                continue
+            values = df[column].to_numpy(dtype=np.float64)
+            if column.lower() in purposes or column == "Stability":
+                noisy = np.clip(values + rng.normal(0, 0.1, size=rows), 0, 1)
+                df[column] = np.round(noisy, 2)
+            else:
+                noisy = values * rng.uniform(0.8, 1.2, size=rows)
+                df[column] = np.round(noisy, 1 if (values % 1).any() else 0)
+        df["Model"] = [f"{model} #{i}" for i, model in enumerate(df["Model"])]
+        result[category] = df
+    return result
+
+
+def synthetic_inventory(specs: Dict[str, pd.DataFrame], seed: int = 0) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed + 1)
+    records = []
+    for df in specs.values():
+        n = len(df)
+        prices = np.round(rng.lognormal(mean=16.5, sigma=0.6, size=n), -5)
+        colours = rng.choice(COLOURS, size=n).tolist()
+        conditions = rng.choice(CONDITIONS, size=n, p=[0.8, 0.2]).tolist()
+        series = rng.choice(SERIES, size=n).tolist()
+        gifts = rng.choice(GIFTS, size=n).tolist()
+        for i, model in enumerate(df["Model"]):
+            records.append({
+                "Model": model,
+                "Price": f"${int(prices[i]):,}",
+                "Colour": colours[i],
+                "Condition": conditions[i],
+                "Series": series[i],
+                "Free Gift": gifts[i],
+            })
+    return records
+
+
+def criteria_mix(category: str, specs_df: pd.DataFrame, count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Tiêu chí giống request thật: 1-3 purposes, thường kèm khoảng giá, thêm 0-3 bộ lọc."""
+    rng = np.random.default_rng(seed)
+    purposes = PURPOSES_PER_CATEGORY.get(category, [])
+    filters = category_filters(category)
+    choices = {
+        spec["column"]: sorted({str(v) for v in specs_df[spec["column"]].dropna().unique()})
+        for spec in filters if spec["type"] in ("choice", "contains") and spec["column"] in specs_df.columns
+    }
+    price_bands = [(0, 10000000), (5000000, 20000000), (10000000, 40000000), (20000000, 100000000)]
+
+    mixes = []
+    for _ in range(count):
+        criteria: Dict[str, Any] = {}
+        if purposes:
+            k = int(rng.integers(1, min(3, len(purposes)) + 1))
+            criteria["purposes"] = [str(p) for p in rng.choice(purposes, size=k, replace=False)]
+        if rng.random() < 0.7:
+            criteria["price"] = list(price_bands[int(rng.integers(len(price_bands)))])
+        for i in rng.choice(len(filters), size=min(len(filters), int(rng.integers(0, 4))), replace=False):
+            spec = filters[int(i)]
+            kind = spec["type"]
+            if kind == "range":
+                criteria[spec["criterion"]] = str(rng.choice(list(spec["buckets"])))
+            elif kind == "flag" or kind == "presence":
+                criteria[spec["criterion"]] = str(rng.choice(["Yes", "No"]))
+            elif kind == "feature":
+                criteria[spec["criterion"]] = True
+            elif spec.get("allowed"):
+                criteria[spec["criterion"]] = str(rng.choice(spec["allowed"])).capitalize()
+            elif choices.get(spec["column"]):
+                criteria[spec["criterion"]] = str(rng.choice(choices[spec["column"]]))
+        mixes.append(criteria)
+    return mixes
@@ -0,0 +1,163 @@
+"""Gợi ý bộ máy ảnh + ống kính (+ gimbal) trong một ngân sách tổng.
+
+BundleIndex được dựng một lần cho mỗi phiên bản catalog:
+    - ngàm: Compatible Lens Type của máy ảnh -> các Mount Type ống kính lắp được
+      (MOUNT_COMPATIBILITY); ống kính của mỗi nhóm ngàm được sắp theo giá
+    - gimbal dùng cho máy ảnh (không phải loại cho điện thoại) sắp theo giá,
+      kèm tải trọng tối đa (gram) để kiểm tra máy + ống kính có vừa không
+
+Tìm kiếm (search) không duyệt tích Descartes: máy ảnh được duyệt theo điểm
+giảm dần, với mỗi máy chỉ xét tiền tố các ống kính vừa ngân sách còn lại
+(searchsorted trên giá) và cận trên điểm của bộ là điểm máy + điểm ống kính
+cao nhất trong tiền tố đó (+ điểm gimbal cao nhất). Cận trên không vượt được
+bộ thứ K hiện tại thì bỏ cả nhánh; máy ảnh tiếp theo có điểm thấp hơn nên khi
+cận trên toàn cục không đạt thì dừng hẳn.
+"""
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from filters import _norm
+
+# Compatible Lens Type (máy ảnh) -> Mount Type (ống kính) lắp được; máy ống kính liền không ghép ống kính
+MOUNT_COMPATIBILITY: Dict[str, List[str]] = {
+    'fujifilm x': ['x-mount'],
+    'gf lenses': ['g-mount'],
+    'fixed (35mm equiv.)': [],
+}
+# Gimbal cho điện thoại không mang được máy ảnh
+GIMBAL_EXCLUDED_DEVICES = {'phone'}
+
+
+def _numbers(df: pd.DataFrame, column: str, missing: float) -> np.ndarray:
+    if column not in df.columns:
+        return np.full(len(df), missing)
+    values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+    return np.where(np.isnan(values), missing, values)
+
+
+class BundleIndex:
+    def __init__(self, cameras: pd.DataFrame, lenses: pd.DataFrame, gimbals: Optional[pd.DataFrame] = None):
+        self.camera_prices = _numbers(cameras, 'Price', np.inf)
+        self.camera_weights = _numbers(cameras, 'Weight (gram)', 0.0)
+        self.lens_prices = _numbers(lenses, 'Price', np.inf)
+        self.lens_weights = _numbers(lenses, 'Weight (gram)', 0.0)
+
+        # Nhóm ngàm: mỗi giá trị Compatible Lens Type một nhóm, ống kính trong nhóm sắp theo giá
+        lens_mounts = lenses['Mount Type'].map(_norm, na_action='ignore') if 'Mount Type' in lenses.columns else pd.Series([None] * len(lenses))
+        camera_types = cameras['Compatible Lens Type'].map(_norm, na_action='ignore') if 'Compatible Lens Type' in cameras.columns else pd.Series([None] * len(cameras))
+        codes, uniques = pd.factorize(camera_types)
+        self.camera_group = codes
+        self.groups: List[np.ndarray] = []
+        for lens_type in uniques:
+            mounts = MOUNT_COMPATIBILITY.get(lens_type, [])
+            positions = np.flatnonzero(lens_mounts.isin(mounts).to_numpy())
+            self.groups.append(positions[np.argsort(self.lens_prices[positions], kind='stable')])
+
+        self.has_gimbals = gimbals is not None
+        if gimbals is not None:
+            self.gimbal_prices = _numbers(gimbals, 'Price', np.inf)
+            self.gimbal_payload = _numbers(gimbals, 'Maximum Payload (kg)', 0.0) * 1000
+            usable = np.ones(len(gimbals), dtype=bool)
+            if 'Device Compatibility' in gimbals.columns:
+                usable = ~gimbals['Device Compatibility'].map(_norm, na_action='ignore').isin(GIMBAL_EXCLUDED_DEVICES).to_numpy()
+            positions = np.flatnonzero(usable)
+            self.gimbal_order = positions[np.argsort(self.gimbal_prices[positions], kind='stable')]
+
+
+Bundle = Tuple[float, float, int, int, Optional[int]]
+
+
+def search(index: BundleIndex, budget: float, k: int,
+           camera_scores: np.ndarray, camera_ok: np.ndarray,
+           lens_scores: np.ndarray, lens_ok: np.ndarray,
+           gimbal_scores: Optional[np.ndarray] = None, gimbal_ok: Optional[np.ndarray] = None) -> List[Bundle]:
+    """K bộ (điểm, tổng giá, máy ảnh, ống kính, gimbal|None) tốt nhất, điểm giảm dần rồi giá tăng dần.
+
+    Điểm của bộ là tổng điểm các thành phần (đã nhân trọng số ở nơi gọi);
+    *_ok là mask các sản phẩm đạt bộ lọc của từng category.
+    """
+    with_gimbal = gimbal_scores is not None
+    heap: List[Tuple[float, float, int, Bundle]] = []
+    counter = 0
+
+    def beaten(score: float, price: float) -> bool:
+        """Bộ có điểm tối đa score và giá tối thiểu price không vào được top K."""
+        if len(heap) < k:
+            return False
+        worst_score, worst_price = heap[0][0], -heap[0][1]
+        return score < worst_score or (score == worst_score and price >= worst_price)
+
+    def push(score: float, price: float, camera: int, lens: int, gimbal: Optional[int]):
+        nonlocal counter
+        counter += 1
+        item = (score, -price, -counter, (score, price, camera, lens, gimbal))
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    # Gimbal dùng được (đạt lọc)
+    if with_gimbal:
+        gimbals = index.gimbal_order[gimbal_ok[index.gimbal_order]]
+        if len(gimbals) == 0:
+            return []
+        cheapest_gimbal = float(index.gimbal_prices[gimbals[0]])
+        # Theo điểm giảm dần, hòa điểm thì rẻ trước: K gimbal đầu tiên vừa túi tiền và tải trọng là tốt nhất
+        gimbals = gimbals[np.lexsort((index.gimbal_prices[gimbals], -gimbal_scores[gimbals]))]
+        g_prices = index.gimbal_prices[gimbals]
+        g_payload = index.gimbal_payload[gimbals]
+        g_scores = gimbal_scores[gimbals].astype(np.float64)
+        best_gimbal = float(g_scores[0])
+    else:
+        best_gimbal, cheapest_gimbal = 0.0, 0.0
+
+    # Ống kính đạt lọc của từng nhóm ngàm: giá tăng dần và điểm cao nhất của mỗi tiền tố
+    groups = []
+    best_lens, cheapest_lens = -np.inf, np.inf
+    for positions in index.groups:
+        positions = positions[lens_ok[positions]]
+        prices = index.lens_prices[positions]
+        scores = lens_scores[positions].astype(np.float64)
+        # Thứ tự xét ống kính trong nhóm: điểm giảm dần, hòa điểm thì rẻ trước
+        order = np.lexsort((prices, -scores))
+        groups.append((positions, prices, scores, np.maximum.accumulate(scores) if len(scores) else scores, order))
+        if len(scores):
+            best_lens = max(best_lens, float(scores.max()))
+            cheapest_lens = min(cheapest_lens, float(prices[0]))
+    if best_lens == -np.inf:
+        return []
+
+    # Máy ảnh theo điểm giảm dần, hòa điểm thì rẻ trước: cận của các máy sau không tốt hơn máy hiện tại
+    cameras = np.flatnonzero(camera_ok & (index.camera_group >= 0) & (index.camera_prices <= budget))
+    cameras = cameras[np.lexsort((index.camera_prices[cameras], -camera_scores[cameras]))]
+    for camera in cameras:
+        camera_score = float(camera_scores[camera])
+        camera_price = float(index.camera_prices[camera])
+        if beaten(camera_score + best_lens + best_gimbal, camera_price + cheapest_lens + cheapest_gimbal):
+            break
+        positions, prices, scores, prefix_best, order = groups[index.camera_group[camera]]
+        affordable = int(np.searchsorted(prices, budget - camera_price - cheapest_gimbal, side='right'))
+        if affordable == 0 or beaten(camera_score + prefix_best[affordable - 1] + best_gimbal, camera_price + prices[0] + cheapest_gimbal):
+            continue
+        # Vị trí trong nhóm < affordable <=> giá vừa ngân sách còn lại
+        candidates = order[order < affordable] if affordable < len(order) else order
+        if not with_gimbal:
+            # Không kèm gimbal: K ống kính đầu tiên là tốt nhất cho máy này
+            candidates = candidates[:k]
+        for j in candidates:
+            lens_price = camera_price + prices[j]
+            if beaten(camera_score + scores[j] + best_gimbal, lens_price + cheapest_gimbal):
+                break
+            if not with_gimbal:
+                push(camera_score + scores[j], lens_price, int(camera), int(positions[j]), None)
+                continue
+            weight = index.camera_weights[camera] + index.lens_weights[positions[j]]
+            for g in np.flatnonzero((g_prices <= budget - lens_price) & (g_payload >= weight))[:k]:
+                score = camera_score + scores[j] + g_scores[g]
+                if beaten(score, lens_price + g_prices[g]):
+                    break
+                push(score, lens_price + g_prices[g], int(camera), int(positions[j]), int(gimbals[g]))
+    return [item[3] for item in sorted(heap, reverse=True)]
@@ -0,0 +1,356 @@
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+
+import pandas as pd
+
+from snapshot_store import load_frames, save_frames
+
+logger = logging.getLogger(__name__)
+
+
+def frame_fingerprint(frame: pd.DataFrame) -> str:
+    """Hash nội dung (tên cột và mọi giá trị) của một DataFrame.
+
+    Khác category_versions (bộ đếm riêng của từng process, bắt đầu lại từ 1 khi
+    khởi động lại), cùng dữ liệu luôn cho cùng dấu vân tay ở mọi process.
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    digest.update('\x1f'.join(map(str, frame.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class CatalogSnapshot:
+    """Một phiên bản bất biến của catalog (specs_dfs đã merge với inventory).
+
+    category_versions ghi phiên bản gần nhất mà dữ liệu của từng category
+    thay đổi; cache kết quả dùng nó để chỉ bỏ kết quả của category bị đổi.
+    """
+
+    def __init__(self, version: int, specs_dfs: Dict[str, pd.DataFrame], loaded_at: Optional[float] = None, origin: str = "source",
+                 category_versions: Optional[Dict[str, int]] = None, inventory: Any = None):
+        self.version = version
+        self.specs_dfs = specs_dfs
+        self.loaded_at = loaded_at or time.time()
+        # "source": tải từ nguồn inventory, "delta": vá từ phiên bản trước, "disk": đọc lại từ file snapshot
+        self.origin = origin
+        self.category_versions = {c: int((category_versions or {}).get(c, version)) for c in specs_dfs}
+        # Trạng thái inventory dùng để tính delta ở lần tải sau (None: phải tải đầy đủ)
+        self.inventory = inventory
+        # Cấu trúc dẫn xuất (chỉ mục, ma trận...) dựng một lần cho phiên bản này;
+        # khóa dạng (loại, category) để dùng lại được cho category không đổi
+        self._derived: Dict[Any, Any] = {}
+        self._derived_lock = threading.Lock()
+
+    def category_version(self, category: str) -> int:
+        return self.category_versions.get(category, self.version)
+
+    def derived_items(self) -> Dict[Any, Any]:
+        with self._derived_lock:
+            return dict(self._derived)
+
+    def inherit(self, entries: Dict[Any, Any]):
+        """Dùng các cấu trúc dẫn xuất dựng sẵn (vd. của phiên bản trước cho category không đổi)."""
+        with self._derived_lock:
+            for key, value in entries.items():
+                self._derived.setdefault(key, value)
+
+    def derived(self, key: Any, build: Callable[[], Any]) -> Any:
+        value = self._derived.get(key)
+        if value is None:
+            with self._derived_lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = build()
+                    self._derived[key] = value
+        return value
+
+    def __contains__(self, category: str) -> bool:
+        return category in self.specs_dfs
+
+    def __getitem__(self, category: str) -> pd.DataFrame:
+        return self.specs_dfs[category]
+
+
+class CatalogNotReady(Exception):
+    pass
+
+
+class CatalogUpdate:
+    """Kết quả của một lần tải.
+
+    specs_dfs là toàn bộ catalog mới; changed là các category có dữ liệu khác
+    phiên bản trước (None: tất cả). Category không đổi giữ nguyên DataFrame và
+    cấu trúc dẫn xuất; derived cho thêm cấu trúc dẫn xuất đã dựng (hoặc vá)
+    sẵn cho category đã đổi, vd. ma trận điểm khi chỉ giá thay đổi.
+    """
+
+    def __init__(self, specs_dfs: Dict[str, pd.DataFrame], changed: Optional[Iterable[str]] = None, inventory: Any = None,
+                 derived: Optional[Dict[Any, Any]] = None, summary: Optional[Dict[str, Any]] = None):
+        self.specs_dfs = specs_dfs
+        self.changed = None if changed is None else set(changed)
+        self.inventory = inventory
+        self.derived = derived or {}
+        self.summary = summary or {}
+
+
+class CatalogManager:
+    """Tải lại catalog định kỳ trong một thread nền.
+
+    Mỗi lần tải thành công tạo một CatalogSnapshot mới với version tăng dần và
+    được gán thay thế snapshot cũ trong một phép gán duy nhất, nên request đang
+    chạy luôn thấy một phiên bản nhất quán. Khi tải lỗi, snapshot tốt cuối cùng
+    vẫn được dùng; lỗi được thử lại với backoff, và sau nhiều chu kỳ lỗi liên
+    tiếp thì circuit breaker mở để ngừng gọi nguồn dữ liệu trong một thời gian.
+
+    Nếu có snapshot_path, mỗi phiên bản tải thành công được ghi ra đĩa và lần
+    khởi động sau phục vụ ngay bản trên đĩa trong lúc chờ tải bản mới.
+
+    prepare (nếu có) được gọi với snapshot mới trước khi đưa vào phục vụ, để
+    dựng sẵn chỉ mục; lỗi ở bước này được tính như một lần tải lỗi.
+
+    publish (nếu có) được gọi sau mỗi lần tải thành công, vd. để công bố
+    snapshot cho các worker khác (xem shared_catalog.py).
+
+    loader trả về specs_dfs hoặc một CatalogUpdate. update (nếu có) được gọi
+    thay cho loader khi snapshot hiện tại có trạng thái inventory: trả về
+    CatalogUpdate chỉ với phần thay đổi, hoặc None nếu inventory không đổi
+    (khi đó không tạo phiên bản mới).
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Union[Dict[str, pd.DataFrame], CatalogUpdate]],
+        refresh_interval: float = 300.0,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        breaker_threshold: int = 3,
+        breaker_cooldown: float = 300.0,
+        snapshot_path: Optional[str] = None,
+        prepare: Optional[Callable[[CatalogSnapshot], None]] = None,
+        publish: Optional[Callable[[CatalogSnapshot], None]] = None,
+        update: Optional[Callable[[CatalogSnapshot], Optional[CatalogUpdate]]] = None,
+    ):
+        self.loader = loader
+        self.update = update
+        self.prepare = prepare
+        self.publish = publish
+        self.snapshot_path = snapshot_path
+        self.refresh_interval = refresh_interval
+        self.max_retries = max(1, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = max(1, breaker_threshold)
+        self.breaker_cooldown = breaker_cooldown
+
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self.consecutive_failures = 0
+        self.breaker_open_until = 0.0
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self.last_attempt_at: Optional[float] = None
+        self.last_update: Optional[Dict[str, Any]] = None
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        """Snapshot hiện tại, None nếu chưa tải; không bao giờ chờ."""
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else 0
+
+    @property
+    def breaker_state(self) -> str:
+        if self.consecutive_failures < self.breaker_threshold:
+            return "closed"
+        if time.time() < self.breaker_open_until:
+            return "open"
+        return "half-open"
+
+    def _sleep(self, seconds: float) -> bool:
+        # Trả về True nếu manager bị dừng trong lúc chờ
+        return self._stop.wait(seconds)
+
+    def refresh(self) -> bool:
+        """Tải một phiên bản mới. Trả về True nếu snapshot đã được thay."""
+        with self._refresh_lock:
+            state = self.breaker_state
+            if state == "open":
+                return False
+            # Ở trạng thái half-open chỉ thử một lần để dò nguồn dữ liệu
+            attempts = 1 if state == "half-open" else self.max_retries
+
+            for attempt in range(attempts):
+                self.last_attempt_at = time.time()
+                try:
+                    previous = self._snapshot
+                    if self.update is not None and previous is not None and previous.inventory is not None:
+                        update = self.update(previous)
+                        if update is None:
+                            # Inventory không đổi: giữ phiên bản hiện tại (và cache của nó)
+                            self._mark_success()
+                            self.last_update = {"mode": "unchanged", "at": self.last_success_at}
+                            return False
+                    else:
+                        loaded = self.loader()
+                        update = loaded if isinstance(loaded, CatalogUpdate) else CatalogUpdate(loaded)
+                    snapshot = self._build(update, previous)
+                    if self.prepare:
+                        self.prepare(snapshot)
+                except Exception as e:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    logger.warning("Catalog refresh attempt %d/%d failed: %s", attempt + 1, attempts, self.last_error)
+                    if attempt + 1 < attempts:
+                        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                        if self._sleep(delay * random.uniform(0.5, 1.0)):
+                            break
+                    continue
+
+                self._version = snapshot.version
+                self._snapshot = snapshot
+                self._mark_success()
+                self.last_update = {"mode": snapshot.origin, "at": self.last_success_at, **update.summary}
+                self._ready.set()
+                logger.info("Catalog version %d loaded (%s)", self._version, snapshot.origin)
+                self._persist(snapshot)
+                self._publish(snapshot)
+                return True
+
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.breaker_threshold:
+                self.breaker_open_until = time.time() + self.breaker_cooldown
+                logger.error("Catalog circuit breaker open for %.0fs", self.breaker_cooldown)
+            return False
+
+    def _mark_success(self):
+        self.consecutive_failures = 0
+        self.breaker_open_until = 0.0
+        self.last_error = None
+        self.last_success_at = time.time()
+
+    def _build(self, update: CatalogUpdate, previous: Optional[CatalogSnapshot]) -> CatalogSnapshot:
+        version = self._version + 1
+        if update.changed is None or previous is None:
+            return CatalogSnapshot(version, update.specs_dfs, inventory=update.inventory)
+        unchanged = [c for c in update.specs_dfs if c not in update.changed and c in previous]
+        snapshot = CatalogSnapshot(
+            version, update.specs_dfs, origin="delta", inventory=update.inventory,
+            category_versions={c: previous.category_version(c) for c in unchanged},
+        )
+        snapshot.inherit(update.derived)
+        snapshot.inherit({key: value for key, value in previous.derived_items().items()
+                          if isinstance(key, tuple) and len(key) > 1 and key[1] in unchanged})
+        return snapshot
+
+    def _persist(self, snapshot: CatalogSnapshot):
+        if not self.snapshot_path:
+            return
+        try:
+            save_frames(self.snapshot_path, snapshot.specs_dfs,
+                        {"version": snapshot.version, "loaded_at": snapshot.loaded_at, "category_versions": snapshot.category_versions})
+        except Exception as e:
+            logger.warning("Could not persist catalog snapshot to %s: %s", self.snapshot_path, e)
+
+    def _publish(self, snapshot: CatalogSnapshot):
+        if not self.publish:
+            return
+        try:
+            self.publish(snapshot)
+        except Exception as e:
+            logger.warning("Could not publish catalog version %d: %s", snapshot.version, e)
+
+    def seed_version(self, version: int):
+        """Đảm bảo phiên bản tải tiếp theo lớn hơn version (vd. phiên bản đã công bố trước đó)."""
+        with self._refresh_lock:
+            self._version = max(self._version, version)
+
+    def load_persisted(self) -> bool:
+        """Phục vụ snapshot trên đĩa nếu chưa có phiên bản nào trong bộ nhớ."""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        with self._refresh_lock:
+            if self._snapshot is not None:
+                return False
+            try:
+                specs_dfs, meta = load_frames(self.snapshot_path)
+                version = max(self._version, int(meta.get("version", 0)))
+                snapshot = CatalogSnapshot(version, specs_dfs, loaded_at=meta.get("loaded_at"), origin="disk",
+                                           category_versions=meta.get("category_versions"))
+                if self.prepare:
+                    self.prepare(snapshot)
+            except Exception as e:
+                logger.warning("Could not read catalog snapshot %s: %s", self.snapshot_path, e)
+                return False
+            self._version = version
+            self._snapshot = snapshot
+            self._ready.set()
+            logger.info("Catalog version %d restored from %s", self._version, self.snapshot_path)
+            return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            # Chưa có snapshot nào thì thử lại sớm hơn chu kỳ bình thường
+            interval = self.refresh_interval if self._snapshot else min(self.refresh_interval, self.backoff_max)
+            if self._sleep(interval):
+                break
+
+    def start(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self.load_persisted()
+            self._thread = threading.Thread(target=self._run, name="catalog-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def current(self, timeout: Optional[float] = None) -> CatalogSnapshot:
+        """Snapshot hiện tại; chỉ chờ khi catalog chưa từng được tải."""
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        self.start()
+        self._ready.wait(timeout)
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise CatalogNotReady(self.last_error or "Catalog is still loading")
+        return snapshot
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": self.version,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "origin": snapshot.origin if snapshot else None,
+            "categories": {c: len(df) for c, df in snapshot.specs_dfs.items()} if snapshot else {},
+            "category_versions": snapshot.category_versions if snapshot else {},
+            "last_update": self.last_update,
+            "refresh_interval": self.refresh_interval,
+            "breaker": self.breaker_state,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+            "last_attempt_at": self.last_attempt_at,
+        }
+
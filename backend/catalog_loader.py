@@ -0,0 +1,62 @@
+"""Tiến trình tải catalog duy nhất cho triển khai nhiều worker.
+
+    CATALOG_SHARED_DIR=/dev/shm/recommend-catalog python catalog_loader.py
+    CATALOG_SHARED_DIR=/dev/shm/recommend-catalog uvicorn main:app --workers 4
+
+Loader tải inventory theo chu kỳ CATALOG_REFRESH_INTERVAL (cùng retry/circuit
+breaker như khi chạy một worker) và công bố mỗi phiên bản vào thư mục chung;
+các worker có CATALOG_SHARED_DIR chỉ mmap phiên bản mới nhất. Với
+INVENTORY_STORES, mỗi store có một manager (luồng làm mới riêng) công bố vào
+thư mục con cùng tên store.
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+
+from main import CATALOG_SNAPSHOT_PATH, STORES, catalog_manager, store_path, store_sources
+from shared_catalog import publish, read_pointer
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=os.environ.get("CATALOG_SHARED_DIR"), help="thư mục chung (mặc định CATALOG_SHARED_DIR)")
+    parser.add_argument("--keep", type=int, default=int(os.environ.get("CATALOG_SHARED_KEEP", 3)), help="số phiên bản giữ lại")
+    parser.add_argument("--once", action="store_true", help="tải và công bố một lần rồi thoát")
+    args = parser.parse_args()
+    if not args.dir:
+        parser.error("--dir or CATALOG_SHARED_DIR is required")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    managers = []
+    for store in STORES:
+        directory = store_path(args.dir, store, directory=True)
+        manager = catalog_manager(store_sources.get(store), snapshot_path=store_path(CATALOG_SNAPSHOT_PATH, store),
+                                  publish=lambda snapshot, directory=directory: publish(directory, snapshot, keep=args.keep))
+        # Phiên bản mới luôn lớn hơn phiên bản đã công bố, kể cả khi loader khởi động lại
+        pointer = read_pointer(directory)
+        if pointer is not None:
+            manager.seed_version(pointer[0])
+        # Thư mục chung còn trống (vd. sau khi khởi động lại máy): công bố ngay bản trên đĩa
+        if manager.load_persisted() and pointer is None:
+            publish(directory, manager.snapshot, keep=args.keep)
+        managers.append(manager)
+
+    if args.once:
+        return 0 if all([manager.refresh() for manager in managers]) else 1
+
+    stopped = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stopped.set())
+    for manager in managers:
+        manager.start()
+    stopped.wait()
+    for manager in managers:
+        manager.stop(timeout=5)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class Overloaded(Exception):
+    """Hàng đợi của pool đã đầy; request nên được từ chối ngay thay vì xếp hàng."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Server is busy")
+        self.retry_after = retry_after
+
+
+class WorkerPool:
+    """Thread pool có giới hạn để chạy phần xử lý đồng bộ (pandas/numpy) ngoài event loop.
+
+    Tối đa workers việc chạy cùng lúc và max_queue việc chờ; vượt quá thì
+    run() ném Overloaded ngay lập tức để handler trả 503 kèm Retry-After,
+    tránh để request dồn lại làm tăng độ trễ của mọi kết nối.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 64, retry_after: float = 1.0, name: str = "recommend"):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _admit(self):
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise Overloaded(self.retry_after)
+            self.in_flight += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        self._admit()
+        try:
+            future = self.executor.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # Trả chỗ khi việc thực sự kết thúc (hoặc bị hủy khi còn trong hàng đợi): coroutine chờ
+        # bị hủy (client ngắt kết nối) không dừng được luồng đang chạy nên không được trả chỗ sớm
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+class SingleFlight:
+    """Gộp các lời gọi đồng thời cùng khóa thành một lần thực thi.
+
+    Lời gọi đầu tiên chạy factory; các lời gọi đến sau khi nó chưa xong chỉ
+    chờ cùng kết quả (hoặc cùng lỗi). Chỉ dùng trong một event loop.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            # shield: một client ngắt kết nối không hủy việc của các client khác
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(factory())
+        self._calls[key] = future
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
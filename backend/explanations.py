@@ -0,0 +1,293 @@
+"""Sinh câu giải thích vì sao một sản phẩm phù hợp với các purpose đã chọn.
+
+Luật được khai báo một lần trong EXPLANATION_RULES. Với mỗi phiên bản catalog,
+ExplanationEngine so sánh mọi luật trên toàn bộ cột của category (vector hóa)
+và giữ kết quả dạng mask; request chỉ còn tra mask tại các vị trí kết quả và
+ghép câu. Câu đã ghép được nhớ theo (model, purposes) trong engine của phiên
+bản đó.
+
+Mỗi luật: (purpose, tiêu chí, cột, phép so sánh, ngưỡng, mẫu mô tả)
+    le / lt / ge:  so sánh số với ngưỡng; giá trị dạng khoảng ("16-55") dùng đầu
+                   nhỏ cho le/lt, đầu lớn cho ge
+    between:       ngưỡng là (min, max), tính cả hai đầu; khoảng đạt nếu giao nhau
+    flag:          cột Yes/No (1, "yes", "true")
+    in:            giá trị (không phân biệt hoa thường) thuộc danh sách ngưỡng
+    not:           giá trị khác ngưỡng (không phân biệt hoa thường)
+Mẫu mô tả có thể dùng {value} là giá trị của sản phẩm.
+"""
+import copy
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+EXPLANATION_RULES: Dict[str, List[Tuple[str, str, str, str, Any, str]]] = {
+    'cameras': [
+        ('Beginner', 'Weight', 'Weight (gram)', 'le', 500, 'trọng lượng {value}g'),
+        ('Beginner', 'Flipscreen', 'Flipscreen', 'flag', None, 'màn hình lật 360o'),
+        ('Professional', 'Resolution', 'Resolution (MP)', 'ge', 26, 'độ phân giải {value}'),
+        ('Professional', 'ISO Max', 'ISO Max', 'ge', 12800, 'ISO tối đa {value}'),
+        ('Professional', 'Weathersealing', 'Weathersealing', 'flag', None, 'chống chịu thời tiết'),
+        ('Sports', 'Weathersealing', 'Weathersealing', 'flag', None, 'chống chịu thời tiết'),
+        ('Video', 'External Mic Input', 'External Mic Input', 'flag', None, 'có cổng mic ngoài'),
+        ('Video', 'IBIS', 'IBIS', 'flag', None, 'chống rung IBIS'),
+        ('Video', 'Flipscreen', 'Flipscreen', 'flag', None, 'màn hình lật 360o'),
+        ('Video', 'Film Simulation', 'Film Simulation', 'flag', None, 'có giả lập màu film'),
+        ('Travel', 'Weight', 'Weight (gram)', 'le', 500, 'trọng lượng {value}g'),
+        ('Travel', 'Weathersealing', 'Weathersealing', 'flag', None, 'chống chịu thời tiết'),
+        ('Travel', 'Film Simulation', 'Film Simulation', 'flag', None, 'có giả lập màu film'),
+        ('Vlogging', 'Flipscreen', 'Flipscreen', 'flag', None, 'màn hình lật 360o'),
+        ('Vlogging', 'Weight', 'Weight (gram)', 'le', 500, 'trọng lượng {value}g'),
+        ('Vlogging', 'External Mic Input', 'External Mic Input', 'flag', None, 'có cổng mic ngoài'),
+        ('Vlogging', 'IBIS', 'IBIS', 'flag', None, 'chống rung IBIS'),
+        ('Studio', 'Resolution', 'Resolution (MP)', 'ge', 26, 'độ phân giải {value}'),
+        ('Studio', 'Film Simulation', 'Film Simulation', 'flag', None, 'có giả lập màu film'),
+        ('Studio', 'USB-C', 'USB-C', 'flag', None, 'USB-C (hỗ trợ tethering)'),
+        ('Studio', 'Weathersealing', 'Weathersealing', 'flag', None, 'chống chịu thời tiết'),
+    ],
+    'lenses': [
+        ('Landscape', 'Focal Length', 'Focal Range (mm)', 'le', 23, 'góc rộng {value}mm'),
+        ('Travel', 'Weight', 'Weight (gram)', 'le', 250, 'trọng lượng {value}g'),
+        ('Travel', 'Lens Type', 'Lens Type', 'in', ['zoom'], 'ống zoom linh hoạt'),
+        ('Portrait', 'Max Aperture', 'Max Aperture', 'le', 2, 'khẩu độ lớn f/{value}'),
+        ('Portrait', 'Focal Length', 'Focal Range (mm)', 'between', (33, 90), 'tiêu cự chân dung {value}mm'),
+        ('Sports', 'Focal Length', 'Focal Range (mm)', 'ge', 70, 'tiêu cự dài {value}mm'),
+        ('Sports', 'OIS', 'Image Stabilization (OIS)', 'flag', None, 'chống rung quang học OIS'),
+        ('Macro', 'Minimum Focusing Distance', 'Minimum Focusing Distance (mm)', 'le', 20, 'lấy nét cận cảnh tốt'),
+        ('Street', 'Weight', 'Weight (gram)', 'le', 200, 'trọng lượng {value}g'),
+        ('Street', 'Focal Length', 'Focal Range (mm)', 'between', (16, 35), 'tiêu cự {value}mm'),
+        ('Video', 'OIS', 'Image Stabilization (OIS)', 'flag', None, 'chống rung quang học OIS'),
+        ('Video', 'Max Aperture', 'Max Aperture', 'le', 2, 'khẩu độ lớn f/{value}'),
+    ],
+    'drones': [
+        ('Sports', 'Maximum Flight Speed', 'Maximum Flight Speed (km/h)', 'ge', 54, 'tốc độ bay tối đa {value} km/h'),
+        ('Sports', 'Tracking', 'Tracking', 'flag', None, 'bám theo chủ thể'),
+        ('Travel', 'Weight', 'Weight (gram)', 'lt', 250, 'trọng lượng {value}g'),
+        ('Travel', 'Max Flight Time', 'Max Flight Time (minutes)', 'ge', 30, 'thời gian bay {value} phút'),
+        ('Vlogging', 'Tracking', 'Tracking', 'flag', None, 'bám theo chủ thể'),
+        ('Vlogging', 'Vertical Video Recording', 'Vertical Video Recording', 'flag', None, 'quay video dọc'),
+        ('Professional', 'Camera Resolution', 'Camera Resolution', 'in', ['5.1k', '5.4k'], 'camera {value}'),
+        ('Professional', 'Control Range', 'Control Range (km)', 'ge', 15, 'tầm điều khiển {value} km'),
+        ('Professional', 'Obstacle Avoidance Sensor', 'Obstacle Avoidance Sensor', 'not', 'no', 'cảm biến tránh vật cản'),
+        ('Easy of use', 'Obstacle Avoidance Sensor', 'Obstacle Avoidance Sensor', 'not', 'no', 'cảm biến tránh vật cản'),
+        ('Easy of use', 'Weight', 'Weight (gram)', 'lt', 250, 'trọng lượng {value}g'),
+    ],
+    'gimbals': [
+        ('Travel', 'Battery Life', 'Battery Life (hours)', 'ge', 10, 'pin {value} giờ'),
+        ('Travel', 'Device Compatibility', 'Device Compatibility', 'in', ['phone'], 'gọn nhẹ cho điện thoại'),
+        ('Vlogging', 'Follow Mode', 'Follow Mode', 'flag', None, 'chế độ bám theo'),
+        ('Vlogging', 'Time-lapse', 'Time-lapse', 'flag', None, 'quay time-lapse'),
+        ('Professional', 'Maximum Payload', 'Maximum Payload (kg)', 'ge', 2, 'tải trọng tối đa {value}kg'),
+        ('Professional', 'Battery Life', 'Battery Life (hours)', 'ge', 10, 'pin {value} giờ'),
+        ('Easy of use', 'App Connectivity', 'App Connectivity', 'flag', None, 'kết nối ứng dụng'),
+        ('Easy of use', 'Follow Mode', 'Follow Mode', 'flag', None, 'chế độ bám theo'),
+    ],
+    'action_cameras': [
+        ('Travel', 'Weight', 'Weight (gram)', 'le', 150, 'trọng lượng {value}g'),
+        ('Travel', 'Battery Life', 'Battery Life (minutes)', 'ge', 140, 'pin {value} phút'),
+        ('Sports', 'Slow Motion', 'Slow Motion', 'flag', None, 'quay chậm'),
+        ('Sports', 'Shock Resistance', 'Shock Resistance', 'flag', None, 'chống sốc'),
+        ('Vlogging', 'Dual Screen', 'Dual Screen', 'flag', None, 'hai màn hình'),
+        ('Vlogging', 'Touchscreen', 'Touchscreen', 'flag', None, 'màn hình cảm ứng'),
+        ('Durability', 'Water Resistance', 'Water Resistance', 'flag', None, 'chống nước'),
+        ('Durability', 'Shock Resistance', 'Shock Resistance', 'flag', None, 'chống sốc'),
+        ('Easy of use', 'Touchscreen', 'Touchscreen', 'flag', None, 'màn hình cảm ứng'),
+        ('Easy of use', 'Wifi', 'Wifi', 'flag', None, 'có WiFi'),
+    ],
+}
+
+# Mô tả theo giá, đứng đầu danh sách tính năng: (purpose, giá nhỏ hơn, mẫu)
+PRICE_RULES: Dict[str, List[Tuple[str, float, str]]] = {
+    'cameras': [('Beginner', 23000000, 'giá {value} đồng')],
+}
+
+# purpose -> (khi chọn một purpose, khi ghép nhiều purpose, khi không có tính năng nổi bật)
+PURPOSE_TEXT: Dict[str, Dict[str, Tuple[str, str, str]]] = {
+    'cameras': {
+        'Beginner': ('phù hợp cho người mới', 'người mới', 'thiết kế dễ sử dụng phù hợp với người mới.'),
+        'Professional': ('lý tưởng cho chuyên nghiệp', 'chuyên nghiệp', 'chất lượng chuyên nghiệp đáp ứng yêu cầu cao.'),
+        'Sports': ('hoàn hảo cho thể thao', 'thể thao', 'hiệu suất tối ưu cho chụp thể thao.'),
+        'Video': ('tuyệt vời cho video', 'quay video', 'các tính năng chuyên biệt cho quay phim.'),
+        'Daily use': ('phù hợp dùng hàng ngày', 'sử dụng hàng ngày', 'thiết kế tiện lợi cho sử dụng hàng ngày.'),
+        'Travel': ('lý tưởng cho du lịch', 'du lịch', 'kích thước nhỏ gọn lý tưởng cho du lịch.'),
+        'Vlogging': ('hoàn hảo cho vlogging', 'vlogging', 'tính năng hoàn hảo cho người làm vlog.'),
+        'Studio': ('phù hợp cho studio', 'studio', 'chất lượng hình ảnh cao cấp cho công việc studio.'),
+    },
+    'lenses': {
+        'Landscape': ('lý tưởng cho phong cảnh', 'phong cảnh', 'góc nhìn phù hợp cho chụp phong cảnh.'),
+        'Travel': ('lý tưởng cho du lịch', 'du lịch', 'thiết kế gọn nhẹ mang theo khi du lịch.'),
+        'Portrait': ('hoàn hảo cho chân dung', 'chân dung', 'khả năng xóa phông đẹp cho ảnh chân dung.'),
+        'Sports': ('hoàn hảo cho thể thao', 'thể thao', 'hiệu suất tốt khi chụp thể thao.'),
+        'Macro': ('phù hợp cho macro', 'macro', 'khả năng chụp cận cảnh chi tiết.'),
+        'Street': ('lý tưởng cho chụp đường phố', 'đường phố', 'thiết kế kín đáo cho chụp đường phố.'),
+        'Video': ('tuyệt vời cho video', 'quay video', 'các tính năng phù hợp cho quay phim.'),
+    },
+    'drones': {
+        'Sports': ('hoàn hảo cho thể thao', 'thể thao', 'khả năng bay nhanh cho quay thể thao.'),
+        'Travel': ('lý tưởng cho du lịch', 'du lịch', 'thiết kế gọn nhẹ mang theo khi du lịch.'),
+        'Vlogging': ('hoàn hảo cho vlogging', 'vlogging', 'tính năng quay phù hợp cho người làm vlog.'),
+        'Professional': ('lý tưởng cho chuyên nghiệp', 'chuyên nghiệp', 'chất lượng hình ảnh chuyên nghiệp.'),
+        'Easy of use': ('dễ sử dụng', 'dễ sử dụng', 'điều khiển đơn giản cho người mới.'),
+    },
+    'gimbals': {
+        'Travel': ('lý tưởng cho du lịch', 'du lịch', 'thiết kế gọn nhẹ mang theo khi du lịch.'),
+        'Vlogging': ('hoàn hảo cho vlogging', 'vlogging', 'tính năng quay phù hợp cho người làm vlog.'),
+        'Professional': ('lý tưởng cho chuyên nghiệp', 'chuyên nghiệp', 'khả năng chống rung cho máy ảnh chuyên nghiệp.'),
+        'Easy of use': ('dễ sử dụng', 'dễ sử dụng', 'thao tác đơn giản cho người mới.'),
+    },
+    'action_cameras': {
+        'Travel': ('lý tưởng cho du lịch', 'du lịch', 'thiết kế nhỏ gọn mang theo khi du lịch.'),
+        'Sports': ('hoàn hảo cho thể thao', 'thể thao', 'hiệu suất tốt khi quay thể thao.'),
+        'Vlogging': ('hoàn hảo cho vlogging', 'vlogging', 'tính năng quay phù hợp cho người làm vlog.'),
+        'Durability': ('bền bỉ', 'độ bền', 'thiết kế bền bỉ cho môi trường khắc nghiệt.'),
+        'Easy of use': ('dễ sử dụng', 'dễ sử dụng', 'thao tác đơn giản cho người mới.'),
+        'Low-light Performance': ('chụp tốt trong thiếu sáng', 'thiếu sáng', 'chất lượng hình ảnh tốt trong điều kiện thiếu sáng.'),
+    },
+}
+
+NO_PURPOSE_TEXT = "là sản phẩm phù hợp với các nhu cầu cơ bản của bạn."
+GENERAL_SINGLE_TEXT = "các tính năng phù hợp với nhu cầu của bạn."
+GENERAL_MULTI_TEXT = "nhiều tính năng phù hợp cho đa dạng nhu cầu của bạn."
+
+
+def _flag_mask(values: pd.Series) -> np.ndarray:
+    numeric = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64) == 1
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        return numeric
+    text = values.astype(str).str.strip().str.lower().isin(['yes', 'true']).to_numpy()
+    return numeric | text
+
+
+def numeric_bounds(values: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """(đầu nhỏ, đầu lớn) của từng giá trị; khoảng "16-55" cho (16, 55), số x cho (x, x).
+
+    0 và giá trị không đọc được là NaN: schema điền 0 thay cho ô thiếu/không hợp lệ
+    nên 0 không được coi là đạt luật le/lt.
+    """
+    # Luôn là bản sao: cột số của catalog mmap (shared_catalog) là view chỉ đọc
+    low = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, copy=True)
+    high = low.copy()
+    if not pd.api.types.is_numeric_dtype(values.dtype):
+        ranges = values.astype(str).str.extract(r'^\s*(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*$')
+        is_range = ranges[0].notna().to_numpy()
+        low[is_range] = ranges[0][is_range].astype(np.float64).to_numpy()
+        high[is_range] = ranges[1][is_range].astype(np.float64).to_numpy()
+    low[low == 0] = np.nan
+    high[high == 0] = np.nan
+    return low, high
+
+
+def evaluate_rule(values: pd.Series, op: str, threshold: Any) -> np.ndarray:
+    """Mask bool cho một luật trên cả cột."""
+    if op == 'flag':
+        return _flag_mask(values)
+    if op in ('in', 'not'):
+        text = values.astype(str).str.strip().str.lower()
+        if op == 'in':
+            return text.isin(threshold).to_numpy() & values.notna().to_numpy()
+        return (text != threshold).to_numpy() & values.notna().to_numpy()
+    low, high = numeric_bounds(values)
+    with np.errstate(invalid='ignore'):
+        if op == 'le':
+            return low <= threshold
+        if op == 'lt':
+            return low < threshold
+        if op == 'ge':
+            return high >= threshold
+        if op == 'between':
+            return (high >= threshold[0]) & (low <= threshold[1])
+    raise ValueError(f"Unknown explanation rule op: {op}")
+
+
+class ExplanationEngine:
+    """Luật giải thích của một category đã được đánh giá trên một phiên bản catalog."""
+
+    def __init__(self, df: pd.DataFrame, category: str, memo_size: int = 50000):
+        self.category = category
+        self.purpose_text = PURPOSE_TEXT.get(category, {})
+        self.models = df['Model'].to_numpy() if 'Model' in df.columns else np.arange(len(df)).astype(str)
+        self.prices = pd.to_numeric(df['Price'], errors='coerce').to_numpy(dtype=np.float64) if 'Price' in df.columns else np.full(len(df), np.nan)
+
+        # Bảng luật đã biên dịch: purpose -> [(tiêu chí, mask, giá trị cột, mẫu)]
+        self.rules: Dict[str, List[Tuple[str, np.ndarray, np.ndarray, str]]] = {}
+        masks: Dict[Tuple[str, str, Any], np.ndarray] = {}
+        for purpose, criterion, column, op, threshold, template in EXPLANATION_RULES.get(category, []):
+            if column not in df.columns:
+                continue
+            key = (column, op, repr(threshold))
+            if key not in masks:
+                masks[key] = evaluate_rule(df[column], op, threshold)
+            self.rules.setdefault(purpose, []).append((criterion, masks[key], df[column].to_numpy(), template))
+
+        self.price_rules = PRICE_RULES.get(category, [])
+        self.memo_size = memo_size
+        self._memo: Dict[Tuple[str, Tuple[str, ...]], str] = {}
+        self._lock = threading.Lock()
+
+    def updated(self, df: pd.DataFrame, columns: Set[str]) -> 'ExplanationEngine':
+        """Engine cho df có cùng các dòng như lúc dựng, chỉ khác giá trị ở columns (vd. giá).
+
+        Mask của luật được dùng lại nếu luật không đọc cột nào trong columns;
+        bộ nhớ đệm câu giải thích luôn bắt đầu lại vì câu có thể chứa giá.
+        """
+        rule_columns = {rule[2] for rule in EXPLANATION_RULES.get(self.category, [])}
+        if rule_columns & set(columns):
+            return ExplanationEngine(df, self.category, self.memo_size)
+        engine = copy.copy(self)
+        engine.models = df['Model'].to_numpy() if 'Model' in df.columns else self.models
+        engine.prices = pd.to_numeric(df['Price'], errors='coerce').to_numpy(dtype=np.float64) if 'Price' in df.columns else self.prices
+        engine._memo = {}
+        engine._lock = threading.Lock()
+        return engine
+
+    def _features(self, position: int, purposes: Tuple[str, ...]) -> List[str]:
+        descriptions = []
+        price = self.prices[position]
+        for purpose, limit, template in self.price_rules:
+            if purpose in purposes and price < limit:
+                descriptions.append(template.format(value=int(price)))
+        matched = set()
+        for purpose in purposes:
+            for criterion, mask, values, template in self.rules.get(purpose, []):
+                if criterion in matched or not mask[position]:
+                    continue
+                matched.add(criterion)
+                descriptions.append(template.format(value=values[position]))
+        return descriptions
+
+    def _render(self, position: int, purposes: Tuple[str, ...]) -> str:
+        if not purposes:
+            return NO_PURPOSE_TEXT
+        if len(purposes) == 1:
+            explanation = self.purpose_text.get(purposes[0], (f"phù hợp cho {purposes[0].lower()}",))[0]
+        else:
+            names = [self.purpose_text[p][1] if p in self.purpose_text else p.lower() for p in purposes]
+            explanation = f"phù hợp cho {', '.join(names[:-1])} và {names[-1]}"
+
+        features = self._features(position, purposes)
+        if len(features) > 1:
+            explanation += " với " + ", ".join(features[:-1]) + ", và " + features[-1] + "."
+        elif len(features) == 1:
+            explanation += " với " + features[0] + "."
+        elif len(purposes) == 1:
+            explanation += " với " + (self.purpose_text[purposes[0]][2] if purposes[0] in self.purpose_text else GENERAL_SINGLE_TEXT)
+        else:
+            explanation += " với " + GENERAL_MULTI_TEXT
+        return explanation
+
+    def explain(self, positions: Sequence[int], purposes: Optional[Sequence[str]]) -> List[str]:
+        """Câu giải thích cho từng vị trí (theo thứ tự), có nhớ theo (model, purposes)."""
+        purposes = tuple(str(p) for p in purposes or [])
+        results = []
+        for position in positions:
+            key = (self.models[position], purposes)
+            text = self._memo.get(key)
+            if text is None:
+                text = self._render(int(position), purposes)
+                with self._lock:
+                    if len(self._memo) >= self.memo_size:
+                        self._memo.clear()
+                    self._memo[key] = text
+            results.append(text)
+        return results
@@ -0,0 +1,133 @@
+"""Số sản phẩm còn lại cho từng lựa chọn của bộ lọc (facet), tính cùng lúc với kết quả.
+
+Số đếm của một tiêu chí được tính với mọi tiêu chí khác đang chọn nhưng bỏ
+chính nó, nên người dùng thấy được nếu đổi lựa chọn đó thì còn bao nhiêu sản
+phẩm (kể cả khi lựa chọn hiện tại cho 0 kết quả). Mask "trừ một" của k tiêu
+chí lấy từ tích AND tiền tố/hậu tố: 2k phép AND thay vì k^2.
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from filters import CategoryIndex, category_filters, requirement_met
+
+PRICE_BINS = 20
+
+
+def _count(mask: np.ndarray) -> int:
+    return int(np.count_nonzero(mask))
+
+
+def _contains_options(uniques: List[str]) -> List[str]:
+    """Các giá trị dạng "5.3K/60fps, 4K/120fps" được tách thành từng lựa chọn."""
+    options = []
+    for value in uniques:
+        for token in str(value).split(','):
+            token = token.strip()
+            if token and token not in options:
+                options.append(token)
+    return options
+
+
+def _with_option(criteria: Dict[str, Any], spec: Dict[str, Any], option: str) -> Dict[str, Any]:
+    """criteria khi tiêu chí của spec được đổi sang option."""
+    return {**criteria, spec['criterion']: True if spec['type'] == 'feature' else option}
+
+
+def option_counts(index: CategoryIndex, spec: Dict[str, Any], base: np.ndarray) -> Dict[str, int]:
+    """Số sản phẩm trong base ứng với từng lựa chọn của một tiêu chí."""
+    column = spec['column']
+    kind = spec['type']
+    if kind == 'choice':
+        allowed = spec.get('allowed')
+        return {value: _count(base[positions]) for value, positions in index.inverted.get(column, {}).items()
+                if allowed is None or value in allowed}
+    if kind == 'range':
+        bounds = spec.get('bounds', ('ge', 'le'))
+        return {label: _count(base[index.range_positions(column, low, high, bounds)]) for label, (low, high) in spec['buckets'].items()}
+    if kind == 'feature':
+        return {'Yes': _count(base & index.predicate_mask(spec, True))}
+    if kind in ('flag', 'presence'):
+        return {label: _count(base & index.predicate_mask(spec, label)) for label in ('Yes', 'No')}
+    # contains
+    uniques, _ = index.text.get(column, ([], None))
+    return {option: _count(base & index.predicate_mask(spec, option)) for option in _contains_options(uniques)}
+
+
+def _histogram(prices: np.ndarray, bins: int) -> Dict[str, Any]:
+    if len(prices) == 0:
+        return {'min': None, 'max': None, 'edges': [], 'counts': []}
+    counts, edges = np.histogram(prices, bins=bins)
+    return {'min': float(prices.min()), 'max': float(prices.max()), 'edges': edges.tolist(), 'counts': counts.tolist()}
+
+
+def price_histogram(index: CategoryIndex, base: np.ndarray, bins: int = PRICE_BINS) -> Dict[str, Any]:
+    prices = index.prices[base]
+    return _histogram(prices[~np.isnan(prices)], bins)
+
+
+def facet_prices(index: CategoryIndex, criteria: Dict[str, Any], eligible: np.ndarray) -> np.ndarray:
+    """Giá (bỏ NaN) của các sản phẩm đạt mọi tiêu chí trừ khoảng giá, tức dữ liệu của histogram giá."""
+    base = eligible.copy()
+    for name, mask in index.predicate_masks(criteria):
+        if name != 'price':
+            base &= mask
+    prices = index.prices[base]
+    return prices[~np.isnan(prices)]
+
+
+def merge_facets(parts: List[Dict[str, Any]], prices: List[np.ndarray], price_bins: int = PRICE_BINS) -> Dict[str, Any]:
+    """Gộp facet của nhiều shard (store): cộng số lượng; histogram giá tính lại trên giá của mọi shard (facet_prices)."""
+    facets: Dict[str, Dict[str, int]] = {}
+    for part in parts:
+        for criterion, counts in part['facets'].items():
+            merged = facets.setdefault(criterion, {})
+            for option, count in counts.items():
+                merged[option] = merged.get(option, 0) + count
+    return {
+        'matched': sum(part['matched'] for part in parts),
+        'facets': facets,
+        'price': _histogram(np.concatenate(prices) if prices else np.empty(0), price_bins),
+    }
+
+
+def facet_counts(index: CategoryIndex, criteria: Dict[str, Any], eligible: Optional[np.ndarray] = None,
+                 price_bins: int = PRICE_BINS) -> Dict[str, Any]:
+    """Facet của mọi tiêu chí lọc của category cùng khoảng giá và histogram giá.
+
+    eligible: mask các sản phẩm đạt điều kiện ngoài bộ lọc (ngưỡng điểm theo
+    purposes); None là mọi sản phẩm. Khóa của lựa chọn dạng choice là giá trị
+    đã chuẩn hóa (chữ thường), so khớp như khi lọc.
+    """
+    if eligible is None:
+        eligible = np.ones(index.n, dtype=bool)
+    masks = index.predicate_masks(criteria)
+    prefix = [eligible]
+    for _, mask in masks:
+        prefix.append(prefix[-1] & mask)
+    without: Dict[str, np.ndarray] = {}
+    suffix = None
+    for i in range(len(masks) - 1, -1, -1):
+        name, mask = masks[i]
+        without[name] = prefix[i] if suffix is None else prefix[i] & suffix
+        suffix = mask if suffix is None else suffix & mask
+    matched = prefix[-1]
+
+    specs = category_filters(index.category)
+    required = {spec['requires'][0] for spec in specs if 'requires' in spec}
+    facets = {}
+    for spec in specs:
+        base = without.get(spec['criterion'], matched)
+        counts = option_counts(index, spec, base)
+        if spec['criterion'] in required:
+            # Lựa chọn của tiêu chí này bật/tắt tiêu chí phụ thuộc (Flipscreen -> Flipscreen Type): lọc lại cho từng lựa chọn
+            counts = {option: _count(eligible & index.mask(_with_option(criteria, spec, option))) for option in counts}
+        elif not requirement_met(spec, criteria):
+            # Chưa có hiệu lực (vd. Flipscreen Type khi chưa chọn Flipscreen): lựa chọn nào cũng giữ nguyên kết quả
+            counts = dict.fromkeys(counts, _count(base))
+        facets[spec['criterion']] = counts
+    return {
+        'matched': _count(matched),
+        'facets': facets,
+        'price': price_histogram(index, without.get('price', matched), price_bins),
+    }
@@ -0,0 +1,280 @@
+"""Bộ lọc khai báo theo category và chỉ mục lọc dựng sẵn cho mỗi phiên bản catalog.
+
+Mỗi tiêu chí trong FILTER_SCHEMAS là một dict:
+    criterion: khóa trong request.criteria
+    type:      flag     -- cột Yes/No đã mã hóa 0/1, "Yes" chọn 1, giá trị khác chọn 0
+               feature  -- tính năng đặc biệt, giá trị truthy thì yêu cầu cột = 1
+               choice   -- so khớp giá trị (không phân biệt hoa thường)
+               contains -- giá trị của cột chứa chuỗi được chọn
+               presence -- "Yes": cột khác "no", "No": cột là "no"
+               range    -- buckets: nhãn -> (min, max), bounds: phép so sánh hai đầu
+    column:    cột trong DataFrame
+"""
+import copy
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class InvalidCriteria(ValueError):
+    pass
+
+
+COMMON_FILTERS = [
+    {'criterion': 'Condition', 'type': 'choice', 'column': 'Condition', 'allowed': ['new', 'used']},
+]
+
+FILTER_SCHEMAS: Dict[str, List[Dict[str, Any]]] = {
+    'cameras': [
+        {'criterion': 'Colour', 'type': 'choice', 'column': 'Colour'},
+        {'criterion': 'Weight', 'type': 'range', 'column': 'Weight (gram)',
+         'buckets': {'Light': (None, 400), 'Medium': (400, 600), 'Heavy': (600, None)}},
+        {'criterion': 'Design Style', 'type': 'choice', 'column': 'Design Style'},
+        {'criterion': 'Resolution', 'type': 'range', 'column': 'Resolution (MP)',
+         'buckets': {'Below 20MP': (None, 20), '20-30MP': (20, 30), 'Above 30MP': (30, None)}},
+        {'criterion': '4K Video', 'type': 'flag', 'column': 'Quality 4K'},
+        {'criterion': 'ISO Max', 'type': 'range', 'column': 'ISO Max', 'bounds': ('gt', 'le'),
+         'buckets': {'General': (None, 12800), 'High': (12800, None)}},
+        {'criterion': 'Flipscreen', 'type': 'flag', 'column': 'Flipscreen'},
+        {'criterion': 'Flipscreen Type', 'type': 'choice', 'column': 'Flipscreen Type', 'requires': ('Flipscreen', 'yes')},
+        {'criterion': 'Optical Viewfinder', 'type': 'flag', 'column': 'Optical Viewfinder'},
+        {'criterion': 'Electronic Viewfinder (EVF)', 'type': 'flag', 'column': 'Electronic Viewfinder (EVF)'},
+        {'criterion': 'Weathersealing', 'type': 'feature', 'column': 'Weathersealing'},
+        {'criterion': 'IBIS', 'type': 'feature', 'column': 'IBIS'},
+        {'criterion': 'USB-C', 'type': 'feature', 'column': 'USB-C'},
+    ],
+    'lenses': [
+        {'criterion': 'Colour', 'type': 'choice', 'column': 'Colour'},
+        {'criterion': 'Lens Type', 'type': 'choice', 'column': 'Lens Type'},
+        {'criterion': 'Max Aperture', 'type': 'range', 'column': 'Max Aperture',
+         'buckets': {'Wide': (1.0, 1.8), 'Medium': (2, 2.8), 'Narrow': (3.5, 5.6)}},
+        {'criterion': 'OIS', 'type': 'flag', 'column': 'Image Stabilization (OIS)'},
+    ],
+    'drones': [
+        {'criterion': 'Weight', 'type': 'range', 'column': 'Weight (gram)', 'bounds': ('ge', 'lt'),
+         'buckets': {'Light': (None, 250), 'Medium': (250, 900)}},
+        {'criterion': 'Max Flight Time', 'type': 'range', 'column': 'Max Flight Time (minutes)', 'bounds': ('gt', 'le'),
+         'buckets': {'General': (20, 30), 'Long': (30, None)}},
+        {'criterion': 'Camera Resolution', 'type': 'choice', 'column': 'Camera Resolution'},
+        {'criterion': 'Frames Per Sec', 'type': 'choice', 'column': 'Frames Per Sec'},
+        {'criterion': 'Obstacle Avoidance Sensor', 'type': 'presence', 'column': 'Obstacle Avoidance Sensor'},
+        {'criterion': 'Maximum Flight Speed (km/h)', 'type': 'range', 'column': 'Maximum Flight Speed (km/h)',
+         'buckets': {'Slow': (None, 36), 'Moderate': (36, 54), 'Fast': (54, 72), 'Very Fast': (72, None)}},
+        {'criterion': 'Control Range (km)', 'type': 'range', 'column': 'Control Range (km)',
+         'buckets': {'Short': (None, 9), 'Medium': (10, 15), 'Long': (15, None)}},
+        {'criterion': 'Tracking', 'type': 'feature', 'column': 'Tracking'},
+        {'criterion': 'Orbit Mode', 'type': 'feature', 'column': 'Orbit Mode'},
+        {'criterion': 'Vertical Video Recording', 'type': 'feature', 'column': 'Vertical Video Recording'},
+    ],
+    'gimbals': [
+        {'criterion': 'Maximum Payload (kg)', 'type': 'range', 'column': 'Maximum Payload (kg)', 'bounds': ('gt', 'le'),
+         'buckets': {'0.3kg': (None, 0.3), '0.3-2kg': (0.3, 2), 'Above 2kg': (2, None)}},
+        {'criterion': 'Battery Life (hours)', 'type': 'range', 'column': 'Battery Life (hours)',
+         'buckets': {'Below 10h': (None, 10), 'Above 10h': (11, None)}},
+        {'criterion': 'Device Compatibility', 'type': 'choice', 'column': 'Device Compatibility'},
+        {'criterion': 'Time-lapse', 'type': 'feature', 'column': 'Time-lapse'},
+        {'criterion': 'Follow Mode', 'type': 'feature', 'column': 'Follow Mode'},
+        {'criterion': 'App Connectivity', 'type': 'feature', 'column': 'App Connectivity'},
+    ],
+    'action_cameras': [
+        {'criterion': 'Weight', 'type': 'range', 'column': 'Weight (gram)',
+         'buckets': {'Light': (None, 100), 'Medium': (100, None)}},
+        {'criterion': 'Video Recording Capabilities', 'type': 'contains', 'column': 'Video Recording Capabilities'},
+        {'criterion': 'Battery Life (minutes)', 'type': 'range', 'column': 'Battery Life (minutes)',
+         'buckets': {'Below 100 minutes': (None, 100), '100-150 minutes': (100, 150), 'Above 150 minutes': (150, None)}},
+        {'criterion': 'Time-lapse', 'type': 'feature', 'column': 'Time-lapse'},
+        {'criterion': 'Slow Motion', 'type': 'feature', 'column': 'Slow Motion'},
+        {'criterion': 'Water Resistance', 'type': 'feature', 'column': 'Water Resistance'},
+        {'criterion': 'Shock Resistance', 'type': 'feature', 'column': 'Shock Resistance'},
+    ],
+}
+
+
+def category_filters(category: str) -> List[Dict[str, Any]]:
+    return COMMON_FILTERS + FILTER_SCHEMAS.get(category, [])
+
+
+def _norm(value: Any) -> str:
+    return str(value).strip().lower()
+
+
+def _is_set(value: Any) -> bool:
+    return value is not None and value != '' and value != []
+
+
+def price_bounds(criteria: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    price_range = criteria.get('price')
+    if isinstance(price_range, (list, tuple)) and len(price_range) == 2:
+        return int(price_range[0]), int(price_range[1])
+    return None
+
+
+def requirement_met(spec: Dict[str, Any], criteria: Dict[str, Any]) -> bool:
+    """Tiêu chí có 'requires' chỉ có hiệu lực khi tiêu chí kia được chọn đúng giá trị."""
+    if 'requires' not in spec:
+        return True
+    key, expected = spec['requires']
+    return _norm(criteria.get(key, '')) == expected
+
+
+def active_criteria(category: str, criteria: Dict[str, Any]) -> List[Tuple[Dict[str, Any], Any]]:
+    """Các tiêu chí thực sự được áp dụng, kèm giá trị đã chọn."""
+    active = []
+    for spec in category_filters(category):
+        value = criteria.get(spec['criterion'])
+        if not _is_set(value) or (spec['type'] == 'feature' and not value):
+            continue
+        if 'allowed' in spec and _norm(value) not in spec['allowed']:
+            continue
+        if not requirement_met(spec, criteria):
+            continue
+        if spec['type'] == 'range' and _norm(value) not in {_norm(b) for b in spec['buckets']}:
+            raise InvalidCriteria(f"Invalid value for {spec['criterion']}: {value}")
+        active.append((spec, value))
+    return active
+
+
+class CategoryIndex:
+    """Chỉ mục lọc của một category, dựng một lần cho mỗi phiên bản catalog.
+
+    Cột Yes/No giữ dạng mask bool, cột phân loại giữ danh sách vị trí theo
+    giá trị (inverted list), cột khoảng giữ mảng đã sắp xếp để tra bằng
+    searchsorted. Một request chỉ còn là phép AND các mask.
+    """
+
+    def __init__(self, df: pd.DataFrame, category: str):
+        self.category = category
+        self.n = len(df)
+        self.flags: Dict[str, np.ndarray] = {}
+        self.inverted: Dict[str, Dict[str, np.ndarray]] = {}
+        self.sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.text: Dict[str, Tuple[List[str], np.ndarray]] = {}
+        self._index(df)
+        # Khóa phụ để xếp hạng ổn định: giá rồi thứ tự tên model
+        self.model_rank = pd.factorize(df['Model'].astype(str), sort=True)[0] if 'Model' in df.columns else np.arange(self.n)
+
+    def _index(self, df: pd.DataFrame, columns: Optional[Set[str]] = None):
+        """Dựng chỉ mục cho các cột lọc (chỉ các cột trong columns nếu có)."""
+        for spec in category_filters(self.category):
+            column = spec['column']
+            if column not in df.columns or (columns is not None and column not in columns):
+                continue
+            kind = spec['type']
+            if kind in ('flag', 'feature'):
+                self.flags[column] = pd.to_numeric(df[column], errors='coerce').to_numpy() == 1
+            elif kind == 'range':
+                self._build_sorted(column, df[column])
+            elif kind == 'choice':
+                self.inverted[column] = self._build_inverted(df[column])
+            elif kind in ('contains', 'presence'):
+                codes, uniques = pd.factorize(df[column].map(_norm, na_action='ignore'))
+                self.text[column] = (list(uniques), codes)
+        if 'Price' in df.columns and (columns is None or 'Price' in columns):
+            self._build_sorted('Price', df['Price'])
+            self.prices = pd.to_numeric(df['Price'], errors='coerce').to_numpy(dtype=np.float64)
+        elif 'Price' not in df.columns:
+            self.prices = np.zeros(self.n)
+
+    def updated(self, df: pd.DataFrame, columns: Set[str]) -> 'CategoryIndex':
+        """Chỉ mục cho df có cùng các dòng (cùng thứ tự) như lúc dựng, chỉ khác giá trị ở columns."""
+        index = copy.copy(self)
+        index.flags, index.inverted, index.sorted, index.text = dict(self.flags), dict(self.inverted), dict(self.sorted), dict(self.text)
+        index._index(df, columns)
+        return index
+
+    @property
+    def price_range(self) -> Optional[Tuple[float, float]]:
+        if 'Price' not in self.sorted or len(self.sorted['Price'][1]) == 0:
+            return None
+        values = self.sorted['Price'][1]
+        return float(values[0]), float(values[-1])
+
+    def _build_sorted(self, column: str, values: pd.Series):
+        arr = pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+        valid = np.flatnonzero(~np.isnan(arr))
+        order = valid[np.argsort(arr[valid], kind='stable')]
+        self.sorted[column] = (order, arr[order])
+
+    def _build_inverted(self, values: pd.Series) -> Dict[str, np.ndarray]:
+        codes, uniques = pd.factorize(values.map(_norm, na_action='ignore'))
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        return {u: order[bounds[i]:bounds[i + 1]] for i, u in enumerate(uniques)}
+
+    def _positions_mask(self, positions: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.n, dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def range_positions(self, column: str, low: Optional[float], high: Optional[float], bounds=('ge', 'le')) -> np.ndarray:
+        if column not in self.sorted:
+            return np.empty(0, dtype=np.intp)
+        order, values = self.sorted[column]
+        start = 0 if low is None else np.searchsorted(values, low, side='left' if bounds[0] == 'ge' else 'right')
+        end = len(values) if high is None else np.searchsorted(values, high, side='right' if bounds[1] == 'le' else 'left')
+        return order[start:end]
+
+    def range_mask(self, column: str, low: Optional[float], high: Optional[float], bounds=('ge', 'le')) -> np.ndarray:
+        return self._positions_mask(self.range_positions(column, low, high, bounds))
+
+    def predicate_mask(self, spec: Dict[str, Any], value: Any) -> np.ndarray:
+        column = spec['column']
+        kind = spec['type']
+        if kind == 'flag':
+            flag = self.flags.get(column, np.zeros(self.n, dtype=bool))
+            return flag if _norm(value) == 'yes' else ~flag
+        if kind == 'feature':
+            return self.flags.get(column, np.zeros(self.n, dtype=bool))
+        if kind == 'choice':
+            positions = self.inverted.get(column, {}).get(_norm(value))
+            return self._positions_mask(positions) if positions is not None else np.zeros(self.n, dtype=bool)
+        if kind == 'range':
+            bucket = next(b for label, b in spec['buckets'].items() if _norm(label) == _norm(value))
+            return self.range_mask(column, bucket[0], bucket[1], spec.get('bounds', ('ge', 'le')))
+        uniques, codes = self.text.get(column, ([], np.full(self.n, -1)))
+        needle = _norm(value)
+        if kind == 'contains':
+            hits = np.array([needle in u for u in uniques] + [False], dtype=bool)
+            return hits[codes]
+        # presence
+        if needle not in ('yes', 'no'):
+            return np.ones(self.n, dtype=bool)
+        is_no = np.array([u == 'no' for u in uniques] + [False], dtype=bool)[codes]
+        return ~is_no & (codes >= 0) if needle == 'yes' else is_no
+
+    def predicate_masks(self, criteria: Dict[str, Any]) -> List[Tuple[str, np.ndarray]]:
+        """Mask riêng của từng tiêu chí đang áp dụng (kể cả khoảng giá)."""
+        masks = [(spec['criterion'], self.predicate_mask(spec, value)) for spec, value in active_criteria(self.category, criteria)]
+        bounds = price_bounds(criteria)
+        if bounds is not None:
+            masks.append(('price', self.range_mask('Price', bounds[0], bounds[1])))
+        return masks
+
+    def mask(self, criteria: Dict[str, Any]) -> np.ndarray:
+        result = np.ones(self.n, dtype=bool)
+        for _, m in self.predicate_masks(criteria):
+            result &= m
+        return result
+
+    def mask_matrix(self, criteria_list: List[Dict[str, Any]]) -> np.ndarray:
+        """Mask của nhiều bộ tiêu chí cùng lúc: ma trận bool N x số sản phẩm.
+
+        Các bộ tiêu chí trong một batch thường trùng nhiều điều kiện (cùng
+        purpose, khác khoảng giá...) nên mask của mỗi điều kiện chỉ tính một lần.
+        """
+        result = np.ones((len(criteria_list), self.n), dtype=bool)
+        cache: Dict[Tuple[str, str], np.ndarray] = {}
+        for i, criteria in enumerate(criteria_list):
+            for spec, value in active_criteria(self.category, criteria):
+                key = (spec['criterion'], repr(value))
+                if key not in cache:
+                    cache[key] = self.predicate_mask(spec, value)
+                result[i] &= cache[key]
+            bounds = price_bounds(criteria)
+            if bounds is not None:
+                key = ('price', repr(bounds))
+                if key not in cache:
+                    cache[key] = self.range_mask('Price', bounds[0], bounds[1])
+                result[i] &= cache[key]
+        return result
@@ -0,0 +1,85 @@
+"""HTTP conditional caching (ETag / If-None-Match, Cache-Control) và nén response.
+
+ETag của một response gợi ý lấy từ dấu vân tay nội dung của category và khóa
+cache (hash của tiêu chí đã chuẩn hóa + phân trang...), nên tính được trước
+khi chạy lọc/tính điểm: client gửi lại ETag còn đúng thì nhận 304 không body.
+Không dùng số phiên bản vì nó là bộ đếm riêng của từng process: sau khi khởi
+động lại hoặc ở worker khác, cùng số phiên bản có thể ứng với giá/tồn kho khác.
+ETag là weak vì cùng nội dung có thể được gửi dưới nhiều Content-Encoding.
+
+Nén: br nếu có module brotli (phụ thuộc tùy chọn) và client chấp nhận, không
+thì gzip; response nhỏ hơn COMPRESS_MIN_BYTES được gửi nguyên.
+"""
+import gzip
+import os
+import time
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # không có brotli thì chỉ nén gzip
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+
+
+def etag(fingerprint: str, key: str) -> str:
+    """fingerprint: dấu vân tay nội dung dữ liệu (của một hoặc nhiều store, nối bằng '.')."""
+    return f'W/"{fingerprint}-{key[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], current: str) -> bool:
+    """If-None-Match có chứa ETag hiện tại không (so sánh weak, chấp nhận danh sách và "*")."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = current.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+
+def cache_control(last_refresh: Optional[float], refresh_interval: float, now: Optional[float] = None) -> str:
+    """Client dùng lại response tới lần làm mới catalog kế tiếp, sau đó hỏi lại bằng ETag."""
+    now = time.time() if now is None else now
+    max_age = max(0, int(last_refresh + refresh_interval - now)) if last_refresh else 0
+    return f"private, max-age={max_age}, must-revalidate"
+
+
+def _accepted(accept_encoding: str) -> Dict[str, float]:
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name.strip():
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """'br', 'gzip' hoặc None (gửi nguyên) theo header Accept-Encoding."""
+    if not accept_encoding:
+        return None
+    accepted = _accepted(accept_encoding)
+    wildcard = accepted.get('*', 0.0)
+    options = [name for name in (('br', 'gzip') if brotli is not None else ('gzip',)) if accepted.get(name, wildcard) > 0]
+    if not options:
+        return None
+    # Cùng q thì ưu tiên br (nén tốt hơn với JSON)
+    return max(options, key=lambda name: accepted.get(name, wildcard))
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Optional[bytes]:
+    """Body đã nén, hoặc None nếu không nén (không có encoding hoặc body nhỏ)."""
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return None
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
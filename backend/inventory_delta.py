@@ -0,0 +1,112 @@
+"""Cập nhật catalog theo phần inventory thay đổi thay vì tải lại toàn bộ.
+
+Mỗi dòng inventory gốc (chưa làm sạch) được băm theo Model. So với các giá
+trị băm của snapshot trước, lần tải sau biết ngay model nào được thêm, bị xóa
+hay đổi giá/màu/tình trạng; chỉ các dòng đó được làm sạch và merge lại, và chỉ
+category chứa chúng có DataFrame mới (cùng chỉ mục, cache kết quả) phải dựng lại.
+"""
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+from schema import concat_frames
+
+INVENTORY_COLUMNS = ['Model', 'Price', 'Colour', 'Condition', 'Series', 'Free Gift']
+
+
+def normalize_models(values: pd.Series) -> pd.Series:
+    return values.str.strip().str.lower()
+
+
+class InventoryState:
+    """Inventory đã dùng để dựng một snapshot.
+
+    hashes: giá trị băm của dòng gốc, index là Model đã chuẩn hóa
+    rows:   inventory đã làm sạch, mỗi model một dòng
+    specs:  thông số từng category (Model đã chuẩn hóa) trước khi merge
+    """
+
+    def __init__(self, hashes: pd.Series, rows: pd.DataFrame, specs: Dict[str, pd.DataFrame]):
+        self.hashes = hashes
+        self.rows = rows
+        self.specs = specs
+
+
+class InventoryDelta:
+    def __init__(self, added: pd.Index, removed: pd.Index, changed: pd.Index):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    @property
+    def size(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.changed)
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def summary(self) -> Dict[str, int]:
+        return {'added': len(self.added), 'removed': len(self.removed), 'changed': len(self.changed)}
+
+
+def row_hashes(raw: pd.DataFrame, models: pd.Series) -> pd.Series:
+    """Băm từng dòng gốc theo Model đã chuẩn hóa; model trùng thì giữ dòng đầu như khi merge."""
+    keep = models.notna() & ~models.duplicated()
+    hashes = pd.util.hash_pandas_object(raw.loc[keep, INVENTORY_COLUMNS[1:]], index=False)
+    return pd.Series(hashes.to_numpy(), index=pd.Index(models[keep].to_numpy(), name='Model'))
+
+
+def diff_inventory(old: pd.Series, new: pd.Series) -> InventoryDelta:
+    added = new.index.difference(old.index)
+    removed = old.index.difference(new.index)
+    common = new.index.intersection(old.index)
+    changed = common[new.reindex(common).to_numpy() != old.reindex(common).to_numpy()]
+    return InventoryDelta(added, removed, changed)
+
+
+def raw_rows(raw: pd.DataFrame, models: pd.Series, selected: pd.Index) -> pd.DataFrame:
+    """Dòng gốc (dòng đầu tiên của mỗi model) của các model được chọn."""
+    return raw[models.isin(selected) & ~models.duplicated()]
+
+
+def patch_rows(rows: pd.DataFrame, delta: InventoryDelta, cleaned: pd.DataFrame) -> pd.DataFrame:
+    """Inventory đã làm sạch sau khi áp dụng delta; cleaned là các dòng thêm mới/thay đổi."""
+    stale = delta.removed.union(delta.changed)
+    return pd.concat([rows[~rows['Model'].isin(stale)], cleaned], ignore_index=True)
+
+
+def affected_categories(state: InventoryState, delta: InventoryDelta) -> Dict[str, pd.Index]:
+    """category -> các model thay đổi có trong thông số của category đó."""
+    models = delta.added.union(delta.removed).union(delta.changed)
+    affected = {}
+    for category, specs_df in state.specs.items():
+        present = specs_df['Model'][specs_df['Model'].isin(models)]
+        if len(present):
+            affected[category] = pd.Index(present.unique())
+    return affected
+
+
+def patch_category(frame: pd.DataFrame, specs_df: pd.DataFrame, models: Iterable[str], patch: pd.DataFrame) -> pd.DataFrame:
+    """Thay các dòng của models trong frame bằng patch (đã merge), giữ thứ tự dòng của specs.
+
+    Merge inner giữ thứ tự của bảng thông số, nên kết quả phải theo thứ tự đó
+    để giống hệt lần tải đầy đủ. Khi tập model không đổi (chỉ đổi giá, màu...)
+    các dòng mới được đặt đúng vào vị trí cũ; ngược lại sắp lại theo specs.
+    """
+    stale = frame['Model'].isin(pd.Index(models)).to_numpy()
+    positions = np.flatnonzero(stale)
+    merged = concat_frames([frame, patch])
+    if len(positions) == len(patch) and np.array_equal(frame['Model'].to_numpy()[positions], patch['Model'].to_numpy()):
+        take = np.arange(len(frame))
+        take[positions] = len(frame) + np.arange(len(patch))
+        return merged.iloc[take].reset_index(drop=True)
+    take = np.concatenate([np.flatnonzero(~stale), len(frame) + np.arange(len(patch))])
+    order = pd.Series(np.arange(len(specs_df)), index=specs_df['Model']).groupby(level=0).first()
+    rank = order.reindex(merged['Model'].to_numpy()[take]).to_numpy()
+    return merged.iloc[take[np.argsort(rank, kind='stable')]].reset_index(drop=True)
+
+
+def same_rows(before: pd.DataFrame, after: pd.DataFrame) -> bool:
+    """Hai frame có cùng các model theo cùng thứ tự (cấu trúc theo vị trí dòng dùng lại được)."""
+    return len(before) == len(after) and bool(np.array_equal(before['Model'].to_numpy(), after['Model'].to_numpy()))
@@ -1,16 +1,53 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
 import numpy as np
-from functools import lru_cache
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from pydantic import BaseModel
-from io import StringIO 
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional, Dict, Any, AsyncIterator, Tuple, Union
+import asyncio
+import json
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+from bundle import BundleIndex, search as search_bundles
+from catalog import CatalogManager, CatalogNotReady, CatalogSnapshot, CatalogUpdate, frame_fingerprint
+from concurrency import Overloaded, SingleFlight, WorkerPool
+from explanations import ExplanationEngine
+from facets import facet_counts, facet_prices, merge_facets
+from filters import CategoryIndex, InvalidCriteria, active_criteria
+from http_cache import cache_control, compress, etag, etag_matches, negotiate_encoding
+from inventory_delta import (INVENTORY_COLUMNS, InventoryState, affected_categories, diff_inventory, normalize_models, patch_category,
+                             patch_rows, raw_rows, row_hashes, same_rows)
+from metrics import SIZE_BUCKETS, Registry, server_timing
+from ranking import SCORE_THRESHOLD, rank_order
+from relax import Relaxation, relax_across, relax_criteria
+from result_cache import ResultCache, cache_key, canonical_criteria
+from schema import apply_schema, json_values, memory_report
+from scoring import SCORE_EPSILON, PurposeMatrix, Purposes, purpose_names
+from shared_catalog import SharedCatalog
+from search import SearchIndex
+from similar import SimilarityIndex
+from spec_artifact import load_specs, parse_spec_table
+from sources import InventorySource, source_from_env, stores_from_env
+from tracing import QueryTracer
+
+logger = logging.getLogger(__name__)
+
+# Khởi động/dừng các thread nền (tải catalog, ghi vết) cùng vòng đời của app
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_catalog()
+    try:
+        yield
+    finally:
+        stop_catalog()
+
+app = FastAPI(lifespan=lifespan)
 # Danh sách purposes hợp lệ cho từng category
 PURPOSES_PER_CATEGORY = {
     'cameras': ['Beginner', 'Professional', 'Sports', 'Video', 'Daily Use', 'Travel', 'Vlogging', 'Studio'],
@@ -26,38 +63,43 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Client đọc ETag để gửi lại trong If-None-Match
+    expose_headers=["ETag"],
 )
 
 # Pydantic models
 class RecommendationRequest(BaseModel):
     category: str
     criteria: Dict[str, Any]
+    # Một store hoặc danh sách store (INVENTORY_STORES); None là mọi store, kết quả được gộp top-K
+    store: Optional[Union[str, List[str]]] = None
+    # Phân trang: không có limit thì trả toàn bộ kết quả
+    limit: Optional[int] = Field(default=None, ge=1, le=1000)
+    offset: int = Field(default=0, ge=0)
+    # Trả thêm số sản phẩm còn lại cho từng lựa chọn của bộ lọc và histogram giá (facets.py)
+    facets: bool = False
+    # Ít hơn min_results kết quả thì nới tập tiêu chí nhỏ nhất cần thiết và báo các tiêu chí đã nới (relax.py)
+    min_results: Optional[int] = Field(default=None, ge=1, le=1000)
 
-# Hàm load và xử lý dữ liệu
-@lru_cache(maxsize=1)
-def load_data():
-    try:
-        pd.set_option('future.no_silent_downcasting', True)
-        # 1. Tải bảng Inventory từ Google Sheets
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        # creds = ServiceAccountCredentials.from_json_keyfile_name("C:\\Users\\Admin\\Downloads\\inventoryreader-454903-25f852b85ccf.json", scope)
-        creds = ServiceAccountCredentials.from_json_keyfile_name("D:\\KLTN\\inventoryreader-454903-25f852b85ccf.json", scope)
-        client = gspread.authorize(creds)
-        sheet_url = "https://docs.google.com/spreadsheets/d/1zDG2XgHJPbtanTS-KDB2gOsCUGBtFk92JJe5EuuN8BI/edit?gid=0#gid=0"
-        sheet = client.open_by_url(sheet_url)
-        inventory_df = pd.DataFrame(sheet.worksheet("Sheet1").get_all_records())
-        # Preprocessing Inventory
-        # downcase tên cũng như price chuyển thành thập phân hết
-        inventory_df['Price'] = inventory_df['Price'].replace(r'[\$,]', '', regex=True).astype(float)
-        inventory_df['Model'] = inventory_df['Model'].str.strip().str.lower()
-        inventory_df['Colour'] = inventory_df['Colour'].str.strip().str.lower()
-        inventory_df.dropna(subset=['Model'], inplace=True)
-        # inventory_df.to_csv('inventory_log.csv', index=False)
-        # 2. Tạo DataFrame từ dữ liệu
-        specs_dfs = {}
-
-        # Cameras 
-        cameras_data = """Model,Weight (gram),Sensor Size,Resolution (MP),Quality 4K,ISO Min,ISO Max,Flipscreen,Flipscreen Type,Film Simulation,Autofocus Type,Burst Shooting (fps),External Mic Input,Optical Viewfinder,Electronic Viewfinder (EVF),USB-C,WiFi,Bluetooth,IBIS,Weathersealing,Release Year,Compatible Lens Type,Dimensions (mm),Design Style,Rangefinder-style,Battery Life (frames),Beginner,Professional,Sports,Video,Daily Use,Travel,Vlogging,Studio
+# Nhiều request trong một lần gọi; mỗi request có thể thuộc category khác nhau
+class BatchRecommendationRequest(BaseModel):
+    requests: List[RecommendationRequest] = Field(min_length=1, max_length=int(os.environ.get("RECOMMEND_BATCH_MAX", 100)))
+
+# Bộ máy ảnh + ống kính (+ gimbal) trong tổng ngân sách; mỗi thành phần có criteria (kể cả purposes) riêng
+class BundleRequest(BaseModel):
+    budget: float = Field(gt=0)
+    camera: Dict[str, Any] = Field(default_factory=dict)
+    lens: Dict[str, Any] = Field(default_factory=dict)
+    # None: bộ không kèm gimbal
+    gimbal: Optional[Dict[str, Any]] = None
+    limit: int = Field(default=10, ge=1, le=100)
+    # Bộ gợi ý trong hàng của một store; None là store đầu tiên
+    store: Optional[str] = None
+
+# Thông số kỹ thuật của từng danh mục (CSV); cột purpose là điểm phù hợp 0-1
+SPECS_CSV = {
+    # Cameras
+    'cameras': """Model,Weight (gram),Sensor Size,Resolution (MP),Quality 4K,ISO Min,ISO Max,Flipscreen,Flipscreen Type,Film Simulation,Autofocus Type,Burst Shooting (fps),External Mic Input,Optical Viewfinder,Electronic Viewfinder (EVF),USB-C,WiFi,Bluetooth,IBIS,Weathersealing,Release Year,Compatible Lens Type,Dimensions (mm),Design Style,Rangefinder-style,Battery Life (frames),Beginner,Professional,Sports,Video,Daily Use,Travel,Vlogging,Studio
 X-H2S,660,APS-C (23.5x15.6mm),26,Yes,80,51200,Yes,Full,Yes,Hybrid,15,Yes,No,Yes,Yes,Yes,Yes,Yes,Yes,2022,Fujifilm X,136x93x95,mirrorless,No,580,0.43,1.0,1.0,0.86,0.29,0.43,0.57,1.0
 X-H2,660,APS-C (23.5x15.6mm),40,Yes,125,12800,Yes,Full,Yes,Hybrid,15,Yes,No,Yes,Yes,Yes,Yes,Yes,Yes,2022,Fujifilm X,136x93x95,mirrorless,No,680,0.43,1.0,0.71,0.86,0.29,0.57,0.57,0.86
 X-T5,557,APS-C (23.5x15.6mm),40,Yes,125,12800,Yes,Tilt,Yes,Hybrid,15,Yes,No,Yes,Yes,Yes,Yes,Yes,Yes,2022,Fujifilm X,130x91x64,mirrorless,No,580,0.29,1.0,0.71,0.71,0.71,0.57,0.57,0.86
@@ -85,11 +127,9 @@ GFX 100,1400,Medium Format (43.8x32.9mm),102,Yes,100,102400,Yes,Full,Yes,Contras
 GFX 50R,775,Medium Format (43.8x32.9mm),51.4,No,100,102400,No,,Yes,Contrast Detection,3,Yes,No,Yes,Yes,Yes,Yes,No,Yes,2018,GF lenses,161x97x66,mirrorless,Yes,400,0.0,0.86,0.29,0.43,0.29,0.29,0.29,0.86
 GFX 100RF,735,Medium Format (43.8x32.9mm),102,Yes,100,12800,Yes,Tilt,Yes,Hybrid,5,Yes,Yes,Yes,Yes,Yes,Yes,No,Yes,2025,Fixed (35mm equiv.),133x90x76,mirrorless,Yes,820,0.0,0.86,0.29,0.71,0.14,0.57,0.57,1.0
 X-M5,355,APS-C (23.5x15.6mm),26,Yes,160,12800,Yes,Full,Yes,Hybrid,10,Yes,No,No,Yes,Yes,Yes,No,No,2024,Fujifilm X,112x64x38,mirrorless,No,300,1.0,0.0,0.0,0.71,1.0,0.86,0.86,0.29
-X-Pro4,450,APS-C (23.5x15.6mm),40.2,Yes,160,12800,Yes,Full,Yes,Hybrid,15,Yes,Yes,Yes,Yes,Yes,Yes,Yes,Yes,2025,Fujifilm X,128x75x54,mirrorless,Yes,450,0.29,0.86,0.43,0.71,0.57,0.57,0.43,0.71"""
-        specs_dfs['cameras'] = pd.read_csv(StringIO(cameras_data))
-
-        # Lenses 
-        lenses_data = """Model,Lens Type,Focal Length (mm),Max Aperture,Image Stabilization (OIS),Weight (gram),Filter Size (mm),Mount Type,Release Year,Landscape,Travel,Portrait,Sports,Macro,Street,Video,Minimum Focusing Distance (mm)
+X-Pro4,450,APS-C (23.5x15.6mm),40.2,Yes,160,12800,Yes,Full,Yes,Hybrid,15,Yes,Yes,Yes,Yes,Yes,Yes,Yes,Yes,2025,Fujifilm X,128x75x54,mirrorless,Yes,450,0.29,0.86,0.43,0.71,0.57,0.57,0.43,0.71""",
+    # Lenses
+    'lenses': """Model,Lens Type,Focal Length (mm),Max Aperture,Image Stabilization (OIS),Weight (gram),Filter Size (mm),Mount Type,Release Year,Landscape,Travel,Portrait,Sports,Macro,Street,Video,Minimum Focusing Distance (mm)
 XF 8mm f/3.5 R WR,Fixed,8,3.5,No,215,62,X-mount,2023,1.0,0.86,0.14,0.14,0.29,0.71,0.86,20
 XF 14mm f/2.8 R,Fixed,14,2.8,No,235,58,X-mount,2012,0.86,0.71,0.14,0.29,0.29,0.86,0.71,18
 XF 16mm f/1.4 R WR,Fixed,16,1.4,No,375,67,X-mount,2015,1.0,0.86,0.57,0.43,0.71,1.0,0.86,15
@@ -126,11 +166,9 @@ Viltrox AF 23mm f/1.4 for Fujifilm,Fixed,23,1.4,No,320,52,X-mount,2020,0.71,0.86
 TTArtisan 23mm f/1.8,Fixed,23,1.8,No,200,49,X-mount,2025,0.57,0.86,0.71,0.0,0.29,1.0,0.43,20
 TTArtisan 27mm f/2.8,Fixed,27,2.8,No,100,39,X-mount,2023,0.71,1.0,0.57,0.0,0.29,1.0,0.43,35
 TTArtisan 35mm f/1.8,Fixed,35,1.8,No,220,52,X-mount,2023,0.71,0.86,0.86,0.14,0.14,1.0,0.43,35
-TTArtisan 56mm f/1.8,Fixed,56,1.8,No,300,52,X-mount,2024,0.57,0.71,0.86,0.14,0.29,0.57,0.43,50"""
-        specs_dfs['lenses'] = pd.read_csv(StringIO(lenses_data))
-
-        # Drones 
-        drones_data = """Model,Weight (gram),Max Flight Time (minutes),Control Range (km),Camera Resolution,Frames Per Sec,Obstacle Avoidance Sensor,Folded Size (mm),Tracking,Orbit Mode,Auto Rotation,Wind Resistance,Battery Capability (mAh),Maximum Flight Speed (km/h),Vertical Video Recording,Release Year,Stability,Sports,Travel,Vlogging,Professional,Easy Of Use
+TTArtisan 56mm f/1.8,Fixed,56,1.8,No,300,52,X-mount,2024,0.57,0.71,0.86,0.14,0.29,0.57,0.43,50""",
+    # Drones
+    'drones': """Model,Weight (gram),Max Flight Time (minutes),Control Range (km),Camera Resolution,Frames Per Sec,Obstacle Avoidance Sensor,Folded Size (mm),Tracking,Orbit Mode,Auto Rotation,Wind Resistance,Battery Capability (mAh),Maximum Flight Speed (km/h),Vertical Video Recording,Release Year,Stability,Sports,Travel,Vlogging,Professional,Easy Of Use
 DJI Flip,249,25,13,4K,30fps,"Downward,  Front-facing",138 x 81 x 58,Yes,Yes,No,Level 5 wind (38.5 km/h),2450,50,Yes,2025,0.71,0.57,0.86,1.0,0.57,1.0
 DJI Mini 3,249,38,10,4K,30fps,No,148 x 94 x 64,Yes,Yes,No,Level 5 wind (38.5 km/h),2450,57,Yes,2023,0.71,0.43,0.86,0.71,0.43,0.86
 DJI Mini 4 Pro,249,30,20,4K,60fps,Omnidirectional,148 x 94 x 64,Yes,Yes,Yes,Level 5 wind (38.5 km/h),2450,58,Yes,2023,0.86,0.86,0.86,1.0,0.71,0.86
@@ -140,11 +178,9 @@ DJI Avata 2,410,21,10,4K,60fps,Omnidirectional,180 x 180 x 80,Yes,Yes,Yes,Level
 DJI Mini 4K,249,30,10,4K,30fps,"Downward,  Front-facing",148 x 94 x 64,Yes,Yes,No,Level 5 wind (38.5 km/h),2450,54,Yes,2024,0.71,0.43,0.86,0.57,0.29,0.86
 DJI Mavic 3 Pro,895,43,15,5.1K,50fps,Omnidirectional,231 x 98 x 95,Yes,Yes,Yes,Level 6 wind (50 km/h),5000,69,No,2023,1.0,1.0,0.57,0.71,1.0,0.71
 DJI Air 2S,595,31,12,5.4K,30fps,"Downward,  Forward, Backward",183 x 253 x 77,Yes,Yes,Yes,Level 5 wind (38.5 km/h),3500,68,No,2021,0.86,0.71,0.57,0.71,0.71,0.86
-DJI Mavic 3 Classic,895,46,15,5.1K,50fps,No,231 x 98 x 95,Yes,Yes,Yes,Level 6 wind (50 km/h),5000,69,No,2022,1.0,1.0,0.57,0.71,0.86,0.71"""
-        specs_dfs['drones'] = pd.read_csv((StringIO(drones_data)))
-
-        # Gimbals 
-        gimbals_data = """Model,Maximum Payload (kg),Battery Life (hours),Number of Stabilization Axes,Device Compatibility,Time-lapse,Follow Mode,App Connectivity,Folded Size (mm),Release Year,Stability,Travel,Vlogging,Professional,Easy Of Use
+DJI Mavic 3 Classic,895,46,15,5.1K,50fps,No,231 x 98 x 95,Yes,Yes,Yes,Level 6 wind (50 km/h),5000,69,No,2022,1.0,1.0,0.57,0.71,0.86,0.71""",
+    # Gimbals
+    'gimbals': """Model,Maximum Payload (kg),Battery Life (hours),Number of Stabilization Axes,Device Compatibility,Time-lapse,Follow Mode,App Connectivity,Folded Size (mm),Release Year,Stability,Travel,Vlogging,Professional,Easy Of Use
 Osmo Mobile 7,0.3,10,3,phone,Yes,Yes,Yes,290x110x50,2025,0.86,0.86,0.86,0.71,0.86
 Osmo Mobile 7P,0.3,10,3,phone,Yes,Yes,Yes,190x95x46,2025,1.0,0.86,1.0,0.86,1.0
 Osmo Mobile 6,0.3,6,3,phone,Yes,Yes,Yes,290x110x50,2022,0.86,0.71,0.86,0.71,0.86
@@ -152,686 +188,1163 @@ Osmo Mobile SE,0.3,8,3,phone,Yes,Yes,Yes,290x110x50,2022,0.71,0.86,0.57,0.43,0.7
 RS4 Mini,2,10,3,small camera,Yes,Yes,Yes,340x250x70,2025,0.71,0.57,0.57,0.71,0.71
 RS4 Pro,4.5,12,3,full-frame camera,Yes,Yes,Yes,340x250x70,2024,1.0,0.43,0.43,1.0,0.57
 RS4,3,11,3,full-frame camera,Yes,Yes,Yes,340x250x70,2024,0.86,0.43,0.43,0.86,0.57
-RS3 Pro,4.5,12,3,full-frame camera,Yes,Yes,Yes,340x250x70,2022,1.0,0.43,0.43,1.0,0.57"""
-        specs_dfs['gimbals'] = pd.read_csv(StringIO(gimbals_data))
-
-        # Action Cameras 
-        action_cameras_data = """Model,Weight (gram),Video Recording Capabilities,Time-lapse,Slow Motion,Dimensions (mm),Battery Life (minutes),Touchscreen,Dual Screen,Wifi,Bluetooth,USB-C,Shock Resistance,Water Resistance,Release Year,Stability,Travel,Sports,Vlogging,Durability,Easy Of Use,Low-light Performance
+RS3 Pro,4.5,12,3,full-frame camera,Yes,Yes,Yes,340x250x70,2022,1.0,0.43,0.43,1.0,0.57""",
+    # Action Cameras
+    'action_cameras': """Model,Weight (gram),Video Recording Capabilities,Time-lapse,Slow Motion,Dimensions (mm),Battery Life (minutes),Touchscreen,Dual Screen,Wifi,Bluetooth,USB-C,Shock Resistance,Water Resistance,Release Year,Stability,Travel,Sports,Vlogging,Durability,Easy Of Use,Low-light Performance
 Osmo Pocket 3,179,4K/120fps,Yes,Yes,140 x 40 x 30,140,Yes,No,Yes,Yes,Yes,No,No,2023,0.86,0.86,0.57,1.0,0.43,0.86,0.86
 Osmo Pocket 2,117,4K/60fps,Yes,Yes,124 x 35 x 30,140,Yes,No,Yes,Yes,Yes,No,No,2020,0.86,0.86,0.43,0.86,0.43,0.71,0.57
 Osmo Action 5,145,"5.3K/60fps, 4K/120fps",Yes,Yes,70.5 x 44.2 x 32.8,160,Yes,Yes,Yes,Yes,Yes,Yes,Yes,2024,0.86,0.71,0.71,0.86,1.0,0.86,0.86
 Osmo Action 4,145,4K/120fps,Yes,Yes,70.5 x 44.2 x 32.8,160,Yes,Yes,Yes,Yes,Yes,Yes,Yes,2023,0.86,0.71,0.57,0.71,0.86,0.71,0.71
 Osmo Action 3,145,4K/120fps,Yes,Yes,70.5 x 44.2 x 32.8,160,Yes,Yes,Yes,Yes,Yes,Yes,Yes,2022,0.86,0.71,0.57,0.71,0.86,0.71,0.57
-Osmo Action 2,56,4K/60fps,Yes,Yes,39 x 39 x 22,70,Yes,No,Yes,Yes,Yes,Yes,Yes,2021,0.71,0.57,0.43,0.57,0.71,0.57,0.57"""
-        specs_dfs['action_cameras'] = pd.read_csv(StringIO(action_cameras_data))
-        
+Osmo Action 2,56,4K/60fps,Yes,Yes,39 x 39 x 22,70,Yes,No,Yes,Yes,Yes,Yes,Yes,2021,0.71,0.57,0.43,0.57,0.71,0.57,0.57""",
+}
 
-        # 3. Tiền xử lý dữ liệu cho từng danh mục
-        for category, specs_df in specs_dfs.items():
-
-            specs_df['Model'] = specs_df['Model'].str.strip().str.lower()
-
-            # Mã hóa các cột Yes/No
-            yes_no_cols = [
-                "Quality 4K", "Flipscreen", "Film Simulation", "External Mic Input", "Optical Viewfinder", "Electronic Viewfinder (EVF)", "USB-C", "Wifi", "Bluetooth", "IBIS",
-                "Weathersealing", "Rangefinder-style",  
-                "Image Stabilization (OIS)", "Tracking", "Orbit Mode", "Auto Rotation", "Vertical Video Recording",
-                "Time-lapse", "Follow Mode", "App Connectivity",
-                "Slow Motion", "Dual Screen", "Shock Resistance", "Water Resistance",
-            ]
-            for col in yes_no_cols:
-                if col in specs_df.columns:
-                    specs_df[col] = specs_df[col].str.strip().str.capitalize().map({'Yes': 1, 'No': 0}).fillna(0).astype('int')
-
-            # Chuẩn hóa cột số
-            numeric_cols = [
-                "Weight (gram)", "Resolution (MP)", "ISO Min", "ISO Max","Release Year"
-                "Burst Shooting (fps)", "Battery Life (frames)", "Focal Length (mm)", 
-                "Max Aperture", "Minimum Focusing Distance (mm)", "Max Flight Time (minutes)", 
-                "Control Range (km)", "Battery Capability (mAh)", "Maximum Flight Speed (km/h)", 
-                "Maximum Payload (kg)", "Battery Life (hours)", "Battery Life (minutes)", 
-                "Number of Stabilization Axes"
-            ]
-            for col in numeric_cols:
-                if col in specs_df.columns:
-                    specs_df[col] = pd.to_numeric(specs_df[col], errors='coerce')
-                    specs_df[col] = specs_df[col].fillna(0)
-
-            # Merge với Inventory
-            inventory_df_unique = inventory_df.drop_duplicates(subset=['Model']) 
-
-            specs_df = pd.merge(
-                specs_df,
-                inventory_df_unique[['Model', 'Price', 'Colour', 'Condition', 'Series', 'Free Gift']],
-                on='Model',
-                how='inner'  
-            )
+# Tải bảng Inventory (Google Sheets, file hoặc dữ liệu cố định) dưới dạng dòng gốc
+def fetch_inventory(source: Optional[InventorySource] = None) -> pd.DataFrame:
+    if source is None:
+        source = inventory_source
+    stage_start = time.perf_counter()
+    inventory_df = pd.DataFrame(source.fetch_records())
+    LOAD_SECONDS.observe(time.perf_counter() - stage_start, stage='fetch', category='inventory')
+    return inventory_df
+
+# Preprocessing Inventory: mỗi model một dòng với các cột dùng khi merge
+def clean_inventory(inventory_df: pd.DataFrame) -> pd.DataFrame:
+    inventory_df = inventory_df.copy()
+    # downcase tên cũng như price chuyển thành thập phân hết
+    inventory_df['Price'] = inventory_df['Price'].replace(r'[\$,]', '', regex=True).astype(float)
+    inventory_df['Model'] = normalize_models(inventory_df['Model'])
+    inventory_df['Colour'] = inventory_df['Colour'].str.strip().str.lower()
+    inventory_df.dropna(subset=['Model'], inplace=True)
+    # inventory_df.to_csv('inventory_log.csv', index=False)
+    return inventory_df.drop_duplicates(subset=['Model'])[INVENTORY_COLUMNS]
+
+# Thông số biên dịch sẵn (python spec_artifact.py); để trống thì luôn parse SPECS_CSV
+SPECS_ARTIFACT_PATH = os.environ.get("SPECS_ARTIFACT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "specs_compiled.rcs")) or None
+
+# Tạo DataFrame thông số từ dữ liệu (hoặc thông số được truyền vào, vd. catalog tổng hợp để benchmark)
+def parse_specs(specs: Optional[Dict[str, pd.DataFrame]] = None) -> Dict[str, pd.DataFrame]:
+    if specs is None:
+        # File biên dịch: một lần mmap, các cột đã đúng kiểu theo schema
+        stage_start = time.perf_counter()
+        compiled = load_specs(SPECS_ARTIFACT_PATH, SPECS_CSV)
+        if compiled is not None:
+            LOAD_SECONDS.observe(time.perf_counter() - stage_start, stage='parse', category='compiled')
+            return compiled
+    specs_dfs = {}
+    for category, data in (SPECS_CSV if specs is None else specs).items():
+        stage_start = time.perf_counter()
+        if specs is None:
+            specs_df = parse_spec_table(category, data)
+        else:
+            specs_df = data.copy()
+            specs_df['Model'] = normalize_models(specs_df['Model'])
+        specs_dfs[category] = specs_df
+        LOAD_SECONDS.observe(time.perf_counter() - stage_start, stage='parse', category=category)
+    return specs_dfs
+
+# Merge thông số của một category với Inventory rồi áp schema
+def merge_inventory(category: str, specs_df: pd.DataFrame, inventory_df: pd.DataFrame) -> pd.DataFrame:
+    specs_df = pd.merge(
+        specs_df,
+        inventory_df,
+        on='Model',
+        how='inner'  
+    )
+
+    specs_df['Colour'] = specs_df['Colour'].fillna('black').str.lower()
 
-            specs_df['Colour'] = specs_df['Colour'].fillna('black').str.lower()
+    # Kiểu dữ liệu theo schema của category (cờ uint8, điểm float32, categorical...)
+    # specs_df.to_csv(f'{category}_specs_log.csv', index=False)
+    return apply_schema(specs_df, category)
 
-            specs_dfs[category] = specs_df
-           # specs_df.to_csv(f'{category}_specs_log.csv', index=False)
+def build_catalog(raw_inventory: pd.DataFrame, specs_dfs: Dict[str, pd.DataFrame]) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    inventory_df = clean_inventory(raw_inventory)
+    frames = {}
+    for category, specs_df in specs_dfs.items():
+        stage_start = time.perf_counter()
+        frames[category] = merge_inventory(category, specs_df, inventory_df)
+        LOAD_SECONDS.observe(time.perf_counter() - stage_start, stage='merge', category=category)
+    return frames, inventory_df
+
+# Hàm load và xử lý dữ liệu
+def load_data(source: Optional[InventorySource] = None, specs: Optional[Dict[str, pd.DataFrame]] = None):
+    try:
+        pd.set_option('future.no_silent_downcasting', True)
+        specs_dfs, _ = build_catalog(fetch_inventory(source), parse_specs(specs))
         return specs_dfs
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi tải dữ liệu: {str(e)}")
 
+# Tải đầy đủ, kèm trạng thái inventory để lần sau chỉ cập nhật phần thay đổi
+def load_catalog(source: Optional[InventorySource] = None) -> CatalogUpdate:
+    pd.set_option('future.no_silent_downcasting', True)
+    raw_inventory = fetch_inventory(source)
+    specs_dfs = parse_specs()
+    frames, inventory_df = build_catalog(raw_inventory, specs_dfs)
+    hashes = row_hashes(raw_inventory, normalize_models(raw_inventory['Model']))
+    return CatalogUpdate(frames, inventory=InventoryState(hashes, inventory_df, specs_dfs), summary={'inventory_rows': len(inventory_df)})
 
-# Hàm xử lý filter cho từng category
-def apply_filters(df: pd.DataFrame, category: str, criteria: Dict[str, Any]) -> pd.DataFrame:
-    # Lọc theo tình trạng (condition) cho tất cả các category
-    if 'Condition' in criteria and criteria['Condition']:
-        condition = criteria['Condition'].lower()
-        if condition in ['new', 'used']:
-            df = df[df['Condition'].str.lower() == condition] 
-    # Lọc màu cho cameras, lenses
-    if category in ['cameras', 'lenses'] and 'Colour' in criteria and criteria['Colour']:
-        df = df[df['Colour'] == criteria['Colour'].lower()]
-    # Lọc theo category
-    if category == 'cameras':
-        # Weight, done
-        if 'Weight' in criteria:
-            weight_map = {
-                'Light': (None, 400),
-                'Medium': (400, 600),
-                'Heavy': (600, None)
-            }
-            min_w, max_w = weight_map[criteria['Weight']]
-            if min_w: df = df[df['Weight (gram)'] >= min_w]
-            if max_w: df = df[df['Weight (gram)'] <= max_w]
-        
+# Delta lớn hơn tỉ lệ này (so với số model trong inventory) thì dựng lại toàn bộ
+INVENTORY_DELTA_MAX_RATIO = float(os.environ.get("INVENTORY_DELTA_MAX_RATIO", 0.5))
 
-        # Design Style, done
-        if 'Design Style' in criteria:
-            df = df[df['Design Style'] == criteria['Design Style']]
-        
-        # Resolution, done
-        if 'Resolution' in criteria:
-            res_map = {
-                'Below 20MP': (None, 20),
-                '20-30MP': (20, 30),
-                'Above 30MP': (30, None)
-            }
-            min_res, max_res = res_map[criteria['Resolution']]
-            if min_res: df = df[df['Resolution (MP)'] >= min_res]
-            if max_res: df = df[df['Resolution (MP)'] <= max_res]
-
-        # 4K Video, done
-        if '4K Video' in criteria:
-            k_map = {
-                'Yes': 1,
-                'No': 0
-            }
-            df = df[df['Quality 4K'] == k_map[criteria['4K Video']]]
-    
-        # df.to_csv(f'{category}_specs_log.csv', index=False)
-        
-        # ISO Max
-        if 'ISO Max' in criteria:
-            iso_map = {
-                'General': (None, 12800),
-                'High': (12800, None)
-            }
-            min_iso, max_iso = iso_map[criteria['ISO Max']]
-            if min_iso: df = df[df['ISO Max'] > min_iso]
-            if max_iso: df = df[df['ISO Max'] <= max_iso]
-
-            df.to_csv(f'{category}_specs_log.csv', index=False)
-        
-        # Flipscreen
-        if 'Flipscreen' in criteria:
-            if criteria['Flipscreen'] == 'Yes':
-                df = df[df['Flipscreen'] == 1]
-                if 'Flipscreen Type' in criteria:
-                    df = df[df['Flipscreen Type'] == criteria['Flipscreen Type']]
-            else:
-                df = df[df['Flipscreen'] == 0]
-
-        # Viewfinder
-        if 'Optical Viewfinder' in criteria:
-            df = df[df['Optical Viewfinder'] == (1 if criteria['Optical Viewfinder'] == 'Yes' else 0)]
-        if 'Electronic Viewfinder (EVF)' in criteria:
-            df = df[df['Electronic Viewfinder (EVF)'] == (1 if criteria['Electronic Viewfinder (EVF)'] == 'Yes' else 0)]
-
-        # Special Features
-        special_features = {
-            'Weathersealing': 'Weathersealing',
-            'IBIS': 'IBIS',
-            'USB-C': 'USB-C'
-        }
-        for feature, col in special_features.items():
-            if feature in criteria and criteria[feature]:
-                df = df[df[col] == 1]
-    # done filter camera
-    elif category == 'lenses':
-        # Lens Type
-        if 'Lens Type' in criteria:
-            df = df[df['Lens Type'] == criteria['Lens Type']]
-        
-        # Max Aperture
-        if 'Max Aperture' in criteria:
-            aperture_map = {
-                'Wide': (1.0, 1.8),
-                'Medium': (2, 2.8),
-                'Narrow': (3.5, 5.6)
-            }
-            min_ap, max_ap = aperture_map[criteria['Max Aperture']]
-            if min_ap: df = df[df['Max Aperture'] >= min_ap]
-            if max_ap: df = df[df['Max Aperture'] <= max_ap]
-
-        # OIS
-        if 'OIS' in criteria:
-            df = df[df['Image Stabilization (OIS)'] == (1 if criteria['OIS'] == 'Yes' else 0)]
-
-    # done filter lens
-
-    elif category == 'drones':
-        # Weight
-        if 'Weight' in criteria:
-            weight_map = {
-                'Light': (None, 250),
-                'Medium': (250, 900)
-            }
-            min_w, max_w = weight_map[criteria['Weight']]
-            if min_w: df = df[df['Weight (gram)'] >= min_w]
-            if max_w: df = df[df['Weight (gram)'] < max_w]
-
-        # Max Flight Time
-        if 'Max Flight Time' in criteria:
-            flight_time_map = {
-                'General': (20, 30),
-                'Long': (30, None)
-            }
-            min_ft, max_ft = flight_time_map[criteria['Max Flight Time']]
-            if min_ft: df = df[df['Max Flight Time (minutes)'] > min_ft]
-            if max_ft: df = df[df['Max Flight Time (minutes)'] <= max_ft]
-
-        # Camera Resolution
-        if 'Camera Resolution' in criteria:
-            df = df[df['Camera Resolution'] == criteria['Camera Resolution']]
-        
-        # Frames per sec
-        if 'Frames Per Sec' in criteria:
-            df = df[df['Frames Per Sec'] == criteria['Frames Per Sec']]
-
-        # Obstacle Avoidance Sensor
-        if 'Obstacle Avoidance Sensor' in criteria:
-            sensor_criteria = criteria['Obstacle Avoidance Sensor']
-            
-            if 'Obstacle Avoidance Sensor' in df.columns:
-                if sensor_criteria == 'Yes':
-                    df = df[df['Obstacle Avoidance Sensor'].str.strip().str.lower() != 'no']
-                elif sensor_criteria == 'No':
-                    df = df[df['Obstacle Avoidance Sensor'].str.strip().str.lower() == 'no']
+# Cập nhật theo delta: chỉ làm sạch/merge lại các model thêm mới, bị xóa hoặc thay đổi
+def update_catalog(previous: CatalogSnapshot, source: Optional[InventorySource] = None) -> Optional[CatalogUpdate]:
+    state: InventoryState = previous.inventory
+    raw_inventory = fetch_inventory(source)
+    stage_start = time.perf_counter()
+    models = normalize_models(raw_inventory['Model'])
+    hashes = row_hashes(raw_inventory, models)
+    delta = diff_inventory(state.hashes, hashes)
+    LOAD_SECONDS.observe(time.perf_counter() - stage_start, stage='diff', category='inventory')
+    if not delta:
+        return None
+    if delta.size > INVENTORY_DELTA_MAX_RATIO * max(1, len(hashes)):
+        frames, inventory_df = build_catalog(raw_inventory, state.specs)
+        return CatalogUpdate(frames, inventory=InventoryState(hashes, inventory_df, state.specs),
+                             summary={**delta.summary(), 'inventory_rows': len(inventory_df)})
 
-        
-        # Maximum Flight Speed
-        if 'Maximum Flight Speed (km/h)' in criteria:
-            speed_map = {
-                'Slow': (None, 36),
-                'Moderate': (36, 54),
-                'Fast': (54, 72),
-                'Very Fast': (72, None)
-            }
-            min_speed, max_speed = speed_map[criteria['Maximum Flight Speed (km/h)']]
-            if min_speed: df = df[df['Maximum Flight Speed (km/h)'] >= min_speed]
-            if max_speed: df = df[df['Maximum Flight Speed (km/h)'] <= max_speed]
-
-        # Control Range
-        if 'Control Range (km)' in criteria:
-            range_map = {
-                'Short': (None, 9),
-                'Medium': (10, 15),
-                'Long': (15, None)
-            }
-            min_range, max_range = range_map[criteria['Control Range (km)']]
-            if min_range: df = df[df['Control Range (km)'] >= min_range]
-            if max_range: df = df[df['Control Range (km)'] <= max_range]
-
-        # Special Features
-        special_features = {
-            'Tracking': 'Tracking',
-            'Orbit Mode': 'Orbit Mode',
-            'Vertical Video Recording': 'Vertical Video Recording'
-        }
-        for feature, col in special_features.items():
-            if feature in criteria and criteria[feature]:
-                df = df[df[col] == 1]
+    cleaned = clean_inventory(raw_rows(raw_inventory, models, delta.added.union(delta.changed)))
+    inventory_df = patch_rows(state.rows, delta, cleaned)
+    frames = dict(previous.specs_dfs)
+    affected = affected_categories(state, delta)
+    derived = {}
+    for category, changed_models in affected.items():
+        stage_start = time.perf_counter()
+        specs_df = state.specs[category]
+        patch = merge_inventory(category, specs_df[specs_df['Model'].isin(changed_models)], cleaned)
+        frame = frames[category] = apply_schema(patch_category(previous[category], specs_df, changed_models, patch), category)
+        # Cùng các model theo cùng thứ tự: chỉ các cột lấy từ Inventory đổi, ma trận điểm
+        # (chỉ phụ thuộc thông số) dùng lại, chỉ mục lọc và luật giải thích chỉ dựng lại phần liên quan
+        if same_rows(previous[category], frame):
+            derived[('purpose_matrix', category)] = purpose_matrix(previous, category)
+            derived[('similarity', category)] = similarity_index(previous, category)
+            derived[('filter_index', category)] = category_index(previous, category).updated(frame, set(INVENTORY_COLUMNS))
+            derived[('explanations', category)] = explanation_engine(previous, category).updated(frame, set(INVENTORY_COLUMNS))
+        LOAD_SECONDS.observe(time.perf_counter() - stage_start, stage='patch', category=category)
+    logger.info("Inventory delta %s patched categories %s", delta.summary(), sorted(affected))
+    return CatalogUpdate(frames, changed=affected, inventory=InventoryState(hashes, inventory_df, state.specs), derived=derived,
+                         summary={**delta.summary(), 'categories': sorted(affected), 'inventory_rows': len(inventory_df)})
+
+# Dấu vân tay nội dung của category, dùng cho ETag: ổn định qua khởi động lại và giữa các worker
+def category_fingerprint(snapshot: CatalogSnapshot, category: str) -> str:
+    return snapshot.derived(('fingerprint', category), lambda: frame_fingerprint(snapshot[category]))
+
+def category_index(snapshot: CatalogSnapshot, category: str) -> CategoryIndex:
+    return snapshot.derived(('filter_index', category), lambda: CategoryIndex(snapshot[category], category))
+
+def purpose_matrix(snapshot: CatalogSnapshot, category: str) -> PurposeMatrix:
+    return snapshot.derived(('purpose_matrix', category), lambda: PurposeMatrix(snapshot[category], PURPOSES_PER_CATEGORY.get(category, [])))
+
+def explanation_engine(snapshot: CatalogSnapshot, category: str) -> ExplanationEngine:
+    return snapshot.derived(('explanations', category), lambda: ExplanationEngine(snapshot[category], category))
+
+def similarity_index(snapshot: CatalogSnapshot, category: str) -> SimilarityIndex:
+    return snapshot.derived(('similarity', category), lambda: SimilarityIndex(snapshot[category], category))
+
+# Thành phần của bộ: (tên trong request, category); chỉ mục ghép bộ phụ thuộc cả ba category nên được dựng lại ở mỗi phiên bản
+BUNDLE_PARTS = [('camera', 'cameras'), ('lens', 'lenses'), ('gimbal', 'gimbals')]
+
+def bundle_index(snapshot: CatalogSnapshot) -> BundleIndex:
+    return snapshot.derived(('bundle_index', 'cameras+lenses+gimbals'), lambda: BundleIndex(
+        snapshot['cameras'], snapshot['lenses'], snapshot['gimbals'] if 'gimbals' in snapshot else None))
+
+# Chỉ mục trigram tên model của mọi category; gồm cả model có thông số nhưng chưa có trong inventory nếu snapshot còn trạng thái inventory
+def search_index(snapshot: CatalogSnapshot) -> SearchIndex:
+    return snapshot.derived(('search_index', 'all'), lambda: SearchIndex(
+        snapshot.specs_dfs, snapshot.inventory.specs if snapshot.inventory is not None else None))
+
+# Tên inventory không khớp dòng thông số nào; None nếu snapshot không còn inventory (đọc từ đĩa/thư mục chung)
+def name_mismatches(snapshot: CatalogSnapshot) -> Optional[Dict[str, Any]]:
+    if snapshot.inventory is None:
+        return None
+    return snapshot.derived(('name_mismatches', 'all'), lambda: search_index(snapshot).mismatches(snapshot.inventory.rows['Model']))
+
+# Dựng sẵn chỉ mục cho snapshot mới trước khi đưa vào phục vụ
+def prepare_snapshot(snapshot: CatalogSnapshot):
+    for category in snapshot.specs_dfs:
+        category_fingerprint(snapshot, category)
+        category_index(snapshot, category)
+        purpose_matrix(snapshot, category)
+        explanation_engine(snapshot, category)
+        similarity_index(snapshot, category)
+    if 'cameras' in snapshot and 'lenses' in snapshot:
+        bundle_index(snapshot)
+    search_index(snapshot)
+    mismatches = name_mismatches(snapshot)
+    if mismatches and mismatches['inventory_unmatched']:
+        logger.warning("Catalog v%s: %d inventory model(s) match no spec row, e.g. %s", snapshot.version,
+                       len(mismatches['inventory_unmatched']),
+                       ', '.join(f"{item['inventory_model']!r} (-> {item['suggestion']['model']!r})" if item['suggestion'] else repr(item['inventory_model'])
+                                 for item in mismatches['inventory_unmatched'][:5]))
+
+# Catalog được tải lại nền theo chu kỳ, request luôn đọc snapshot mới nhất
+# Nhiều cửa hàng (INVENTORY_STORES): mỗi store có nguồn inventory riêng, không cần nguồn chung
+store_sources = stores_from_env()
+inventory_source = None if store_sources else source_from_env()
+CATALOG_REFRESH_INTERVAL = float(os.environ.get("CATALOG_REFRESH_INTERVAL", 300))
+def catalog_manager(source: Optional[InventorySource] = None, **kwargs) -> CatalogManager:
+    return CatalogManager(
+        lambda: load_catalog(source),
+        update=lambda previous: update_catalog(previous, source),
+        refresh_interval=CATALOG_REFRESH_INTERVAL,
+        max_retries=int(os.environ.get("CATALOG_MAX_RETRIES", 3)),
+        breaker_threshold=int(os.environ.get("CATALOG_BREAKER_THRESHOLD", 3)),
+        breaker_cooldown=float(os.environ.get("CATALOG_BREAKER_COOLDOWN", 300)),
+        **kwargs,
+    )
+
+# Snapshot trên đĩa để khởi động nhanh khi nguồn dữ liệu chưa sẵn sàng; chỉ bật khi cấu hình (vd. /var/lib/...)
+CATALOG_SNAPSHOT_PATH = os.environ.get("CATALOG_SNAPSHOT_PATH") or None
+CATALOG_SHARED_DIR = os.environ.get("CATALOG_SHARED_DIR")
+
+# Nhiều cửa hàng (INVENTORY_STORES): mỗi store là một shard catalog với nguồn inventory, chỉ mục,
+# phiên bản, luồng làm mới và file snapshot riêng, nên sheet của một store chậm hoặc lỗi không
+# làm chậm việc làm mới các store khác. Không cấu hình thì chỉ có một store DEFAULT_STORE.
+DEFAULT_STORE = 'default'
+STORES = list(store_sources) or [DEFAULT_STORE]
+
+def store_path(path: Optional[str], store: str, directory: bool = False) -> Optional[str]:
+    """File snapshot / thư mục chung của một store; store mặc định dùng đúng đường dẫn cấu hình."""
+    if not path or store == DEFAULT_STORE:
+        return path
+    if directory:
+        return os.path.join(path, store)
+    root, ext = os.path.splitext(path)
+    return f"{root}-{store}{ext}"
 
-    # done filter drone
+if CATALOG_SHARED_DIR:
+    # Nhiều worker: đọc catalog do catalog_loader.py công bố thay vì tự gọi nguồn dữ liệu
+    catalogs = {store: SharedCatalog(store_path(CATALOG_SHARED_DIR, store, directory=True),
+                                     poll_interval=float(os.environ.get("CATALOG_POLL_INTERVAL", 1)), prepare=prepare_snapshot)
+                for store in STORES}
+else:
+    catalogs = {store: catalog_manager(store_sources.get(store), snapshot_path=store_path(CATALOG_SNAPSHOT_PATH, store), prepare=prepare_snapshot)
+                for store in STORES}
+CATALOG_WAIT_TIMEOUT = float(os.environ.get("CATALOG_WAIT_TIMEOUT", 30))
+
+# Ghi vết truy vấn (lấy mẫu) để phân tích và replay; ghi đĩa ở thread nền
+tracer = QueryTracer(
+    os.environ.get("TRACE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces")),
+    sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", 0)),
+    queue_size=int(os.environ.get("TRACE_QUEUE_SIZE", 10000)),
+)
+
+# Cache kết quả theo tiêu chí đã chuẩn hóa, tự xóa khi phiên bản catalog đổi
+result_cache = ResultCache(
+    max_entries=int(os.environ.get("RESULT_CACHE_SIZE", 1024)),
+    ttl=float(os.environ.get("RESULT_CACHE_TTL", 300)),
+    max_bytes=int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+)
+
+# Phần xử lý đồng bộ (pandas/numpy) chạy trên pool giới hạn, event loop chỉ nhận/trả request
+pool = WorkerPool(
+    workers=int(os.environ.get("RECOMMEND_WORKERS", min(4, os.cpu_count() or 1))),
+    max_queue=int(os.environ.get("RECOMMEND_MAX_QUEUE", 64)),
+    retry_after=float(os.environ.get("RECOMMEND_RETRY_AFTER", 1)),
+)
+# Chờ lần tải catalog đầu tiên trên thread riêng để không chiếm worker của pool
+catalog_waiter = ThreadPoolExecutor(max_workers=len(STORES), thread_name_prefix="catalog-wait")
+flights = SingleFlight()
+
+# Metric Prometheus (/metrics); ghi metric chỉ là phép cộng dưới lock nên luôn bật
+metrics = Registry()
+LOAD_SECONDS = metrics.histogram("catalog_load_stage_seconds", "Thời gian từng bước của load_data", ["stage", "category"])
+STAGE_SECONDS = metrics.histogram("recommend_stage_seconds", "Thời gian từng bước xử lý request", ["stage", "category"])
+REQUEST_SECONDS = metrics.histogram("recommend_request_seconds", "Thời gian xử lý request", ["endpoint"])
+RESULT_SIZE = metrics.histogram("recommend_result_size", "Số sản phẩm đạt tiêu chí của một request", ["category"], buckets=SIZE_BUCKETS)
+CACHE_LOOKUPS = metrics.counter("recommend_cache_lookups_total", "Tra cứu cache kết quả", ["result"])
+REQUEST_ERRORS = metrics.counter("recommend_errors_total", "Request lỗi theo category và mã HTTP", ["category", "status"])
+metrics.gauge("catalog_version", "Phiên bản catalog đang phục vụ theo store", ["store"],
+              collect=lambda: {(store,): c.version for store, c in catalogs.items()})
+metrics.gauge("catalog_rows", "Số sản phẩm theo store và category", ["store", "category"],
+              collect=lambda: {(store, category): len(df) for store, c in catalogs.items() if c.snapshot
+                               for category, df in c.snapshot.specs_dfs.items()})
+metrics.gauge("result_cache_entries", "Số mục trong cache kết quả", collect=lambda: {(): result_cache.stats()["entries"]})
+metrics.gauge("result_cache_bytes", "Dung lượng ước tính của cache kết quả", collect=lambda: {(): result_cache.stats()["bytes"]})
+metrics.gauge("worker_pool_in_flight", "Việc đang chạy hoặc chờ trên pool", collect=lambda: {(): pool.status()["in_flight"]})
+metrics.gauge("worker_pool_rejected", "Số request bị từ chối vì pool đầy", collect=lambda: {(): pool.status()["rejected"]})
+
+def observe_stages(category: str, timings: Dict[str, float]):
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage, category=category)
+
+def json_response(result: Any, timings: Dict[str, float], started: float, headers: Optional[Dict[str, str]] = None,
+                  encoding: Optional[str] = None) -> JSONResponse:
+    """Tự serialize (và nén theo encoding đã thỏa thuận) để đo được từng bước và gắn header Server-Timing."""
+    stage_start = time.perf_counter()
+    response = JSONResponse(jsonable_encoder(result), headers=headers)
+    timings['serialize'] = time.perf_counter() - stage_start
+    stage_start = time.perf_counter()
+    body = compress(response.body, encoding)
+    if body is not None:
+        response.body = body
+        response.headers['Content-Length'] = str(len(body))
+        response.headers['Content-Encoding'] = encoding
+        timings['compress'] = time.perf_counter() - stage_start
+    timings['total'] = time.perf_counter() - started
+    response.headers['Server-Timing'] = server_timing(timings)
+    return response
+
+# Response có thể được nén: cache trung gian phải phân biệt theo Accept-Encoding
+VARY = {'Vary': 'Accept-Encoding'}
+
+# ETag theo nội dung category (của mọi store được hỏi) + khóa cache; Cache-Control cho dùng lại tới lần làm mới catalog kế tiếp
+def conditional_headers(snapshots: Dict[str, CatalogSnapshot], category: str, key: str) -> Dict[str, str]:
+    last_refresh = min(getattr(catalogs[store], 'last_attempt_at', None) or snapshot.loaded_at for store, snapshot in snapshots.items())
+    return {
+        'ETag': etag('.'.join(category_fingerprint(snapshot, category) for snapshot in snapshots.values()), key),
+        'Cache-Control': cache_control(last_refresh, CATALOG_REFRESH_INTERVAL),
+        **VARY,
+    }
+
+# Kết quả trong cache có thể được tính ở phiên bản trước nếu category không đổi
+def with_version(result: Optional[Dict[str, Any]], snapshot: CatalogSnapshot) -> Optional[Dict[str, Any]]:
+    if result is not None and 'version' in result and result['version'] != snapshot.version:
+        return {**result, 'version': snapshot.version}
+    return result
+
+# Vết ghi đủ tham số để replay_traces.py chạy lại đúng request: store, trang, min_results; models là trang đã trả về
+# theo thứ tự (kèm store của từng mục khi gộp nhiều store), relaxed là tập tiêu chí đã nới nếu có
+def record_trace(snapshots: Dict[str, CatalogSnapshot], category: str, criteria: Dict[str, Any], limit: Optional[int], offset: int,
+                 min_results: Optional[int], result: Dict[str, Any], timings: Dict[str, float]):
+    recommendations = result.get('recommendations', [])
+    trace = {
+        'category': category,
+        'criteria': criteria,
+        'stores': list(snapshots),
+        'limit': limit,
+        'offset': offset,
+        'min_results': min_results,
+        'version': {store: snapshot.version for store, snapshot in snapshots.items()},
+        'total': result.get('total', 0),
+        'relaxed': result.get('relaxed'),
+        'models': [item['model'] for item in recommendations],
+        'timings_ms': {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()},
+    }
+    if len(snapshots) > 1:
+        trace['model_stores'] = [item['store'] for item in recommendations]
+    tracer.record(trace)
+
+def start_catalog():
+    # Mỗi store tự tải và làm mới trên thread riêng
+    for catalog in catalogs.values():
+        catalog.start()
+    tracer.start()
+
+def stop_catalog():
+    for catalog in catalogs.values():
+        catalog.stop(timeout=5)
+    tracer.stop(timeout=5)
+    pool.shutdown()
+    catalog_waiter.shutdown(wait=False, cancel_futures=True)
+
+async def get_snapshot(store: Optional[str] = None) -> CatalogSnapshot:
+    catalog = catalogs[store or STORES[0]]
+    snapshot = catalog.snapshot
+    if snapshot is not None:
+        return snapshot
+    # Catalog chưa tải xong: mọi request đồng thời chờ chung một lần tải
+    async def wait_for_catalog():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(catalog_waiter, catalog.current, CATALOG_WAIT_TIMEOUT)
+    try:
+        return await flights.do(('catalog', store or STORES[0]), wait_for_catalog)
+    except CatalogNotReady as e:
+        raise HTTPException(status_code=503, detail=f"Dữ liệu chưa sẵn sàng: {str(e)}", headers={"Retry-After": str(int(pool.retry_after))})
+
+def server_busy(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail="Máy chủ đang bận, vui lòng thử lại sau", headers={"Retry-After": str(max(1, int(e.retry_after)))})
+
+
+# Hàm xử lý filter cho từng category (schema khai báo trong filters.py)
+def apply_filters(df: pd.DataFrame, category: str, criteria: Dict[str, Any], index: Optional[CategoryIndex] = None) -> pd.DataFrame:
+    # Không có chỉ mục của snapshot thì dựng tạm cho df được truyền vào
+    if index is None:
+        index = CategoryIndex(df, category)
+    return df[index.mask(criteria)]
+
+# Điểm = trung bình (có trọng số) các cột purpose; đường chính dùng PurposeMatrix của snapshot
+def calculate_scores(df: pd.DataFrame, category: str, selected_purposes: Purposes, matrix: Optional[PurposeMatrix] = None) -> pd.DataFrame:
+    if matrix is None:
+        matrix = PurposeMatrix(df, PURPOSES_PER_CATEGORY.get(category, []))
+    scored_df = df.rename(columns=str.lower)
+    scored_df['score'] = matrix.scores(matrix.weights(selected_purposes))
+    return scored_df
+
+# Lọc và tính điểm: vị trí các sản phẩm đạt tiêu chí và ngưỡng điểm (chưa xếp hạng)
+def score_positions(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], timings: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+    started = time.perf_counter()
+
+    # Apply filters
+    index = category_index(snapshot, category)
+    positions = np.flatnonzero(index.mask(criteria))
+    timings['filter'] = time.perf_counter() - started
     
-    elif category == 'gimbals':
-        # Maximum Payload
-        if 'Maximum Payload (kg)' in criteria:
-            payload_map = {
-                '0.3kg': (None, 0.3),
-                '0.3-2kg': (0.3, 2),
-                'Above 2kg': (2, None)
-            }
-            
-            if criteria['Maximum Payload (kg)'] in payload_map:
-                min_payload, max_payload = payload_map[criteria['Maximum Payload (kg)']]
-                
-                if 'Maximum Payload (kg)' in df.columns:
-                    df['Maximum Payload (kg)'] = pd.to_numeric(df['Maximum Payload (kg)'], errors='coerce')
-
-                    if min_payload is not None:
-                        df = df[df['Maximum Payload (kg)'] > min_payload]
-                    if max_payload is not None:
-                        df = df[df['Maximum Payload (kg)'] <= max_payload]
-
-        # Battery Life
-        if 'Battery Life (hours)' in criteria:
-            battery_map = {
-                'Below 10h': (None, 10),
-                'Above 10h': (11, None)
-            }
-            min_battery, max_battery = battery_map[criteria['Battery Life (hours)']]
-            if min_battery: df = df[df['Battery Life (hours)'] >= min_battery]
-            if max_battery: df = df[df['Battery Life (hours)'] <= max_battery]
-
-        # Device Compatibility
-        if 'Device Compatibility' in criteria:
-            df = df[df['Device Compatibility'] == criteria['Device Compatibility'].lower()]
-
-        # Special Features
-        special_features = {
-            'Time-lapse': 'Time-lapse',
-            'Follow Mode': 'Follow Mode',
-            'App Connectivity': 'App Connectivity'
-        }
-        for feature, col in special_features.items():
-            if feature in criteria and criteria[feature]:
-                df = df[df[col] == 1]
-
-    # done gimbal filter
-    elif category == 'action_cameras':
-        # Weight
-        if 'Weight' in criteria:
-            weight_map = {
-                'Light': (None, 100),
-                'Medium': (100,None)
-            }
-            min_w, max_w = weight_map[criteria['Weight']]
-            if min_w: df = df[df['Weight (gram)'] >= min_w]
-            if max_w: df = df[df['Weight (gram)'] <= max_w]
-        
+    # Calculate scores based on purposes (danh sách hoặc dict purpose -> trọng số)
+    stage_start = time.perf_counter()
+    matrix = purpose_matrix(snapshot, category)
+    scores = matrix.scores(matrix.weights(criteria.get('purposes')), positions)
+    keep = scores >= SCORE_THRESHOLD - SCORE_EPSILON
+    timings['score'] = time.perf_counter() - stage_start
+    return positions[keep], scores[keep]
+
+# Quá ít kết quả: nới tập tiêu chí nhỏ nhất để có ít nhất min_results sản phẩm; all_scores là điểm của mọi sản phẩm nếu đã có
+def relax_positions(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], positions: np.ndarray, scores: np.ndarray,
+                    min_results: Optional[int], timings: Dict[str, float],
+                    all_scores: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, Optional[Relaxation]]:
+    if not min_results or len(positions) >= min_results:
+        return positions, scores, None
+    stage_start = time.perf_counter()
+    if all_scores is None:
+        matrix = purpose_matrix(snapshot, category)
+        all_scores = matrix.scores(matrix.weights(criteria.get('purposes')))
+    relaxation = relax_criteria(category_index(snapshot, category), criteria, all_scores >= SCORE_THRESHOLD - SCORE_EPSILON, min_results)
+    if relaxation is not None:
+        positions = np.flatnonzero(relaxation.mask)
+        scores = all_scores[positions]
+    timings['relax'] = time.perf_counter() - stage_start
+    return positions, scores, relaxation
+
+def add_relaxation(result: Dict[str, Any], relaxation: Optional[Relaxation]) -> Dict[str, Any]:
+    if relaxation is not None:
+        result['relaxed'] = relaxation.relaxed
+        result['strict_total'] = relaxation.strict_count
+    return result
+
+# Facet của các tiêu chí lọc trên các sản phẩm đạt ngưỡng điểm; scores là điểm của mọi sản phẩm nếu đã có
+def recommendation_facets(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], timings: Dict[str, float],
+                          scores: Optional[np.ndarray] = None) -> Dict[str, Any]:
+    stage_start = time.perf_counter()
+    if scores is None:
+        matrix = purpose_matrix(snapshot, category)
+        scores = matrix.scores(matrix.weights(criteria.get('purposes')))
+    facets = facet_counts(category_index(snapshot, category), criteria, scores >= SCORE_THRESHOLD - SCORE_EPSILON)
+    timings['facets'] = timings.get('facets', 0) + time.perf_counter() - stage_start
+    return facets
+
+# Tính gợi ý cho một category trên một snapshot; criteria đã được chuẩn hóa
+def build_recommendations(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], limit: Optional[int] = None, offset: int = 0,
+                          timings: Optional[Dict[str, float]] = None, facets: bool = False, min_results: Optional[int] = None,
+                          store: Optional[str] = None) -> Dict[str, Any]:
+    sampled = tracer.should_sample()
+    # timings (nếu truyền vào) nhận thời gian từng bước, dùng cho benchmark
+    timings = {} if timings is None else timings
+    positions, scores = score_positions(snapshot, category, criteria, timings)
+    positions, scores, relaxation = relax_positions(snapshot, category, criteria, positions, scores, min_results, timings)
+    facet_result = recommendation_facets(snapshot, category, criteria, timings) if facets else None
+    result = add_relaxation(rank_and_format(snapshot, category, criteria, positions, scores, limit, offset, timings), relaxation)
+    if facet_result is not None:
+        result['facets'] = facet_result
+    if sampled:
+        record_trace({store or STORES[0]: snapshot}, category, criteria, limit, offset, min_results, result, timings)
+    return result
 
-        # Video Recording Capabilities
-        if 'Video Recording Capabilities' in criteria:
-            selected_capability = criteria['Video Recording Capabilities']
-            df = df[df['Video Recording Capabilities'].str.contains(selected_capability, na=False)]
-
-        # Battery Life
-        if 'Battery Life (minutes)' in criteria:
-            battery_map = {
-                'Below 100 minutes': (None, 100),
-                '100-150 minutes': (100, 150),
-                'Above 150 minutes': (150, None)
-            }
-            min_battery, max_battery = battery_map[criteria['Battery Life (minutes)']]
-            if min_battery: df = df[df['Battery Life (minutes)'] >= min_battery]
-            if max_battery: df = df[df['Battery Life (minutes)'] <= max_battery]
-
-        # Special Features
-        special_features = {
-            'Time-lapse': 'Time-lapse',
-            'Slow Motion': 'Slow Motion',
-            'Water Resistance': 'Water Resistance',
-            'Shock Resistance': 'Shock Resistance'
+# Nhiều bộ tiêu chí của cùng một category: mask N x sản phẩm và điểm W @ M.T tính một lượt
+def build_batch_recommendations(snapshot: CatalogSnapshot, category: str,
+                                items: List[Tuple[Dict[str, Any], Optional[int], int, bool, Optional[int]]],
+                                store: Optional[str] = None) -> List[Dict[str, Any]]:
+    started = time.perf_counter()
+    index = category_index(snapshot, category)
+    masks = index.mask_matrix([item[0] for item in items])
+    filter_time = time.perf_counter() - started
+
+    stage_start = time.perf_counter()
+    scores = purpose_matrix(snapshot, category).score_matrix([item[0].get('purposes') for item in items])
+    keep = masks & (scores >= SCORE_THRESHOLD - SCORE_EPSILON)
+    score_time = time.perf_counter() - stage_start
+
+    # Thời gian lọc/tính điểm chung được chia đều cho các request trong batch
+    results = []
+    for i, (criteria, limit, offset, facets, min_results) in enumerate(items):
+        positions = np.flatnonzero(keep[i])
+        timings = {'filter': filter_time / len(items), 'score': score_time / len(items)}
+        positions, item_scores, relaxation = relax_positions(snapshot, category, criteria, positions, scores[i, positions], min_results, timings, scores[i])
+        facet_result = recommendation_facets(snapshot, category, criteria, timings, scores[i]) if facets else None
+        result = add_relaxation(rank_and_format(snapshot, category, criteria, positions, item_scores, limit, offset, timings), relaxation)
+        if facet_result is not None:
+            result['facets'] = facet_result
+        if tracer.should_sample():
+            record_trace({store or STORES[0]: snapshot}, category, criteria, limit, offset, min_results, result, timings)
+        results.append(result)
+    return results
+
+# Thứ tự (trong positions) của trang được yêu cầu: điểm giảm dần, hòa điểm thì theo giá rồi tên model
+def ranked(snapshot: CatalogSnapshot, category: str, positions: np.ndarray, scores: np.ndarray, limit: Optional[int], offset: int,
+           timings: Dict[str, float]) -> np.ndarray:
+    index = category_index(snapshot, category)
+    stage_start = time.perf_counter()
+    k = offset + limit if limit else None
+    order = rank_order(scores, index.prices[positions], index.model_rank[positions], k)[offset:]
+    timings['score'] = timings.get('score', 0) + time.perf_counter() - stage_start
+    return order
+
+# Dựng các mục gợi ý (giải thích, chi tiết) cho các vị trí đã xếp hạng; thời gian cộng dồn vào timings
+def format_recommendations(snapshot: CatalogSnapshot, category: str, positions: np.ndarray, scores: np.ndarray,
+                           selected_purposes: Optional[List[str]], timings: Dict[str, float]) -> List[Dict[str, Any]]:
+    # Giải thích: luật đã được đánh giá sẵn trên cả category, chỉ tra theo vị trí
+    stage_start = time.perf_counter()
+    explanations = explanation_engine(snapshot, category).explain(positions, selected_purposes)
+    timings['explain'] = timings.get('explain', 0) + time.perf_counter() - stage_start
+
+    # Format response
+    stage_start = time.perf_counter()
+    top_products = snapshot[category].iloc[positions]
+    # Đổi từng cột sang giá trị Python thuần (NaN -> None) thay vì duyệt từng dòng
+    columns = {str(col).lower(): json_values(top_products[col]) for col in top_products.columns}
+    detail_columns = [col for col in columns if col not in ['model', 'price', 'score', 'colour', 'condition', 'series', 'free gift']]
+    columns['score'] = scores.tolist()
+    defaults = {'model': 'unknown', 'price': 'N/A', 'colour': 'black', 'series': '', 'condition': 'unknown', 'free gift': 'none'}
+    for col, default in defaults.items():
+        if col not in columns:
+            columns[col] = [default] * len(top_products)
+    recommendations = []
+    for i, explanation in enumerate(explanations):
+        rec = {
+            'model': columns['model'][i],
+            'price': columns['price'][i],
+            'score': round(float(columns['score'][i]), 2),
+            'colour': columns['colour'][i],
+            'series': columns['series'][i],
+            'condition': columns['condition'][i],
+            'free_gift': columns['free gift'][i],
+            'details': {col: columns[col][i] for col in detail_columns},
+            'explanation': explanation
         }
-        for feature, col in special_features.items():
-            if feature in criteria and criteria[feature]:
-                df = df[df[col] == 1]
-
-    # Lọc giá
-    price_range = criteria.get('price')
-    if isinstance(price_range, list) and len(price_range) == 2:
-        min_price, max_price = price_range
-    else:
-        min_price, max_price = df['Price'].min(), df['Price'].max()
-    
-    min_price = int(price_range[0])
-    max_price = int(price_range[1])
+        recommendations.append(rec)
+    timings['format'] = timings.get('format', 0) + time.perf_counter() - stage_start
+    return recommendations
 
-    df = df[(df['Price'] >= min_price) & (df['Price'] <= max_price)]
+# Không có sản phẩm đạt tiêu chí: kèm các sản phẩm gần tiêu chí nhất trong không gian thông số (similar.py)
+SIMILAR_ALTERNATIVES = int(os.environ.get("SIMILAR_ALTERNATIVES", 5))
 
-    return df
+def empty_result(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], timings: Dict[str, float]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {'message': 'Không tìm thấy sản phẩm phù hợp'}
+    if SIMILAR_ALTERNATIVES <= 0:
+        return result
+    stage_start = time.perf_counter()
+    selected_purposes = purpose_names(criteria.get('purposes'))
+    positions, _ = similarity_index(snapshot, category).nearest_to_criteria(criteria, selected_purposes, SIMILAR_ALTERNATIVES)
+    timings['similar'] = time.perf_counter() - stage_start
+    if len(positions):
+        matrix = purpose_matrix(snapshot, category)
+        scores = matrix.scores(matrix.weights(criteria.get('purposes')), positions)
+        result['alternatives'] = format_recommendations(snapshot, category, positions, scores, selected_purposes, timings)
+    return result
 
-def calculate_scores(df: pd.DataFrame, category: str, selected_purposes: List[str]) -> pd.DataFrame:
-    valid_purposes = PURPOSES_PER_CATEGORY.get(category, [])
-    
-    df_copy = df.copy()
-    
-    df_copy.columns = df_copy.columns.str.lower()
+# Xếp hạng các sản phẩm đạt ngưỡng rồi dựng response (giải thích, chi tiết) cho trang được yêu cầu
+def rank_and_format(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], positions: np.ndarray, scores: np.ndarray,
+                    limit: Optional[int], offset: int, timings: Dict[str, float]) -> Dict[str, Any]:
+    order = ranked(snapshot, category, positions, scores, limit, offset, timings)
     
-    selected_purposes_lower = [p.lower() for p in selected_purposes]
-    valid_purposes_lower = [p.lower() for p in valid_purposes]
-    
-    purposes_to_use = []
-    for p in selected_purposes_lower:
-        if p in valid_purposes_lower and p in df_copy.columns:
-            if pd.api.types.is_numeric_dtype(df_copy[p]):
-                purposes_to_use.append(p)
-            else:
-                print(f"Warning: Column '{p}' is not numeric and will be ignored for scoring.")
-    
-    if not purposes_to_use:
-        
-        df_copy['score'] = 0  
-    else:
-        
-        for purpose in purposes_to_use:
-            # value_counts = df_copy[purpose].value_counts().head(5)
-            
-            if df_copy[purpose].isna().any():
-                df_copy[purpose] = df_copy[purpose].fillna(0)
-        
-        try:
-            df_copy['score'] = df_copy[purposes_to_use].astype(float).mean(axis=1)
-            
-            score_stats = {
-                "min": df_copy['score'].min(),
-                "max": df_copy['score'].max(),
-                "mean": df_copy['score'].mean(),
-                "median": df_copy['score'].median()
-            }
-            # print(f"Score statistics: {score_stats}")
-            
-            if df_copy['score'].max() == 0 and len(purposes_to_use) > 0:
-                # print("Warning: All scores are 0. Check if purpose columns contain only zeros.")
-                for purpose in purposes_to_use:
-                    if df_copy[purpose].max() == 0:
-                        print(f"Column '{purpose}' contains only zeros.")
-        except Exception as e:
-            print(f"Error calculating scores: {e}")
-            df_copy['score'] = 0
+    RESULT_SIZE.observe(len(positions), category=category)
+    if len(positions) == 0:
+        result = empty_result(snapshot, category, criteria, timings)
+        observe_stages(category, timings)
+        return result
     
-    df_copy['score'] = df_copy['score'].fillna(0)
-        
-    return df_copy
+    recommendations = format_recommendations(snapshot, category, positions[order], scores[order], purpose_names(criteria.get('purposes')), timings)
 
-# Giải thích cho lựa chọn purposes đối với cameras
-def generate_explanation(product_model, selected_purposes, features, price=None):    
-    if not selected_purposes:
-        return "là sản phẩm phù hợp với các nhu cầu cơ bản của bạn."
-    
-    criteria_map = {
-        "Beginner": {"Price": "≤23000000", "Resolution": "16-24 MP", "Weight": "≤500g", "Flipscreen": "Yes"},
-        "Professional": {"Resolution": "≥26 MP", "ISO Max": "≥12800", "Autofocus Type": "Hybrid", 
-                        "Weathersealing": "Yes", "Burst Shooting": "≥10 fps"},
-        "Sports": {"Burst Shooting": "≥10 fps", "Autofocus Type": "Hybrid", 
-                  "Weathersealing": "Yes", "Battery Life": "≥400 frames"},
-        "Video": {"Quay 4K": "Yes", "External Mic Input": "Yes", "IBIS": "Yes", 
-                 "Flipscreen": "Yes", "Film Simulation": "Yes"},
-        "Daily use": {"Weight": "≤500g", "Battery Life": "≥300 frames", 
-                     "WiFi": "Yes", "Bluetooth": "Yes"},
-        "Travel": {"Weight": "≤500g", "Battery Life": "≥400 frames", 
-                  "Weathersealing": "Yes", "Film Simulation": "Yes"},
-        "Vlogging": {"Flipscreen": "Yes", "Weight": "≤500g", "External Mic Input": "Yes", 
-                    "Quay 4K": "Yes", "IBIS": "Yes"},
-        "Studio": {"Resolution": "≥26 MP", "Film Simulation": "Yes", 
-                  "USB-C": "Yes", "Weathersealing": "Yes"}
+    observe_stages(category, timings)
+    return {
+        'recommendations': recommendations,
+        'total': len(positions),
+        'offset': offset,
+        'limit': limit,
+        'version': snapshot.version,
     }
-    
-    feature_mapping = {
-        "resolution (mp)": "Resolution",
-        "weight (gram)": "Weight",
-        "flipscreen": "Flipscreen",
-        "iso max": "ISO Max",
-        "autofocus type": "Autofocus Type",
-        "weathersealing": "Weathersealing",
-        "burst shooting": "Burst Shooting",
-        "battery life": "Battery Life",
-        "quay 4k": "Quay 4K",
-        "external mic input": "External Mic Input",
-        "ibis": "IBIS",
-        "film simulation": "Film Simulation",
-        "wifi": "WiFi",
-        "bluetooth": "Bluetooth",
-        "usb-c": "USB-C"
+
+# API endpoint
+# Chạy trên pool: tính gợi ý rồi lưu cache; timings nhận thời gian từng bước
+def compute_recommendations(snapshot: CatalogSnapshot, key: str, category: str, criteria: Dict[str, Any], limit: Optional[int], offset: int,
+                            timings: Optional[Dict[str, float]] = None, facets: bool = False, min_results: Optional[int] = None,
+                            store: Optional[str] = None) -> Dict[str, Any]:
+    result = build_recommendations(snapshot, category, criteria, limit, offset, timings=timings, facets=facets, min_results=min_results,
+                                   store=store)
+    result_cache.put(key, result, snapshot.category_version(category))
+    return result
+
+# Các store của request: None (hoặc rỗng) là mọi store; tên không phân biệt hoa thường
+def request_stores(store: Union[None, str, List[str]]) -> List[str]:
+    names = [store] if isinstance(store, str) else (store or STORES)
+    names = list(dict.fromkeys(str(name).strip().lower() for name in names))
+    unknown = [name for name in names if name not in catalogs]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown store: {', '.join(unknown)}")
+    return names
+
+# Endpoint làm việc trên một store (similar, bundle...): None là store đầu tiên
+def single_store(store: Optional[str]) -> str:
+    return request_stores(store)[0] if store else STORES[0]
+
+async def store_snapshots(stores: List[str]) -> Dict[str, CatalogSnapshot]:
+    return {store: await get_snapshot(store) for store in stores}
+
+# Khoảng giá chung của các store để chuẩn hóa tiêu chí price giống nhau trên mọi shard
+def stores_price_range(snapshots: Dict[str, CatalogSnapshot], category: str) -> Optional[Tuple[float, float]]:
+    ranges = [r for r in (category_index(snapshot, category).price_range for snapshot in snapshots.values()) if r is not None]
+    if not ranges:
+        return None
+    return min(low for low, _ in ranges), max(high for _, high in ranges)
+
+def recommend_key(category: str, criteria: Dict[str, Any], request: RecommendationRequest, stores: List[str]) -> str:
+    return cache_key(category, criteria, request.limit, request.offset, request.facets, request.min_results, stores)
+
+# Phiên bản dùng cho cache kết quả: một store giữ nguyên phiên bản category, nhiều store là tuple theo thứ tự store
+def stores_version(snapshots: Dict[str, CatalogSnapshot], category: str) -> Any:
+    versions = tuple(snapshot.category_version(category) for snapshot in snapshots.values())
+    return versions[0] if len(versions) == 1 else versions
+
+def with_versions(result: Optional[Dict[str, Any]], snapshots: Dict[str, CatalogSnapshot]) -> Optional[Dict[str, Any]]:
+    if len(snapshots) == 1:
+        return with_version(result, next(iter(snapshots.values())))
+    versions = {store: snapshot.version for store, snapshot in snapshots.items()}
+    if result is not None and 'version' in result and result['version'] != versions:
+        return {**result, 'version': versions}
+    return result
+
+# Nhiều store: mỗi shard lọc, tính điểm và chọn top offset+limit của mình (song song trên pool),
+# rồi merge_stores gộp top-K theo cùng thứ tự xếp hạng và chỉ format các mục được chọn.
+# relaxation (từ relax_stores) thay tiêu chí gốc bằng mask đã nới của shard
+def store_candidates(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], k: Optional[int], facets: bool,
+                     timings: Dict[str, float], relaxation: Optional[Relaxation] = None) -> Dict[str, Any]:
+    if relaxation is None:
+        positions, scores = score_positions(snapshot, category, criteria, timings)
+    else:
+        stage_start = time.perf_counter()
+        matrix = purpose_matrix(snapshot, category)
+        positions = np.flatnonzero(relaxation.mask)
+        scores = matrix.scores(matrix.weights(criteria.get('purposes')), positions)
+        timings['score'] = timings.get('score', 0) + time.perf_counter() - stage_start
+    index = category_index(snapshot, category)
+    stage_start = time.perf_counter()
+    order = rank_order(scores, index.prices[positions], index.model_rank[positions], k)
+    timings['score'] = timings.get('score', 0) + time.perf_counter() - stage_start
+    top = positions[order]
+    df = snapshot[category]
+    shard = {
+        'positions': top,
+        'scores': scores[order],
+        'prices': index.prices[top],
+        'models': df['Model'].iloc[top].astype(str).to_numpy() if 'Model' in df.columns else top.astype(str),
+        'total': len(positions),
+        'relaxation': relaxation,
     }
-    
-    normalized_features = {}
-    for key, value in features.items():
-        normalized_key = feature_mapping.get(key.lower(), key)
-        normalized_features[normalized_key] = value
-    
-    
-    all_matching_features = {}
-    
-    for purpose in selected_purposes:
-        selected_criteria = criteria_map.get(purpose, {})
-        
-        for criterion, expected_value in selected_criteria.items():
-            
-            if criterion in normalized_features:
-                actual_value = normalized_features[criterion]
-                
-                if criterion in all_matching_features:
-                    continue
-
-                if criterion == "Price" and price:
-                    try:
-                        price_value = float(price)
-                        threshold_str = expected_value.replace("≤", "").replace("USD", "").strip()
-                        
-                        threshold = float(threshold_str)
-                        
-                        if price_value <= threshold:
-                            all_matching_features[criterion] = price
-                    except Exception as e:
-                        print(f"DEBUG - Error processing price: {e}")
-                    continue
-                
-                if "≤" in expected_value:
-                    try:
-                        actual_num = float(actual_value)
-                        threshold = float(expected_value.replace("≤", "").replace("g", "").replace(" frames", "").strip())
-                        if actual_num <= threshold:
-                            all_matching_features[criterion] = actual_value
-                    except Exception as e:
-                        print(f"DEBUG - Error processing ≤ comparison: {e}")
-                    continue
-                
-                if "≥" in expected_value:
-                    try:
-                        actual_num = float(actual_value)
-                        threshold = float(expected_value.replace("≥", "").replace(" MP", "").replace(" fps", "").replace(" frames", "").strip())
-                        if actual_num >= threshold:
-                            all_matching_features[criterion] = actual_value
-                    except Exception as e:
-                        print(f"DEBUG - Error processing ≥ comparison: {e}")
-                    continue
-                
-                if expected_value == "Yes":
-                    if str(actual_value).lower() == "yes" or str(actual_value).lower() == "true" or str(actual_value) == "1":
-                        all_matching_features[criterion] = actual_value
-                    continue
-                
-                if criterion == "Resolution" and "MP" in str(actual_value):
-                    try:
-                        actual_mp = float(actual_value.replace("MP", "").strip())
-                        if "16-24" in expected_value and 16 <= actual_mp <= 24:
-                            all_matching_features[criterion] = actual_value
-                        elif "≥26" in expected_value and actual_mp >= 26:
-                            all_matching_features[criterion] = actual_value
-                    except Exception as e:
-                        print(f"DEBUG - Error processing Resolution: {e}")
-                    continue
-    
-    
-    explanation = ""
-    
-    if len(selected_purposes) == 1:
-        primary_purpose = selected_purposes[0]
-        adjective_map = {
-            "Beginner": "phù hợp cho người mới",
-            "Professional": "lý tưởng cho chuyên nghiệp",
-            "Sports": "hoàn hảo cho thể thao",
-            "Video": "tuyệt vời cho video",
-            "Daily use": "phù hợp dùng hàng ngày",
-            "Travel": "lý tưởng cho du lịch",
-            "Vlogging": "hoàn hảo cho vlogging",
-            "Studio": "phù hợp cho studio"
-        }
-        purpose_desc = adjective_map.get(primary_purpose, f"phù hợp cho {primary_purpose.lower()}")
-        explanation += purpose_desc
+    if facets:
+        stage_start = time.perf_counter()
+        matrix = purpose_matrix(snapshot, category)
+        eligible = matrix.scores(matrix.weights(criteria.get('purposes'))) >= SCORE_THRESHOLD - SCORE_EPSILON
+        shard['facets'] = facet_counts(index, criteria, eligible)
+        shard['facet_prices'] = facet_prices(index, criteria, eligible)
+        timings['facets'] = timings.get('facets', 0) + time.perf_counter() - stage_start
+    return shard
+
+# Tổng kết quả của các store dưới min_results: một tập tiêu chí nới chung cho mọi store, chọn theo tổng số kết quả
+def relax_stores(snapshots: Dict[str, CatalogSnapshot], category: str, criteria: Dict[str, Any], min_results: int,
+                 timings: Dict[str, float]) -> Optional[List[Relaxation]]:
+    stage_start = time.perf_counter()
+    indexes, eligibles = [], []
+    for snapshot in snapshots.values():
+        matrix = purpose_matrix(snapshot, category)
+        eligibles.append(matrix.scores(matrix.weights(criteria.get('purposes'))) >= SCORE_THRESHOLD - SCORE_EPSILON)
+        indexes.append(category_index(snapshot, category))
+    relaxations = relax_across(indexes, criteria, eligibles, min_results)
+    timings['relax'] = time.perf_counter() - stage_start
+    return relaxations
+
+def needs_relaxing(shards: List[Dict[str, Any]], min_results: Optional[int]) -> bool:
+    return bool(min_results) and sum(shard['total'] for shard in shards) < min_results
+
+def merge_stores(snapshots: Dict[str, CatalogSnapshot], category: str, criteria: Dict[str, Any], shards: Dict[str, Dict[str, Any]],
+                 limit: Optional[int], offset: int, timings: Dict[str, float]) -> Dict[str, Any]:
+    stores = list(shards)
+    total = sum(shard['total'] for shard in shards.values())
+    RESULT_SIZE.observe(total, category=category)
+    if total == 0:
+        # Không store nào có kết quả: gợi ý thay thế lấy từ store đầu tiên
+        result = empty_result(snapshots[stores[0]], category, criteria, timings)
     else:
-        purpose_descriptions = []
-        for purpose in selected_purposes:
-            purpose_desc_map = {
-                "Beginner": "người mới",
-                "Professional": "chuyên nghiệp",
-                "Sports": "thể thao",
-                "Video": "quay video",
-                "Daily use": "sử dụng hàng ngày",
-                "Travel": "du lịch",
-                "Vlogging": "vlogging",
-                "Studio": "studio"
-            }
-            purpose_descriptions.append(purpose_desc_map.get(purpose, purpose.lower()))
+        stage_start = time.perf_counter()
+        store_of = np.concatenate([np.full(len(shards[store]['positions']), i) for i, store in enumerate(stores)])
+        positions = np.concatenate([shards[store]['positions'] for store in stores])
+        scores = np.concatenate([shards[store]['scores'] for store in stores])
+        models = np.concatenate([shards[store]['models'] for store in stores])
+        # Cùng thứ tự với một catalog: điểm giảm dần, giá tăng dần, tên model; cùng model cùng giá thì theo thứ tự store
+        order = rank_order(scores, np.concatenate([shards[store]['prices'] for store in stores]),
+                           pd.factorize(models, sort=True)[0], offset + limit if limit else None)[offset:]
+        timings['merge'] = time.perf_counter() - stage_start
+        selected_purposes = purpose_names(criteria.get('purposes'))
+        recommendations: List[Optional[Dict[str, Any]]] = [None] * len(order)
+        for i, store in enumerate(stores):
+            picked = np.flatnonzero(store_of[order] == i)
+            if len(picked) == 0:
+                continue
+            items = format_recommendations(snapshots[store], category, positions[order[picked]], scores[order[picked]], selected_purposes, timings)
+            for j, item in zip(picked, items):
+                recommendations[j] = {**item, 'store': store}
+        result = {
+            'recommendations': recommendations,
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'stores': {store: shards[store]['total'] for store in stores},
+            'version': {store: snapshot.version for store, snapshot in snapshots.items()},
+        }
+    relaxations = [shard['relaxation'] for shard in shards.values()]
+    if relaxations[0] is not None:
+        result['relaxed'] = relaxations[0].relaxed
+        result['strict_total'] = sum(relaxation.strict_count for relaxation in relaxations)
+    if all('facets' in shard for shard in shards.values()):
+        result['facets'] = merge_facets([shard['facets'] for shard in shards.values()], [shard['facet_prices'] for shard in shards.values()])
+    observe_stages(category, timings)
+    return result
+
+def merge_timings(timings: Dict[str, float], shard_timings: List[Dict[str, float]]):
+    # Các shard chạy song song: mỗi bước tính theo shard chậm nhất
+    for shard in shard_timings:
+        for stage, seconds in shard.items():
+            timings[stage] = max(timings.get(stage, 0), seconds)
+
+async def fan_out(snapshots: Dict[str, CatalogSnapshot], key: str, category: str, criteria: Dict[str, Any], request: RecommendationRequest,
+                  timings: Dict[str, float]) -> Dict[str, Any]:
+    k = request.offset + request.limit if request.limit else None
+    shard_timings = [{} for _ in snapshots]
+    shards = await asyncio.gather(*(
+        pool.run(store_candidates, snapshot, category, criteria, k, request.facets, shard_timing)
+        for snapshot, shard_timing in zip(snapshots.values(), shard_timings)
+    ))
+    if needs_relaxing(shards, request.min_results):
+        relaxations = await pool.run(relax_stores, snapshots, category, criteria, request.min_results, timings)
+        if relaxations is not None:
+            shards = await asyncio.gather(*(
+                pool.run(store_candidates, snapshot, category, criteria, k, request.facets, shard_timing, relaxation)
+                for snapshot, shard_timing, relaxation in zip(snapshots.values(), shard_timings, relaxations)
+            ))
+    merge_timings(timings, shard_timings)
+    result = await pool.run(merge_stores, snapshots, category, criteria, dict(zip(snapshots, shards)), request.limit, request.offset, timings)
+    if tracer.should_sample():
+        record_trace(snapshots, category, criteria, request.limit, request.offset, request.min_results, result, timings)
+    result_cache.put(key, result, stores_version(snapshots, category))
+    return result
+
+# Chế độ stream (NDJSON): toàn bộ kết quả được xếp hạng một lần, còn giải thích/format/serialize
+# làm theo từng lô STREAM_BATCH_SIZE sản phẩm và gửi ngay, nên bộ nhớ chỉ giữ một lô mục gợi ý
+NDJSON = "application/x-ndjson"
+STREAM_BATCH_SIZE = int(os.environ.get("RECOMMEND_STREAM_BATCH", 100))
+
+def ndjson_lines(items: List[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(item, ensure_ascii=False, separators=(',', ':')) + "\n" for item in items).encode('utf-8')
+
+def rank_for_stream(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], limit: Optional[int], offset: int,
+                    timings: Dict[str, float], facets: bool = False, min_results: Optional[int] = None,
+                    store: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, Dict[str, Any]]:
+    positions, scores = score_positions(snapshot, category, criteria, timings)
+    positions, scores, relaxation = relax_positions(snapshot, category, criteria, positions, scores, min_results, timings)
+    order = ranked(snapshot, category, positions, scores, limit, offset, timings)
+    RESULT_SIZE.observe(len(positions), category=category)
+    header = add_relaxation({'total': len(positions), 'offset': offset, 'limit': limit, 'version': snapshot.version}, relaxation)
+    if facets:
+        header['facets'] = recommendation_facets(snapshot, category, criteria, timings)
+    if tracer.should_sample():
+        models = snapshot[category]['Model'].iloc[positions[order]].astype(str)
+        record_trace({store or STORES[0]: snapshot}, category, criteria, limit, offset, min_results,
+                     {**header, 'recommendations': [{'model': model} for model in models]}, timings)
+    return positions[order], scores[order], header
+
+def format_batch(snapshot: CatalogSnapshot, category: str, positions: np.ndarray, scores: np.ndarray,
+                 selected_purposes: Optional[List[str]], timings: Dict[str, float]) -> bytes:
+    recommendations = format_recommendations(snapshot, category, positions, scores, selected_purposes, timings)
+    stage_start = time.perf_counter()
+    data = ndjson_lines(recommendations)
+    timings['serialize'] = timings.get('serialize', 0) + time.perf_counter() - stage_start
+    return data
+
+async def stream_recommendations(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any], positions: np.ndarray, scores: np.ndarray,
+                                 header: Dict[str, Any], timings: Dict[str, float], started: float) -> AsyncIterator[bytes]:
+    """Dòng đầu là thông tin chung (total, offset, limit, version, facets), mỗi dòng sau là một sản phẩm.
+
+    Lỗi xảy ra khi đã gửi một phần (pool đầy...) không đổi được mã HTTP nữa
+    nên được báo bằng một dòng {"error", "status_code"} cuối cùng.
+    """
+    yield ndjson_lines([header])
+    selected_purposes = purpose_names(criteria.get('purposes'))
+    try:
+        if header['total'] == 0:
+            yield ndjson_lines([await pool.run(empty_result, snapshot, category, criteria, timings)])
+        for start in range(0, len(positions), STREAM_BATCH_SIZE):
+            end = start + STREAM_BATCH_SIZE
+            yield await pool.run(format_batch, snapshot, category, positions[start:end], scores[start:end], selected_purposes, timings)
+    except Overloaded:
+        REQUEST_ERRORS.inc(category=category, status='503')
+        yield ndjson_lines([{'error': 'Máy chủ đang bận, vui lòng thử lại sau', 'status_code': 503}])
+        return
+    except Exception as e:
+        logger.exception("Streaming recommendations for %s failed", category)
+        REQUEST_ERRORS.inc(category=category, status='500')
+        yield ndjson_lines([{'error': f"Error: {str(e)}", 'status_code': 500}])
+        return
+    observe_stages(category, timings)
+    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint='recommend_stream')
+
+@app.post("/recommend")
+async def recommend(request: RecommendationRequest, stream: bool = False, accept: Annotated[Optional[str], Header()] = None,
+                    accept_encoding: Annotated[Optional[str], Header()] = None, if_none_match: Annotated[Optional[str], Header()] = None):
+    started = time.perf_counter()
+    category = request.category.lower()
+    timings: Dict[str, float] = {}
+    try:
+        stores = request_stores(request.store)
+        snapshots = await store_snapshots(stores)
+        snapshot = snapshots[stores[0]]
+        if not all(category in s for s in snapshots.values()):
+            raise HTTPException(status_code=400, detail="Invalid category")
         
-        if len(purpose_descriptions) > 1:
-            multi_purpose_desc = f"phù hợp cho {', '.join(purpose_descriptions[:-1])} và {purpose_descriptions[-1]}"
-            explanation += multi_purpose_desc
-        else:
-            explanation += f"phù hợp cho {purpose_descriptions[0]}"
-    
-    feature_descriptions = []
-    
-    if "Beginner" in selected_purposes and price < 23000000:
-        price_desc = f"giá {int(price)} đồng"
-        feature_descriptions.append(price_desc)
+        # Request tương đương (hoa thường, khoảng giá phủ cả catalog...) dùng chung một mục cache
+        criteria = canonical_criteria(request.criteria, PURPOSES_PER_CATEGORY.get(category, []), stores_price_range(snapshots, category))
+        # ?stream=true hoặc Accept: application/x-ndjson: trả từng lô thay vì dựng cả response (không qua cache)
+        if stream or NDJSON in (accept or ''):
+            if len(stores) > 1:
+                raise HTTPException(status_code=400, detail="Streaming supports a single store")
+            positions, scores, header = await pool.run(rank_for_stream, snapshot, category, criteria, request.limit, request.offset, timings,
+                                                       request.facets, request.min_results, stores[0])
+            return StreamingResponse(
+                stream_recommendations(snapshot, category, criteria, positions, scores, header, timings, started),
+                media_type=NDJSON,
+                headers={'Server-Timing': server_timing(timings)},
+            )
+        key = recommend_key(category, criteria, request, stores)
+        # Client đã có đúng kết quả này (cùng tiêu chí, dữ liệu category chưa đổi): 304, không lọc/tính/gửi lại
+        headers = conditional_headers(snapshots, category, key)
+        if etag_matches(if_none_match, headers['ETag']):
+            CACHE_LOOKUPS.inc(result='not_modified')
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint='recommend')
+            return Response(status_code=304, headers=headers)
+        result = result_cache.get(key, stores_version(snapshots, category))
+        CACHE_LOOKUPS.inc(result='miss' if result is None else 'hit')
+        if result is None and len(stores) > 1:
+            result = await flights.do(
+                ('recommend', tuple(s.version for s in snapshots.values()), key),
+                lambda: fan_out(snapshots, key, category, criteria, request, timings),
+            )
+        elif result is None:
+            # Các request giống hệt nhau đang chờ cùng lúc chỉ tính một lần
+            result = await flights.do(
+                ('recommend', snapshot.version, key),
+                lambda: pool.run(compute_recommendations, snapshot, key, category, criteria, request.limit, request.offset, timings,
+                                 request.facets, request.min_results, stores[0]),
+            )
+        response = json_response(with_versions(result, snapshots), timings, started, headers, negotiate_encoding(accept_encoding))
+        STAGE_SECONDS.observe(timings['serialize'], stage='serialize', category=category)
+        REQUEST_SECONDS.observe(timings['total'], endpoint='recommend')
+        return response
+    except HTTPException as e:
+        REQUEST_ERRORS.inc(category=category, status=str(e.status_code))
+        raise
+    except Overloaded as e:
+        REQUEST_ERRORS.inc(category=category, status='503')
+        raise server_busy(e)
+    except InvalidCriteria as e:
+        REQUEST_ERRORS.inc(category=category, status='400')
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        REQUEST_ERRORS.inc(category=category, status='500')
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+# Gộp nhiều store trong một batch: các shard chạy tuần tự vì cả batch đã nằm trên một luồng của pool
+def build_store_recommendations(snapshots: Dict[str, CatalogSnapshot], category: str, criteria: Dict[str, Any],
+                                request: RecommendationRequest) -> Dict[str, Any]:
+    active_criteria(category, criteria)
+    k = request.offset + request.limit if request.limit else None
+    timings: Dict[str, float] = {}
+    shards = [store_candidates(snapshot, category, criteria, k, request.facets, timings) for snapshot in snapshots.values()]
+    if needs_relaxing(shards, request.min_results):
+        relaxations = relax_stores(snapshots, category, criteria, request.min_results, timings)
+        if relaxations is not None:
+            shards = [store_candidates(snapshot, category, criteria, k, request.facets, timings, relaxation)
+                      for snapshot, relaxation in zip(snapshots.values(), relaxations)]
+    result = merge_stores(snapshots, category, criteria, dict(zip(snapshots, shards)), request.limit, request.offset, timings)
+    if tracer.should_sample():
+        record_trace(snapshots, category, criteria, request.limit, request.offset, request.min_results, result, timings)
+    return result
 
-    for criterion, actual_value in all_matching_features.items():
-        if criterion == "Price":
+def batch_recommendations(snapshots: Dict[str, CatalogSnapshot], requests: List[RecommendationRequest]) -> Dict[str, Any]:
+    # Lỗi của một request (category, store, tiêu chí không hợp lệ) chỉ ảnh hưởng kết quả của nó
+    results: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+    pending: Dict[Tuple[str, str], List[Tuple[int, str, Dict[str, Any], Optional[int], int, bool, Optional[int]]]] = {}
+    for i, request in enumerate(requests):
+        category = request.category.lower()
+        try:
+            stores = request_stores(request.store)
+        except HTTPException as e:
+            results[i] = {'error': e.detail, 'status_code': e.status_code}
             continue
-    
-    for criterion, actual_value in all_matching_features.items():
-        if criterion == "Price":
+        selected = {store: snapshots[store] for store in stores}
+        if not all(category in snapshot for snapshot in selected.values()):
+            results[i] = {'error': 'Invalid category', 'status_code': 400}
             continue
-            
-        desc = None
-        if criterion == "Resolution":
-            desc = f"độ phân giải {actual_value}"
-        elif criterion == "Weight":
-            desc = f"trọng lượng {actual_value}g"
-        elif criterion == "Battery Life":
-            desc = f"pin {actual_value} khung hình"
-        elif criterion == "Burst Shooting":
-            desc = f"chụp liên tục {actual_value} fps"
-        elif criterion == "ISO Max":
-            desc = f"ISO tối đa {actual_value}"
-        elif criterion == "Weathersealing" and actual_value == 1:
-            desc = "chống chịu thời tiết"
-        elif criterion == "Autofocus Type" and str(actual_value).lower() == "hybrid":
-            desc = "lấy nét Hybrid"
-        elif criterion == "Flipscreen" and (actual_value == 1 or str(actual_value).lower() == "yes"):
-            desc = "màn hình lật 360o"
-        elif criterion == "Quay 4K" and (actual_value == 1 or str(actual_value).lower() == "yes"):
-            desc = "quay 4K"
-        elif criterion == "External Mic Input" and(actual_value == 1 or str(actual_value).lower() == "yes"):
-            desc = "có cổng mic ngoài"
-        elif criterion == "IBIS" and (actual_value == 1 or str(actual_value).lower() == "yes"):
-            desc = "chống rung IBIS"
-        elif criterion == "Film Simulation" and(actual_value == 1 or str(actual_value).lower() == "yes"):
-            desc = "có giả lập màu film"
-        elif criterion == "WiFi" and(actual_value == 1 or str(actual_value).lower() == "yes"):
-            if "Bluetooth" in normalized_features and ((normalized_features["Bluetooth"]) == 1 or str(normalized_features["Bluetooth"]).lower() == "true"):
-                desc = "có WiFi/Bluetooth"
-            else:
-                desc = "có WiFi"
-        elif criterion == "USB-C" and(actual_value == 1 or str(actual_value).lower() == "yes"):
-            desc = "USB-C (hỗ trợ tethering)"
-        
-        if desc:
-            feature_descriptions.append(desc)    
-    
-    if len(feature_descriptions) > 1:
-        feature_text = " với " + ", ".join(feature_descriptions[:-1]) + ", và " + feature_descriptions[-1] + "."
-        explanation += feature_text
-    elif len(feature_descriptions) == 1:
-        feature_text = " với " + feature_descriptions[0] + "."
-        explanation += feature_text
-    else:
-        if len(selected_purposes) == 1:
-            primary_purpose = selected_purposes[0]
-            general_descriptions = {
-                "Beginner": "thiết kế dễ sử dụng phù hợp với người mới.",
-                "Professional": "chất lượng chuyên nghiệp đáp ứng yêu cầu cao.",
-                "Sports": "hiệu suất tối ưu cho chụp thể thao.",
-                "Video": "các tính năng chuyên biệt cho quay phim.",
-                "Daily use": "thiết kế tiện lợi cho sử dụng hàng ngày.",
-                "Travel": "kích thước nhỏ gọn lý tưởng cho du lịch.",
-                "Vlogging": "tính năng hoàn hảo cho người làm vlog.",
-                "Studio": "chất lượng hình ảnh cao cấp cho công việc studio."
-            }
-            general_desc = " với " + general_descriptions.get(primary_purpose, "các tính năng phù hợp với nhu cầu của bạn.")
-            explanation += general_desc
+        try:
+            criteria = canonical_criteria(request.criteria, PURPOSES_PER_CATEGORY.get(category, []), stores_price_range(selected, category))
+        except (InvalidCriteria, TypeError, ValueError) as e:
+            results[i] = {'error': str(e), 'status_code': 400}
+            continue
+        key = recommend_key(category, criteria, request, stores)
+        results[i] = with_versions(result_cache.get(key, stores_version(selected, category)), selected)
+        CACHE_LOOKUPS.inc(result='miss' if results[i] is None else 'hit')
+        if results[i] is not None:
+            continue
+        if len(stores) > 1:
+            try:
+                results[i] = build_store_recommendations(selected, category, criteria, request)
+            except InvalidCriteria as e:
+                results[i] = {'error': str(e), 'status_code': 400}
+                continue
+            result_cache.put(key, results[i], stores_version(selected, category))
         else:
-            general_multi_desc = " với nhiều tính năng phù hợp cho đa dạng nhu cầu của bạn."
-            explanation += general_multi_desc
-    
-    return explanation
+            pending.setdefault((stores[0], category), []).append((i, key, criteria, request.limit, request.offset, request.facets, request.min_results))
 
-# API endpoint
-@app.post("/recommend")
-async def recommend(request: RecommendationRequest):
+    # Các request một store chưa có trong cache được gom theo store và category, tính chung một lượt
+    for (store, category), group in pending.items():
+        snapshot = snapshots[store]
+        items = []
+        for item in group:
+            i, criteria = item[0], item[2]
+            try:
+                # Kiểm tra nhãn khoảng (bucket) trước để một tiêu chí sai không làm hỏng cả nhóm
+                active_criteria(category, criteria)
+                items.append(item)
+            except InvalidCriteria as e:
+                results[i] = {'error': str(e), 'status_code': 400}
+        if not items:
+            continue
+        outputs = build_batch_recommendations(snapshot, category, [item[2:] for item in items], store)
+        for (i, key, *_), result in zip(items, outputs):
+            result_cache.put(key, result, snapshot.category_version(category))
+            results[i] = result
+    if len(snapshots) == 1:
+        return {'results': results, 'version': next(iter(snapshots.values())).version}
+    return {'results': results, 'version': {store: snapshot.version for store, snapshot in snapshots.items()}}
+
+@app.post("/recommend/batch")
+async def recommend_batch(batch: BatchRecommendationRequest, accept_encoding: Annotated[Optional[str], Header()] = None):
+    started = time.perf_counter()
+    # Chỉ chờ catalog của các store được hỏi; store không hợp lệ được báo lỗi theo từng request
+    stores = set()
+    for request in batch.requests:
+        try:
+            stores.update(request_stores(request.store))
+        except HTTPException:
+            pass
+    snapshots = await store_snapshots([store for store in STORES if store in stores] or STORES[:1])
     try:
-        specs_dfs = load_data()
-        category = request.category.lower()
-        
-        if category not in specs_dfs:
-            raise HTTPException(status_code=400, detail="Invalid category")
-        
-        df = specs_dfs[category].copy()
-        
-        # Apply filters
-        filtered_df = apply_filters(df, category, request.criteria)
-        
-        # Calculate scores based on purposes
-        selected_purposes = request.criteria.get('purposes', [])
-        scored_df = calculate_scores(filtered_df, category, selected_purposes)
-        scored_df = scored_df[scored_df['score'] >= 0.5]
-        
-        # Sort and get top products
-        top_products = scored_df.sort_values('score', ascending=False)
-        
-        if top_products.empty:
-            return {'message': 'Không tìm thấy sản phẩm phù hợp'}
-        
-        # Format response
-        recommendations = []
-        for _, row in top_products.iterrows():
-            row = row.rename(str.lower)
-
-            # Get product details for prompt
-            product_model = row.get('model', 'unknown')
-            product_price = row.get('price', 'N/A')
-            product_details = {col: row[col] for col in row.index if col not in ['model', 'price', 'score', 'colour', 'condition', 'series', 'free gift']}
-            
-            # add explaination
-            if category == "cameras":
-                explanation = generate_explanation(product_model, selected_purposes, product_details, product_price)
-            
-            rec = {
-                'model': product_model,
-                'price': product_price,
-                'score': round(row.get('score', 0), 2),
-                'colour': row.get('colour', 'black'),
-                'series': row.get('series', ''),
-                'condition': row.get('condition', 'unknown'),
-                'free_gift': row.get('free gift', 'none'),
-                'details': product_details,
-                'explanation': explanation  if category == "cameras" else None
-            }
-            recommendations.append(rec)
-
-        return {'recommendations': recommendations}
+        result = await pool.run(batch_recommendations, snapshots, batch.requests)
+        timings = {'compute': time.perf_counter() - started}
+        response = json_response(result, timings, started, VARY, negotiate_encoding(accept_encoding))
+        REQUEST_SECONDS.observe(timings['total'], endpoint='batch')
+        return response
+    except Overloaded as e:
+        REQUEST_ERRORS.inc(category='batch', status='503')
+        raise server_busy(e)
     except Exception as e:
+        REQUEST_ERRORS.inc(category='batch', status='500')
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+# Sản phẩm tương tự một model (cùng category); score là độ tương tự cosine của vector thông số
+def build_similar(snapshot: CatalogSnapshot, category: str, position: int, limit: int, timings: Dict[str, float]) -> Dict[str, Any]:
+    stage_start = time.perf_counter()
+    index = similarity_index(snapshot, category)
+    positions, similarities = index.similar(position, limit)
+    timings['similar'] = time.perf_counter() - stage_start
+    return {
+        'model': index.models[position],
+        'similar': format_recommendations(snapshot, category, positions, similarities, None, timings),
+        'version': snapshot.version,
+    }
+
+def compute_similar(snapshot: CatalogSnapshot, key: str, category: str, position: int, limit: int, timings: Dict[str, float]) -> Dict[str, Any]:
+    result = build_similar(snapshot, category, position, limit, timings)
+    result_cache.put(key, result, snapshot.category_version(category))
+    return result
+
+@app.get("/similar/{category}/{model:path}")
+async def similar_products(category: str, model: str, limit: Annotated[int, Query(ge=1, le=100)] = 10,
+                           store: Optional[str] = None, accept_encoding: Annotated[Optional[str], Header()] = None):
+    started = time.perf_counter()
+    category = category.lower()
+    try:
+        store = single_store(store)
+    except HTTPException:
+        REQUEST_ERRORS.inc(category=category, status='400')
+        raise
+    snapshot = await get_snapshot(store)
+    timings: Dict[str, float] = {}
+    if category not in snapshot:
+        REQUEST_ERRORS.inc(category=category, status='400')
+        raise HTTPException(status_code=400, detail="Invalid category")
+    position = similarity_index(snapshot, category).position(model)
+    if position is None:
+        REQUEST_ERRORS.inc(category=category, status='404')
+        raise HTTPException(status_code=404, detail=f"Không tìm thấy model: {model}")
+    try:
+        key = cache_key('similar', store, category, position, limit)
+        result = result_cache.get(key, snapshot.category_version(category))
+        CACHE_LOOKUPS.inc(result='miss' if result is None else 'hit')
+        if result is None:
+            result = await pool.run(compute_similar, snapshot, key, category, position, limit, timings)
+        response = json_response(with_version(result, snapshot), timings, started, VARY, negotiate_encoding(accept_encoding))
+        REQUEST_SECONDS.observe(timings['total'], endpoint='similar')
+        return response
+    except Overloaded as e:
+        REQUEST_ERRORS.inc(category=category, status='503')
+        raise server_busy(e)
+
+# Điểm và mask đạt lọc của một thành phần trên cả category; thành phần có purposes thì phải đạt ngưỡng điểm
+def bundle_part(snapshot: CatalogSnapshot, category: str, criteria: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, bool]:
+    matrix = purpose_matrix(snapshot, category)
+    weights = matrix.weights(criteria.get('purposes'))
+    scores = matrix.scores(weights)
+    ok = category_index(snapshot, category).mask(criteria)
+    if weights is not None:
+        ok = ok & (scores >= SCORE_THRESHOLD - SCORE_EPSILON)
+    return scores, ok, weights is not None
+
+# Top bộ theo điểm kết hợp (trung bình điểm các thành phần có purposes), hòa điểm thì rẻ hơn trước
+def build_bundles(snapshot: CatalogSnapshot, budget: float, parts: Dict[str, Dict[str, Any]], limit: int,
+                  timings: Dict[str, float]) -> Dict[str, Any]:
+    stage_start = time.perf_counter()
+    scored = {name: bundle_part(snapshot, category, parts[name]) for name, category in BUNDLE_PARTS if name in parts}
+    weighted = sum(has_purposes for _, _, has_purposes in scored.values()) or 1
+    arguments = [array for scores, ok, _ in scored.values() for array in (scores / weighted, ok)]
+    timings['score'] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    bundles = search_bundles(bundle_index(snapshot), budget, limit, *arguments)
+    timings['bundle'] = time.perf_counter() - stage_start
+
+    # Mỗi thành phần được format một lượt cho mọi bộ
+    formatted = {}
+    for i, (name, category) in enumerate(BUNDLE_PARTS):
+        if name not in scored:
+            continue
+        positions = np.array([bundle[2 + i] for bundle in bundles], dtype=np.intp)
+        formatted[name] = format_recommendations(snapshot, category, positions, scored[name][0][positions],
+                                                 purpose_names(parts[name].get('purposes')), timings)
+    result = []
+    for j, (score, price, *_) in enumerate(bundles):
+        item = {'score': round(float(score), 2), 'total_price': float(price)}
+        item.update({name: items[j] for name, items in formatted.items()})
+        result.append(item)
+    return {'bundles': result, 'budget': budget, 'version': snapshot.version}
+
+def bundle_version(snapshot: CatalogSnapshot, parts: Dict[str, Dict[str, Any]]) -> Tuple[int, ...]:
+    return tuple(snapshot.category_version(category) for name, category in BUNDLE_PARTS if name in parts)
+
+def compute_bundles(snapshot: CatalogSnapshot, key: str, budget: float, parts: Dict[str, Dict[str, Any]], limit: int,
+                    timings: Dict[str, float]) -> Dict[str, Any]:
+    result = build_bundles(snapshot, budget, parts, limit, timings)
+    result_cache.put(key, result, bundle_version(snapshot, parts))
+    return result
+
+@app.post("/recommend/bundle")
+async def recommend_bundle(request: BundleRequest, accept_encoding: Annotated[Optional[str], Header()] = None):
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    try:
+        store = single_store(request.store)
+        snapshot = await get_snapshot(store)
+        requested = {'camera': request.camera, 'lens': request.lens}
+        if request.gimbal is not None:
+            requested['gimbal'] = request.gimbal
+        parts = {}
+        for name, category in BUNDLE_PARTS:
+            if name not in requested:
+                continue
+            if category not in snapshot:
+                raise HTTPException(status_code=400, detail=f"Catalog không có {category}")
+            parts[name] = canonical_criteria(requested[name], PURPOSES_PER_CATEGORY.get(category, []), category_index(snapshot, category).price_range)
+            active_criteria(category, parts[name])
+        key = cache_key('bundle', store, request.budget, parts, request.limit)
+        result = result_cache.get(key, bundle_version(snapshot, parts))
+        CACHE_LOOKUPS.inc(result='miss' if result is None else 'hit')
+        if result is None:
+            result = await pool.run(compute_bundles, snapshot, key, request.budget, parts, request.limit, timings)
+        response = json_response(with_version(result, snapshot), timings, started, VARY, negotiate_encoding(accept_encoding))
+        REQUEST_SECONDS.observe(timings['total'], endpoint='bundle')
+        return response
+    except HTTPException as e:
+        REQUEST_ERRORS.inc(category='bundle', status=str(e.status_code))
+        raise
+    except Overloaded as e:
+        REQUEST_ERRORS.inc(category='bundle', status='503')
+        raise server_busy(e)
+    except InvalidCriteria as e:
+        REQUEST_ERRORS.inc(category='bundle', status='400')
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        REQUEST_ERRORS.inc(category='bundle', status='500')
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Tìm model theo tên gần đúng (search.py); chỉ tra chỉ mục dựng sẵn nên chạy ngay trên event loop
+@app.get("/search")
+async def search_models(q: Annotated[str, Query(min_length=1, max_length=100)], limit: Annotated[int, Query(ge=1, le=50)] = 10,
+                        category: Optional[str] = None, store: Optional[str] = None):
+    started = time.perf_counter()
+    snapshot = await get_snapshot(single_store(store))
+    if category is not None and category.lower() not in snapshot:
+        REQUEST_ERRORS.inc(category=category.lower(), status='400')
+        raise HTTPException(status_code=400, detail="Invalid category")
+    index = search_index(snapshot)
+    positions, scores = index.match(q, limit, category=category.lower() if category else None)
+    timings = {'search': time.perf_counter() - started}
+    response = json_response({'query': q, 'results': index.results(positions, scores), 'version': snapshot.version}, timings, started)
+    REQUEST_SECONDS.observe(timings['total'], endpoint='search')
+    return response
+
+@app.get("/catalog/mismatches")
+async def catalog_mismatches(store: Optional[str] = None):
+    snapshot = await get_snapshot(single_store(store))
+    return {'version': snapshot.version, **(name_mismatches(snapshot) or {'inventory_unmatched': None, 'specs_without_inventory': None})}
+
+@app.get("/catalog/status")
+async def catalog_status():
+    if len(catalogs) == 1:
+        return catalogs[STORES[0]].status()
+    return {'stores': {store: catalog.status() for store, catalog in catalogs.items()}}
+
+@app.get("/debug/cache")
+async def cache_status():
+    return result_cache.stats()
+
+@app.get("/debug/workers")
+async def worker_status():
+    return {**pool.status(), "singleflight_shared": flights.shared}
+
+@app.get("/debug/traces")
+async def trace_status():
+    return tracer.status()
+
+# Dung lượng từng category theo kiểu của schema so với kiểu mặc định của pandas
+@app.get("/debug/memory")
+async def memory_status(columns: bool = False, store: Optional[str] = None):
+    snapshot = await get_snapshot(single_store(store))
+    categories = {}
+    for category in snapshot.specs_dfs:
+        report = snapshot.derived(('memory', category), lambda: memory_report(snapshot[category]))
+        categories[category] = report if columns else {k: v for k, v in report.items() if k != 'columns'}
+    total = sum(r['bytes'] for r in categories.values())
+    untyped = sum(r['untyped_bytes'] for r in categories.values())
+    return {
+        'version': snapshot.version,
+        'bytes': total,
+        'untyped_bytes': untyped,
+        'ratio': round(total / untyped, 3) if untyped else None,
+        'categories': categories,
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,26 @@
+from typing import Optional
+
+import numpy as np
+
+# Ngưỡng điểm tối thiểu để một sản phẩm được gợi ý
+SCORE_THRESHOLD = 0.5
+
+
+def rank_order(scores: np.ndarray, prices: np.ndarray, model_rank: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """Thứ tự (vị trí trong mảng đầu vào) của k phần tử tốt nhất.
+
+    Sắp theo điểm giảm dần, hòa điểm thì giá tăng dần rồi tên model, nên thứ
+    tự là xác định và các trang liên tiếp trong cùng một phiên bản catalog
+    không chồng lấn. Với k nhỏ, argpartition chọn trước các ứng viên (giữ cả
+    các phần tử bằng điểm ở biên) rồi chỉ sắp xếp phần đó.
+    """
+    n = len(scores)
+    if k is None or k >= n:
+        candidates = np.arange(n)
+    elif k <= 0:
+        return np.empty(0, dtype=np.intp)
+    else:
+        kth_score = -np.partition(-scores, k - 1)[k - 1]
+        candidates = np.flatnonzero(scores >= kth_score)
+    order = np.lexsort((model_rank[candidates], prices[candidates], -scores[candidates]))
+    return candidates[order[:k]] if k is not None else candidates[order]
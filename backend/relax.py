@@ -0,0 +1,124 @@
+"""Nới tiêu chí khi kết quả rỗng hoặc quá ít.
+
+Mỗi tiêu chí đang chọn (kể cả khoảng giá) là một mask trên cả category, lấy
+từ chỉ mục lọc và nén thành bitset uint64. Với một tập tiêu chí được nới, số
+kết quả chỉ còn là popcount của phép AND các bitset còn lại với bitset các
+sản phẩm đạt ngưỡng điểm, không phải chạy lại lọc/tính điểm. Các tập được
+duyệt theo số tiêu chí nới tăng dần nên tập tìm được là nhỏ nhất; cùng kích
+thước thì chọn tập cho nhiều kết quả nhất. Nhiều hơn RELAX_EXHAUSTIVE_MAX tiêu
+chí thì nới tham lam từng tiêu chí một.
+
+Nới một tiêu chí cũng nới các tiêu chí phụ thuộc vào nó (Flipscreen ->
+Flipscreen Type), giống như khi lọc.
+"""
+from itertools import combinations
+from typing import Any, Dict, FrozenSet, List, Optional
+
+import numpy as np
+
+from filters import CategoryIndex, category_filters
+
+RELAX_EXHAUSTIVE_MAX = 12
+
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def pack(mask: np.ndarray) -> np.ndarray:
+    """Mask bool -> bitset uint64 (đệm 0 cho đủ word)."""
+    packed = np.packbits(mask)
+    padded = np.zeros(-(-len(packed) // 8) * 8, dtype=np.uint8)
+    padded[:len(packed)] = packed
+    return padded.view(np.uint64)
+
+
+def unpack(words: np.ndarray, n: int) -> np.ndarray:
+    return np.unpackbits(words.view(np.uint8))[:n].astype(bool)
+
+
+def popcount(words: np.ndarray) -> int:
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(words).sum())
+    return int(_POPCOUNT8[words.view(np.uint8)].sum())
+
+
+class Relaxation:
+    def __init__(self, relaxed: List[str], mask: np.ndarray, count: int, strict_count: int):
+        self.relaxed = relaxed
+        self.mask = mask
+        self.count = count
+        self.strict_count = strict_count
+
+
+def relax_criteria(index: CategoryIndex, criteria: Dict[str, Any], eligible: np.ndarray, min_results: int) -> Optional[Relaxation]:
+    """Tập tiêu chí nhỏ nhất cần nới để có ít nhất min_results kết quả.
+
+    eligible là mask các sản phẩm đạt ngưỡng điểm. Nếu nới hết vẫn không đủ
+    thì nhắm tới số kết quả tối đa có thể. None nếu không cần (hoặc không thể) nới.
+    """
+    relaxations = relax_across([index], criteria, [eligible], min_results)
+    return None if relaxations is None else relaxations[0]
+
+
+def relax_across(indexes: List[CategoryIndex], criteria: Dict[str, Any], eligibles: List[np.ndarray],
+                 min_results: int) -> Optional[List[Relaxation]]:
+    """Như relax_criteria nhưng trên nhiều shard (store) của cùng category.
+
+    Số kết quả là tổng trên các shard và chỉ một tập tiêu chí được nới cho mọi
+    shard: bitset của các shard được nối liền nên popcount của phép AND chính
+    là tổng. Trả về một Relaxation cho mỗi shard (cùng relaxed, mask riêng).
+    """
+    parts = [index.predicate_masks(criteria) for index in indexes]
+    names = [name for name, _ in parts[0]]
+    bases = [pack(eligible) for eligible in eligibles]
+    bounds = np.cumsum([0] + [len(base) for base in bases])
+    base = np.concatenate(bases)
+    target = min(min_results, popcount(base))
+    if names:
+        bitsets = np.hstack([np.stack([pack(mask) for _, mask in masks]) for masks in parts])
+        strict = np.bitwise_and.reduce(bitsets, axis=0) & base
+    else:
+        bitsets, strict = np.empty((0, len(base)), dtype=np.uint64), base
+    if target == 0 or popcount(strict) >= target:
+        return None
+
+    # Nới tiêu chí i thì nới luôn các tiêu chí có 'requires' trỏ tới nó
+    requires = {spec['criterion']: spec['requires'][0] for spec in category_filters(indexes[0].category) if 'requires' in spec}
+    dependents = {i: {j for j, name in enumerate(names) if requires.get(name) == names[i]} for i in range(len(names))}
+
+    def closure(relaxed) -> FrozenSet[int]:
+        result = set(relaxed)
+        for i in relaxed:
+            result |= dependents[i]
+        return frozenset(result)
+
+    def count(relaxed: FrozenSet[int]):
+        kept = [i for i in range(len(names)) if i not in relaxed]
+        words = np.bitwise_and.reduce(bitsets[kept], axis=0) & base if kept else base
+        return popcount(words), words
+
+    best = None
+    if len(names) <= RELAX_EXHAUSTIVE_MAX:
+        for size in range(1, len(names) + 1):
+            for relaxed in combinations(range(len(names)), size):
+                closed = closure(relaxed)
+                if len(closed) != size:
+                    # Tập đóng lớn hơn sẽ được xét ở kích thước của nó
+                    continue
+                c, words = count(closed)
+                if c >= target and (best is None or c > best[1]):
+                    best = (closed, c, words)
+            if best is not None:
+                break
+    else:
+        relaxed = frozenset()
+        while True:
+            options = [closure(relaxed | {i}) for i in range(len(names)) if i not in relaxed]
+            scored = [(count(option), option) for option in options]
+            (c, words), relaxed = max(scored, key=lambda item: item[0][0])
+            if c >= target:
+                best = (relaxed, c, words)
+                break
+    closed, _, words = best
+    relaxed = [names[i] for i in sorted(closed)]
+    return [Relaxation(relaxed, unpack(words[lo:hi], index.n), popcount(words[lo:hi]), popcount(strict[lo:hi]))
+            for index, lo, hi in zip(indexes, bounds[:-1], bounds[1:])]
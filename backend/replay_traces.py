@@ -0,0 +1,146 @@
+"""Chạy lại các truy vấn đã ghi vết qua apply_filters/calculate_scores để đo hiệu năng.
+
+    python replay_traces.py traces/trace-*.ndjson.gz --snapshot catalog_snapshot.rcs --repeat 5
+    python replay_traces.py traces/*.ndjson.gz --snapshot hcm=snap-hcm.rcs --snapshot hanoi=snap-hanoi.rcs --check
+
+Không có --snapshot thì catalog của từng store được tải bằng load_data() từ
+nguồn inventory cấu hình qua biến môi trường (INVENTORY_STORES, INVENTORY_SOURCE,
+INVENTORY_FILE...). --snapshot PATH (không có tên store) là catalog dùng cho
+vết của một store bất kỳ.
+
+--check chạy lại đúng request đã ghi (store, limit/offset, min_results) như
+/recommend, rồi so trang kết quả (theo thứ tự, kèm store của từng mục khi gộp
+nhiều store) và tập tiêu chí đã nới với vết.
+"""
+import argparse
+import json
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from main import (DEFAULT_STORE, RecommendationRequest, apply_filters, build_recommendations, build_store_recommendations,
+                  calculate_scores, category_index, load_data, store_sources)
+from catalog import CatalogSnapshot
+from filters import InvalidCriteria
+from snapshot_store import load_frames
+from tracing import read_traces
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    arr = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(arr, 50)), 3),
+        "p95_ms": round(float(np.percentile(arr, 95)), 3),
+        "p99_ms": round(float(np.percentile(arr, 99)), 3),
+        "max_ms": round(float(arr.max()), 3),
+    }
+
+
+def trace_snapshots(trace: Dict[str, Any], snapshots: Dict[str, CatalogSnapshot]) -> Optional[Dict[str, CatalogSnapshot]]:
+    """Catalog của các store trong vết (vết cũ không ghi store là store mặc định); None nếu thiếu catalog."""
+    stores = trace.get("stores") or [DEFAULT_STORE]
+    if all(store in snapshots for store in stores):
+        return {store: snapshots[store] for store in stores}
+    if len(stores) == 1 and DEFAULT_STORE in snapshots:
+        return {stores[0]: snapshots[DEFAULT_STORE]}
+    return None
+
+
+def rerun(trace: Dict[str, Any], snapshots: Dict[str, CatalogSnapshot]) -> Dict[str, Any]:
+    """Kết quả của request trong vết, tính như /recommend (một store hoặc gộp nhiều store)."""
+    category, criteria = trace["category"], trace.get("criteria", {})
+    limit, offset, min_results = trace.get("limit"), trace.get("offset", 0), trace.get("min_results")
+    if len(snapshots) == 1:
+        store, snapshot = next(iter(snapshots.items()))
+        return build_recommendations(snapshot, category, criteria, limit, offset, min_results=min_results, store=store)
+    request = RecommendationRequest(category=category, criteria=criteria, store=list(snapshots), limit=limit, offset=offset,
+                                    min_results=min_results)
+    return build_store_recommendations(snapshots, category, criteria, request)
+
+
+def matches(trace: Dict[str, Any], result: Dict[str, Any]) -> bool:
+    recommendations = result.get("recommendations", [])
+    if [item["model"] for item in recommendations] != trace.get("models", []) or result.get("relaxed") != trace.get("relaxed"):
+        return False
+    return "model_stores" not in trace or [item["store"] for item in recommendations] == trace["model_stores"]
+
+
+def replay(traces, catalogs: Dict[str, Dict[str, Any]], repeat: int = 1, check: bool = False):
+    snapshots = {store: CatalogSnapshot(0, specs_dfs) for store, specs_dfs in catalogs.items()}
+    timings = defaultdict(lambda: defaultdict(list))
+    mismatches = 0
+    skipped = 0
+
+    for trace in traces:
+        category = trace.get("category")
+        selected = trace_snapshots(trace, snapshots)
+        if selected is None or not all(category in snapshot for snapshot in selected.values()):
+            skipped += 1
+            continue
+        criteria = trace.get("criteria", {})
+        try:
+            for _ in range(repeat):
+                # Nhiều store: lọc và tính điểm trên từng shard, cộng dồn thời gian
+                filter_time = score_time = 0.0
+                for snapshot in selected.values():
+                    index = category_index(snapshot, category)
+                    started = time.perf_counter()
+                    filtered_df = apply_filters(snapshot[category], category, criteria, index)
+                    filtered_at = time.perf_counter()
+                    scored_df = calculate_scores(filtered_df, category, criteria.get("purposes", []))
+                    scored_df[scored_df["score"] >= 0.5].sort_values("score", ascending=False)
+                    filter_time += filtered_at - started
+                    score_time += time.perf_counter() - filtered_at
+                timings[category]["filter"].append(filter_time)
+                timings[category]["score"].append(score_time)
+                timings[category]["total"].append(filter_time + score_time)
+            if check and not matches(trace, rerun(trace, selected)):
+                mismatches += 1
+        except InvalidCriteria:
+            skipped += 1
+
+    report = {
+        "categories": {c: {stage: percentiles(s) for stage, s in stages.items()} for c, stages in timings.items()},
+        "skipped": skipped,
+    }
+    if check:
+        report["mismatches"] = mismatches
+    return report
+
+
+def load_catalogs(snapshot_args: Optional[List[str]]) -> Dict[str, Dict[str, Any]]:
+    """--snapshot [store=]PATH -> catalog theo store; không có thì tải từ nguồn inventory của từng store."""
+    if snapshot_args:
+        catalogs = {}
+        for arg in snapshot_args:
+            store, _, path = arg.rpartition("=")
+            catalogs[store.strip().lower() or DEFAULT_STORE] = load_frames(path)[0]
+        return catalogs
+    if store_sources:
+        return {store: load_data(source) for store, source in store_sources.items()}
+    return {DEFAULT_STORE: load_data()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("traces", nargs="+", help="file vết .ndjson.gz")
+    parser.add_argument("--snapshot", action="append", metavar="[STORE=]PATH",
+                        help="file snapshot catalog (.rcs) thay vì tải từ nguồn inventory; lặp lại cho từng store")
+    parser.add_argument("--repeat", type=int, default=1, help="số lần chạy lại mỗi truy vấn")
+    parser.add_argument("--check", action="store_true", help="so sánh trang kết quả và tiêu chí đã nới với vết")
+    args = parser.parse_args()
+
+    catalogs = load_catalogs(args.snapshot)
+    traces = list(read_traces(args.traces))
+    report = replay(traces, catalogs, repeat=max(1, args.repeat), check=args.check)
+    report["traces"] = len(traces)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from filters import InvalidCriteria
+
+
+def canonical_criteria(criteria: Dict[str, Any], valid_purposes: List[str], price_range: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+    """Chuẩn hóa tiêu chí để các request tương đương có cùng khóa cache.
+
+    Bỏ giá trị rỗng, chữ thường hóa chuỗi (bộ lọc không phân biệt hoa thường),
+    purposes viết theo tên của category, khoảng giá kẹp vào khoảng giá thực tế
+    của catalog. Kết quả tương đương về ngữ nghĩa với đầu vào nên được dùng
+    luôn để tính gợi ý.
+
+    purposes giữ thứ tự người dùng chọn: câu giải thích liệt kê purpose theo
+    thứ tự đó (như generate_explanation), nên hai request chỉ khác thứ tự
+    purposes có response khác nhau và không dùng chung mục cache.
+    """
+    canonical: Dict[str, Any] = {}
+    for key, value in criteria.items():
+        if key == 'purposes':
+            canonical[key] = _canonical_purposes(value, valid_purposes)
+        elif key == 'price':
+            if isinstance(value, (list, tuple)) and len(value) == 2:
+                bounds = _clamp_price(_price_bound(value[0]), _price_bound(value[1]), price_range)
+                # Khoảng giá phủ toàn bộ catalog tương đương với không lọc giá
+                if price_range is None or bounds != [math.floor(price_range[0]), math.ceil(price_range[1])]:
+                    canonical[key] = bounds
+        elif isinstance(value, str):
+            if value.strip():
+                canonical[key] = value.strip().lower()
+        elif isinstance(value, list):
+            items = sorted({str(v).strip().lower() for v in value if v is not None and str(v).strip()})
+            if items:
+                canonical[key] = items
+        elif value is not None:
+            canonical[key] = value
+    return canonical
+
+
+def _canonical_purposes(value: Any, valid_purposes: List[str]) -> Any:
+    # Danh sách = trọng số bằng nhau; dict purpose -> trọng số được chuẩn hóa tổng = 1
+    if isinstance(value, dict):
+        weights = {str(p).strip().lower(): _weight(w) for p, w in value.items() if w is not None}
+        weights = {p: w for p, w in weights.items() if w > 0}
+    else:
+        weights = {str(p).strip().lower(): 1.0 for p in value or []}
+    # Thứ tự của request (lần xuất hiện đầu tiên), tên viết như trong valid_purposes
+    names = {p.lower(): p for p in valid_purposes}
+    selected = [(names[p], w) for p, w in weights.items() if p in names]
+    if len({w for _, w in selected}) <= 1:
+        return [p for p, _ in selected]
+    total = sum(w for _, w in selected)
+    return {p: round(w / total, 6) for p, w in selected}
+
+
+def _price_bound(value: Any) -> int:
+    # Cùng lỗi 400 như khi lọc (filters.price_bounds), thay vì ValueError -> 500
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidCriteria(f"Invalid value for price: {value}")
+
+
+def _weight(value: Any) -> float:
+    # inf/nan làm điểm thành nan, trọng số âm không có nghĩa; 0 là bỏ purpose đó
+    try:
+        weight = float(value)
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidCriteria(f"Invalid weight for purposes: {value}")
+    if not math.isfinite(weight) or weight < 0:
+        raise InvalidCriteria(f"Invalid weight for purposes: {value}")
+    return weight
+
+
+def _clamp_price(low: int, high: int, price_range: Optional[Tuple[float, float]]) -> List[int]:
+    if price_range is None:
+        return [low, high]
+    # Mọi sản phẩm đều có giá trong [min, max] nên kẹp không làm đổi kết quả lọc
+    low = max(low, math.floor(price_range[0]))
+    high = min(high, math.ceil(price_range[1]))
+    return [low, high] if low <= high else [1, 0]
+
+
+def cache_key(*parts: Any) -> str:
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Cache kết quả LRU + TTL, giới hạn số mục và tổng dung lượng ước tính.
+
+    Mỗi mục gắn với phiên bản dữ liệu lúc tính (phiên bản của category, xem
+    CatalogSnapshot.category_versions); đọc với phiên bản khác thì mục đó bị
+    bỏ, nên không bao giờ trả giá cũ sau khi inventory đổi, còn kết quả của
+    các category không đổi vẫn được giữ.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 300.0, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Any, float, int, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str, version: int) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[3] != version:
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any, version: int):
+        if self.max_entries <= 0:
+            return
+        size = len(json.dumps(value, ensure_ascii=False, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl, size, version)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        size = self._entries.pop(key)[2]
+        self.bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,199 @@
+"""Schema kiểu dữ liệu của catalog, áp dụng một lần khi tải.
+
+Mỗi cột của một category thuộc một loại:
+    flag     -- Yes/No, lưu uint8 0/1 (giá trị lạ được tính là 0 và báo lỗi)
+    number   -- số đã kiểm tra; toàn số nguyên thì lưu int32, ngược lại float64
+    score    -- điểm phù hợp 0-1, lưu float32 (ngoài khoảng thì kẹp lại và báo lỗi)
+    category -- chuỗi ít giá trị khác nhau, lưu dạng categorical (mã + bảng giá trị)
+    text     -- chuỗi gần như không lặp (tên model, kích thước), giữ object
+Cột không khai báo được giữ nguyên như khi đọc. TEXT_COPIES khai báo cột chuỗi
+giữ lại giá trị gốc của một cột trước khi cột đó bị ép kiểu.
+"""
+import logging
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FLAG, NUMBER, SCORE, CATEGORY, TEXT = 'flag', 'number', 'score', 'category', 'text'
+
+# Cột lấy từ Inventory khi merge, chung cho mọi category
+INVENTORY_SCHEMA = {
+    'Model': TEXT,
+    'Colour': CATEGORY,
+    'Condition': CATEGORY,
+    'Series': CATEGORY,
+    'Free Gift': CATEGORY,
+}
+
+CATALOG_SCHEMA: Dict[str, Dict[str, str]] = {
+    'cameras': {
+        'Weight (gram)': NUMBER, 'Sensor Size': CATEGORY, 'Resolution (MP)': NUMBER, 'Quality 4K': FLAG,
+        'ISO Min': NUMBER, 'ISO Max': NUMBER, 'Flipscreen': FLAG, 'Flipscreen Type': CATEGORY,
+        'Film Simulation': FLAG, 'Autofocus Type': CATEGORY, 'Burst Shooting (fps)': NUMBER,
+        'External Mic Input': FLAG, 'Optical Viewfinder': FLAG, 'Electronic Viewfinder (EVF)': FLAG,
+        # Như trước khi có schema, WiFi của máy ảnh trả về nguyên "Yes"/"No" (frontend hiển thị nguyên giá trị)
+        'USB-C': FLAG, 'WiFi': CATEGORY, 'Bluetooth': FLAG, 'IBIS': FLAG, 'Weathersealing': FLAG,
+        'Release Year': NUMBER, 'Compatible Lens Type': CATEGORY, 'Dimensions (mm)': TEXT,
+        'Design Style': CATEGORY, 'Rangefinder-style': FLAG, 'Battery Life (frames)': NUMBER,
+        'Beginner': SCORE, 'Professional': SCORE, 'Sports': SCORE, 'Video': SCORE,
+        'Daily Use': SCORE, 'Travel': SCORE, 'Vlogging': SCORE, 'Studio': SCORE,
+    },
+    'lenses': {
+        'Lens Type': CATEGORY, 'Focal Length (mm)': NUMBER, 'Max Aperture': NUMBER,
+        'Image Stabilization (OIS)': FLAG, 'Weight (gram)': NUMBER, 'Filter Size (mm)': NUMBER,
+        'Mount Type': CATEGORY, 'Release Year': NUMBER, 'Minimum Focusing Distance (mm)': NUMBER,
+        'Landscape': SCORE, 'Travel': SCORE, 'Portrait': SCORE, 'Sports': SCORE,
+        'Macro': SCORE, 'Street': SCORE, 'Video': SCORE,
+    },
+    'drones': {
+        'Weight (gram)': NUMBER, 'Max Flight Time (minutes)': NUMBER, 'Control Range (km)': NUMBER,
+        'Camera Resolution': CATEGORY, 'Frames Per Sec': CATEGORY, 'Obstacle Avoidance Sensor': CATEGORY,
+        'Folded Size (mm)': TEXT, 'Tracking': FLAG, 'Orbit Mode': FLAG, 'Auto Rotation': FLAG,
+        'Wind Resistance': CATEGORY, 'Battery Capability (mAh)': NUMBER, 'Maximum Flight Speed (km/h)': NUMBER,
+        'Vertical Video Recording': FLAG, 'Release Year': NUMBER,
+        'Stability': SCORE, 'Sports': SCORE, 'Travel': SCORE, 'Vlogging': SCORE,
+        'Professional': SCORE, 'Easy Of Use': SCORE,
+    },
+    'gimbals': {
+        'Maximum Payload (kg)': NUMBER, 'Battery Life (hours)': NUMBER, 'Number of Stabilization Axes': NUMBER,
+        'Device Compatibility': CATEGORY, 'Time-lapse': FLAG, 'Follow Mode': FLAG, 'App Connectivity': FLAG,
+        'Folded Size (mm)': TEXT, 'Release Year': NUMBER,
+        'Stability': SCORE, 'Travel': SCORE, 'Vlogging': SCORE, 'Professional': SCORE, 'Easy Of Use': SCORE,
+    },
+    'action_cameras': {
+        'Weight (gram)': NUMBER, 'Video Recording Capabilities': CATEGORY, 'Time-lapse': FLAG,
+        'Slow Motion': FLAG, 'Dimensions (mm)': TEXT, 'Battery Life (minutes)': NUMBER,
+        # Frontend hiển thị nguyên giá trị Touchscreen nên giữ "Yes"/"No"
+        'Touchscreen': CATEGORY, 'Dual Screen': FLAG, 'Wifi': FLAG, 'Bluetooth': FLAG, 'USB-C': FLAG,
+        'Shock Resistance': FLAG, 'Water Resistance': FLAG, 'Release Year': NUMBER,
+        'Stability': SCORE, 'Travel': SCORE, 'Sports': SCORE, 'Vlogging': SCORE,
+        'Durability': SCORE, 'Easy Of Use': SCORE, 'Low-light Performance': SCORE,
+    },
+}
+
+# Cột mới -> cột nguồn. Tiêu cự ống zoom là khoảng ("16-55"): Focal Length (mm) vẫn là số
+# (ống zoom là 0, như response trước đây), khoảng đầy đủ nằm ở Focal Range (mm)
+TEXT_COPIES: Dict[str, Dict[str, str]] = {
+    'lenses': {'Focal Range (mm)': 'Focal Length (mm)'},
+}
+
+
+def category_schema(category: str) -> Dict[str, str]:
+    return {**INVENTORY_SCHEMA, **CATALOG_SCHEMA.get(category, {})}
+
+
+def _flag(values: pd.Series) -> Tuple[pd.Series, int]:
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        numeric = pd.to_numeric(values, errors='coerce')
+        invalid = int((numeric.notna() & ~numeric.isin([0, 1])).sum())
+        return (numeric == 1).astype(np.uint8), invalid
+    mapped = values.astype(str).str.strip().str.capitalize().map({'Yes': 1, 'No': 0})
+    invalid = int((mapped.isna() & values.notna()).sum())
+    return mapped.fillna(0).astype(np.uint8), invalid
+
+
+def _number(values: pd.Series) -> Tuple[pd.Series, int]:
+    numeric = pd.to_numeric(values, errors='coerce')
+    invalid = int((numeric.isna() & values.notna()).sum())
+    numeric = numeric.fillna(0)
+    arr = numeric.to_numpy(dtype=np.float64)
+    if len(arr) and np.all(arr == np.round(arr)) and np.abs(arr).max() < 2 ** 31:
+        return numeric.astype(np.int32), invalid
+    return numeric.astype(np.float64), invalid
+
+
+def _score(values: pd.Series) -> Tuple[pd.Series, int]:
+    numeric = pd.to_numeric(values, errors='coerce')
+    invalid = int(((numeric < 0) | (numeric > 1) | (numeric.isna() & values.notna())).sum())
+    return numeric.fillna(0).clip(0, 1).astype(np.float32), invalid
+
+
+def _category(values: pd.Series) -> Tuple[pd.Series, int]:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values, 0
+    return values.astype('category'), 0
+
+
+CONVERTERS = {FLAG: _flag, NUMBER: _number, SCORE: _score, CATEGORY: _category}
+
+
+def apply_schema(df: pd.DataFrame, category: str) -> pd.DataFrame:
+    """Chuyển các cột của category sang kiểu đã khai báo; giá trị không hợp lệ được ghi log."""
+    columns = {}
+    for column, source in TEXT_COPIES.get(category, {}).items():
+        # Chỉ lấy từ cột nguồn còn nguyên (lần áp schema đầu tiên); frame đã áp schema giữ cột sẵn có
+        if source in df.columns and column not in df.columns:
+            values = df[source]
+            columns[column] = values.astype(str).str.strip().where(values.notna(), None).astype(object)
+    for column, kind in category_schema(category).items():
+        if column not in df.columns or kind not in CONVERTERS:
+            continue
+        converted, invalid = CONVERTERS[kind](df[column])
+        if invalid:
+            logger.warning("Catalog %s: %d invalid %s value(s) in column %r", category, invalid, kind, column)
+        columns[column] = converted
+    return df.assign(**columns) if columns else df
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Nối các frame đã áp schema; cột categorical được hợp bảng giá trị để không rơi về object."""
+    frames = [f for f in frames if len(f.columns)]
+    for column in frames[0].columns:
+        if not isinstance(frames[0][column].dtype, pd.CategoricalDtype):
+            continue
+        categories = pd.Index([])
+        for f in frames:
+            if isinstance(f[column].dtype, pd.CategoricalDtype):
+                categories = categories.union(f[column].cat.categories, sort=False)
+        frames = [f.assign(**{column: f[column].astype(pd.CategoricalDtype(categories))}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def json_values(values: pd.Series) -> List[Any]:
+    """Giá trị Python thuần của một cột để trả về JSON; NaN thành None.
+
+    float32 được đổi qua biểu diễn ngắn nhất của nó để 0.86 vẫn là 0.86
+    (không phải 0.8600000143051147).
+    """
+    dtype = values.dtype
+    if dtype == np.float32:
+        return [None if text == 'nan' else float(text) for text in values.to_numpy().astype(str)]
+    if pd.api.types.is_float_dtype(dtype):
+        return [None if math.isnan(v) else v for v in values.to_numpy().tolist()]
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return values.to_numpy().tolist()
+    return [None if v is None or (isinstance(v, float) and math.isnan(v)) else v for v in values.astype(object).tolist()]
+
+
+def _untyped_bytes(values: pd.Series) -> int:
+    """Dung lượng ước tính nếu cột để kiểu mặc định (int64/float64, chuỗi object)."""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return int(values.astype(object).memory_usage(index=False, deep=True))
+    if pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+        return 8 * len(values)
+    return int(values.memory_usage(index=False, deep=True))
+
+
+def memory_report(df: pd.DataFrame) -> Dict[str, Any]:
+    """Dung lượng của từng cột theo kiểu hiện tại so với kiểu mặc định của pandas."""
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        columns[column] = {
+            'dtype': str(values.dtype),
+            'bytes': int(values.memory_usage(index=False, deep=True)),
+            'untyped_bytes': _untyped_bytes(values),
+        }
+    total = sum(c['bytes'] for c in columns.values())
+    untyped = sum(c['untyped_bytes'] for c in columns.values())
+    return {
+        'rows': len(df),
+        'bytes': total,
+        'untyped_bytes': untyped,
+        'ratio': round(total / untyped, 3) if untyped else None,
+        'columns': columns,
+    }
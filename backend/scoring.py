@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+# float32 làm tròn khác float64 một chút; nới ngưỡng để 0.5 tính bằng float32 vẫn đạt
+SCORE_EPSILON = 1e-6
+
+Purposes = Union[List[str], Dict[str, float]]
+
+
+class PurposeMatrix:
+    """Điểm theo mục đích sử dụng của một category dưới dạng ma trận float32 liên tục.
+
+    Mỗi hàng của ma trận là một purpose trong PURPOSES_PER_CATEGORY có mặt
+    trong dữ liệu, mỗi cột là một sản phẩm (cùng thứ tự với DataFrame của
+    snapshot). Điểm là tổng có trọng số các hàng, cộng dồn theo đúng thứ tự
+    purpose cho cả một request lẫn một batch, nên hai đường cho ra cùng giá
+    trị float32 và cùng thứ tự khi hòa điểm.
+    """
+
+    def __init__(self, df: pd.DataFrame, valid_purposes: List[str]):
+        columns_by_lower = {str(c).lower(): c for c in df.columns}
+        self.purposes: List[str] = []
+        columns = []
+        for purpose in valid_purposes:
+            column = columns_by_lower.get(purpose.lower())
+            if column is not None and pd.api.types.is_numeric_dtype(df[column]):
+                self.purposes.append(purpose)
+                columns.append(column)
+        self.position = {p.lower(): i for i, p in enumerate(self.purposes)}
+        if columns:
+            values = df[columns].to_numpy(dtype=np.float32, na_value=0)
+        else:
+            values = np.zeros((len(df), 0), dtype=np.float32)
+        self.matrix = np.ascontiguousarray(values.T)
+        self.n = len(df)
+
+    def weights(self, selected: Optional[Purposes]) -> Optional[np.ndarray]:
+        """Vector trọng số chuẩn hóa (tổng = 1); danh sách purposes là trọng số bằng nhau."""
+        if not selected:
+            return None
+        items = selected.items() if isinstance(selected, dict) else ((p, 1.0) for p in selected)
+        w = np.zeros(len(self.purposes), dtype=np.float32)
+        for purpose, weight in items:
+            i = self.position.get(str(purpose).strip().lower())
+            if i is not None and weight and float(weight) > 0:
+                w[i] = float(weight)
+        total = w.sum()
+        return w / total if total > 0 else None
+
+    def scores(self, weights: Optional[np.ndarray], positions: Optional[np.ndarray] = None) -> np.ndarray:
+        n = self.n if positions is None else len(positions)
+        result = np.zeros(n, dtype=np.float32)
+        if weights is None:
+            return result
+        for j in np.flatnonzero(weights):
+            row = self.matrix[j] if positions is None else self.matrix[j, positions]
+            result += weights[j] * row
+        return result
+
+    def score_matrix(self, selected_list: List[Optional[Purposes]]) -> np.ndarray:
+        """Điểm của nhiều bộ purposes một lượt: N x sản phẩm, N là số bộ purposes."""
+        w = np.zeros((len(selected_list), len(self.purposes)), dtype=np.float32)
+        for i, selected in enumerate(selected_list):
+            weights = self.weights(selected)
+            if weights is not None:
+                w[i] = weights
+        result = np.zeros((len(selected_list), self.n), dtype=np.float32)
+        for j in range(len(self.purposes)):
+            # Trọng số 0 cộng thêm đúng 0.0, không làm đổi giá trị so với scores()
+            result += w[:, j:j + 1] * self.matrix[j]
+        return result
+
+
+def purpose_names(selected: Optional[Purposes]) -> List[str]:
+    if not selected:
+        return []
+    if isinstance(selected, dict):
+        return [p for p, w in selected.items() if w and float(w) > 0]
+    return list(selected)
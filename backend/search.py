@@ -0,0 +1,114 @@
+"""Tìm model theo tên gần đúng (viết liền, thiếu chữ, sai chính tả) trên mọi category.
+
+Tên được chuẩn hóa thành chuỗi chỉ gồm chữ và số ("X-T5" -> "xt5") rồi tách
+thành trigram có đệm hai đầu ("$xt", "xt5", "t5$"). Chỉ mục đảo trigram -> các
+mục chứa nó được dựng một lần cho mỗi phiên bản catalog; một truy vấn chỉ là
+đếm số trigram chung trên các posting list của trigram trong truy vấn.
+
+Điểm khớp là tỉ lệ trigram của truy vấn có trong tên (truy vấn nằm trọn trong
+tên thì đạt 1); hòa điểm thì tên gần độ dài truy vấn hơn (hệ số Dice cao hơn) trước.
+Ứng viên chỉ lấy từ các posting list ngắn nhất đủ để không sót mục đạt
+SEARCH_MIN_SCORE (prefix filtering), nên trigram phổ biến không làm chậm truy vấn.
+
+Mỗi mục là một model có dòng thông số của một category, kể cả model chưa có
+trong inventory (in_stock = False, không có giá). Cùng chỉ mục dùng để đối
+chiếu các tên trong inventory không trùng dòng thông số nào: merge inner bỏ
+qua các dòng này, báo cáo kèm model gần nhất làm gợi ý sửa tên.
+"""
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SEARCH_MIN_SCORE = float(os.environ.get("SEARCH_MIN_SCORE", 0.5))
+PAD = '$'
+
+
+def compact(name: str) -> str:
+    return ''.join(ch for ch in str(name).lower() if ch.isalnum())
+
+
+def trigrams(name: str) -> List[str]:
+    """Các trigram (không trùng) của tên đã chuẩn hóa, có đệm hai đầu."""
+    text = f"{PAD}{compact(name)}{PAD}"
+    return list(dict.fromkeys(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+class SearchIndex:
+    def __init__(self, frames: Dict[str, pd.DataFrame], specs: Optional[Dict[str, pd.DataFrame]] = None):
+        """frames: catalog đã merge (model còn hàng, có giá); specs: thông số trước merge, None thì chỉ có model còn hàng."""
+        categories, models, prices, in_stock = [], [], [], []
+        for category, frame in frames.items():
+            priced = dict(zip(frame['Model'].astype(str), pd.to_numeric(frame['Price'], errors='coerce'))) if 'Price' in frame.columns \
+                else dict.fromkeys(frame['Model'].astype(str), np.nan)
+            names = specs[category]['Model'] if specs is not None and category in specs else frame['Model']
+            for model in dict.fromkeys(names.dropna().astype(str)):
+                categories.append(category)
+                models.append(model)
+                prices.append(priced.get(model, np.nan))
+                in_stock.append(model in priced)
+        self.categories = np.array(categories, dtype=object)
+        self.models = np.array(models, dtype=object)
+        self.prices = np.array(prices, dtype=np.float64)
+        self.in_stock = np.array(in_stock, dtype=bool)
+        self.n = len(models)
+
+        postings: Dict[str, List[int]] = {}
+        self.sizes = np.zeros(self.n, dtype=np.int32)
+        for i, model in enumerate(models):
+            grams = trigrams(model)
+            self.sizes[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def match(self, query: str, limit: int, min_score: float = SEARCH_MIN_SCORE,
+              category: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Tối đa limit mục (vị trí, điểm) khớp truy vấn, điểm giảm dần."""
+        grams = trigrams(query)
+        # Posting list ngắn (trigram hiếm) trước: mục đạt ngưỡng chứa ít nhất need trigram nên phải nằm
+        # trong một trong len(lists) - need + 1 list đầu; các list còn lại chỉ dùng để đếm (tìm nhị phân)
+        lists = sorted((self.postings[gram] for gram in grams if gram in self.postings), key=len)
+        need = max(1, math.ceil(min_score * len(grams) - 1e-9))
+        if len(lists) < need:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+        candidates = np.unique(np.concatenate(lists[:len(lists) - need + 1]))
+        if category is not None:
+            candidates = candidates[self.categories[candidates] == category]
+        shared = np.zeros(len(candidates), dtype=np.int32)
+        for postings in lists:
+            found = np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)
+            shared += postings[found] == candidates
+        keep = shared >= need
+        candidates, shared = candidates[keep], shared[keep]
+        scores = shared / len(grams)
+        dice = 2 * shared / (len(grams) + self.sizes[candidates])
+        order = np.lexsort((self.models[candidates], -dice, -scores))[:limit]
+        return candidates[order], scores[order]
+
+    def results(self, positions: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        return [{
+            'category': self.categories[i],
+            'model': self.models[i],
+            'price': None if np.isnan(self.prices[i]) else float(self.prices[i]),
+            'in_stock': bool(self.in_stock[i]),
+            'score': round(float(score), 3),
+        } for i, score in zip(positions, scores)]
+
+    def mismatches(self, inventory_models: Iterable[str], min_score: float = SEARCH_MIN_SCORE) -> Dict[str, Any]:
+        """Tên trong inventory không trùng model có thông số nào (kèm gợi ý gần nhất) và số model có thông số nhưng chưa có trong inventory."""
+        known = set(self.models.tolist())
+        unmatched = []
+        for model in dict.fromkeys(inventory_models):
+            if model in known:
+                continue
+            positions, scores = self.match(model, 1, min_score)
+            suggestion = self.results(positions, scores)
+            unmatched.append({'inventory_model': model, 'suggestion': suggestion[0] if suggestion else None})
+        missing = pd.Series(self.categories[~self.in_stock]).value_counts() if self.n else pd.Series(dtype=int)
+        return {
+            'inventory_unmatched': unmatched,
+            'specs_without_inventory': {category: int(count) for category, count in missing.items()},
+        }
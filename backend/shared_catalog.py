@@ -0,0 +1,172 @@
+"""Catalog dùng chung cho nhiều worker qua một thư mục chung (vd. /dev/shm).
+
+Một tiến trình loader (catalog_loader.py) tải catalog và công bố mỗi phiên
+bản thành một file snapshot bất biến catalog-<version>.rcs, rồi đổi con trỏ
+CURRENT bằng os.replace (nguyên tử). Các worker ở chế độ attach chỉ theo dõi
+CURRENT và mmap file mới: cột số là view trên cùng các trang bộ nhớ của file
+nên thêm worker không nhân bản dữ liệu, và mỗi chu kỳ chỉ có một lần gọi
+nguồn dữ liệu.
+
+File cũ bị xóa sau khi có keep phiên bản mới hơn; worker đang mmap file đã
+xóa vẫn đọc được cho tới khi chuyển sang phiên bản mới.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from catalog import CatalogNotReady, CatalogSnapshot
+from snapshot_store import load_frames, save_frames
+
+logger = logging.getLogger(__name__)
+
+CURRENT = "CURRENT"
+
+
+def snapshot_filename(version: int) -> str:
+    return f"catalog-{version:08d}.rcs"
+
+
+def read_pointer(directory: str) -> Optional[Tuple[int, str]]:
+    """(version, đường dẫn file) của phiên bản đang được công bố, None nếu chưa có."""
+    try:
+        with open(os.path.join(directory, CURRENT), encoding="utf-8") as f:
+            pointer = json.load(f)
+    except FileNotFoundError:
+        return None
+    return int(pointer["version"]), os.path.join(directory, pointer["file"])
+
+
+def publish(directory: str, snapshot: CatalogSnapshot, keep: int = 3) -> str:
+    """Ghi snapshot thành file bất biến rồi trỏ CURRENT tới nó."""
+    os.makedirs(directory, exist_ok=True)
+    filename = snapshot_filename(snapshot.version)
+    path = os.path.join(directory, filename)
+    save_frames(path, snapshot.specs_dfs, {"version": snapshot.version, "loaded_at": snapshot.loaded_at, "category_versions": snapshot.category_versions})
+
+    tmp_pointer = os.path.join(directory, f".{CURRENT}.tmp{os.getpid()}")
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        json.dump({"version": snapshot.version, "file": filename, "published_at": time.time()}, f)
+    os.replace(tmp_pointer, os.path.join(directory, CURRENT))
+
+    # Giữ lại vài phiên bản gần nhất cho worker còn đang chuyển phiên bản
+    published = sorted(name for name in os.listdir(directory) if name.startswith("catalog-") and name.endswith(".rcs"))
+    for name in published[:-max(1, keep)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError as e:
+            logger.warning("Could not remove old catalog %s: %s", name, e)
+    return path
+
+
+class SharedCatalog:
+    """Đọc catalog do loader công bố; cùng giao diện với CatalogManager phía request.
+
+    Thread nền kiểm tra CURRENT mỗi poll_interval giây; khi phiên bản đổi thì
+    mmap file mới, chạy prepare (dựng chỉ mục riêng của worker) rồi thay
+    snapshot trong một phép gán.
+    """
+
+    def __init__(self, directory: str, poll_interval: float = 1.0, prepare: Optional[Callable[[CatalogSnapshot], None]] = None):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.prepare = prepare
+
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._path: Optional[str] = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+
+    @property
+    def snapshot(self) -> Optional[CatalogSnapshot]:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else 0
+
+    def refresh(self) -> bool:
+        """Chuyển sang phiên bản đang được công bố nếu khác phiên bản hiện tại."""
+        with self._refresh_lock:
+            try:
+                pointer = read_pointer(self.directory)
+                if pointer is None:
+                    self.last_error = f"No catalog published in {self.directory}"
+                    return False
+                version, path = pointer
+                if self._snapshot is not None and path == self._path and version == self._snapshot.version:
+                    return False
+                specs_dfs, meta = load_frames(path)
+                snapshot = CatalogSnapshot(version, specs_dfs, loaded_at=meta.get("loaded_at"), origin="shared",
+                                           category_versions=meta.get("category_versions"))
+                if self.prepare:
+                    self.prepare(snapshot)
+            except Exception as e:
+                # File cũ có thể vừa bị loader xóa; lần kiểm tra sau sẽ đọc CURRENT mới
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning("Could not attach shared catalog: %s", self.last_error)
+                return False
+
+            self._snapshot = snapshot
+            self._path = path
+            self.last_error = None
+            self.last_success_at = time.time()
+            self._ready.set()
+            logger.info("Attached shared catalog version %d (%s)", version, path)
+            return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            if self._stop.wait(self.poll_interval):
+                break
+
+    def start(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self.refresh()
+            self._thread = threading.Thread(target=self._run, name="catalog-attach", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def current(self, timeout: Optional[float] = None) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+        self.start()
+        self._ready.wait(timeout)
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise CatalogNotReady(self.last_error or "Waiting for the catalog loader")
+        return snapshot
+
+    def status(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "version": self.version,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "origin": snapshot.origin if snapshot else None,
+            "categories": {c: len(df) for c, df in snapshot.specs_dfs.items()} if snapshot else {},
+            "category_versions": snapshot.category_versions if snapshot else {},
+            "shared_dir": self.directory,
+            "path": self._path,
+            "poll_interval": self.poll_interval,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+        }
@@ -0,0 +1,158 @@
+"""Chỉ mục "sản phẩm tương tự" trên vector thông số đã chuẩn hóa, dựng cho mỗi phiên bản catalog.
+
+Mỗi sản phẩm là một vector float32 lấy từ schema của category:
+    number / flag / score -- chuẩn hóa z-score (độ lệch chuẩn 0 thì bỏ qua chiều đó)
+    category              -- one-hot, nhân 1/sqrt(2) để khác giá trị chỉ tính như lệch một đơn vị
+Cột của Inventory (giá, màu, tình trạng...) và cột text không tham gia, nên
+chỉ mục không đổi khi chỉ inventory thay đổi.
+
+Độ tương tự giữa hai sản phẩm là cosine. Catalog nhỏ (tới SIMILAR_PRECOMPUTE_MAX
+sản phẩm) được tính sẵn danh sách k láng giềng gần nhất lúc dựng; catalog lớn
+hơn tìm bằng một phép nhân ma trận-vector khi được hỏi, và nhớ kết quả theo model.
+"""
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from filters import _norm, active_criteria
+from schema import CATALOG_SCHEMA, CATEGORY, FLAG, NUMBER, SCORE
+
+SIMILAR_NEIGHBOURS = int(os.environ.get("SIMILAR_NEIGHBOURS", 20))
+SIMILAR_PRECOMPUTE_MAX = int(os.environ.get("SIMILAR_PRECOMPUTE_MAX", 5000))
+# Cột phân loại có nhiều giá trị hơn thế này gần như là định danh, không dùng làm one-hot
+MAX_ONE_HOT = 64
+ONE_HOT_SCALE = 1 / math.sqrt(2)
+
+
+def _top_k(similarities: np.ndarray, k: int, exclude: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """k vị trí có độ tương tự cao nhất (giảm dần, hòa thì vị trí nhỏ trước), bỏ các vị trí exclude."""
+    similarities = similarities.copy()
+    similarities[exclude] = -np.inf
+    k = min(k, int(np.count_nonzero(np.isfinite(similarities))))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    candidates = np.argpartition(-similarities, k - 1)[:k] if k < len(similarities) else np.arange(len(similarities))
+    order = np.lexsort((candidates, -similarities[candidates]))
+    top = candidates[order]
+    return top, similarities[top]
+
+
+class SimilarityIndex:
+    def __init__(self, df: pd.DataFrame, category: str, neighbours: int = SIMILAR_NEIGHBOURS,
+                 precompute_max: int = SIMILAR_PRECOMPUTE_MAX):
+        self.category = category
+        self.n = len(df)
+        self.neighbours = neighbours
+        # cột -> (loại, chiều bắt đầu, trung bình, độ lệch chuẩn hoặc danh sách giá trị one-hot)
+        self.columns: Dict[str, Tuple[str, int, float, Any]] = {}
+        blocks = []
+        dims = 0
+        for column, kind in CATALOG_SCHEMA.get(category, {}).items():
+            if column not in df.columns:
+                continue
+            if kind in (NUMBER, FLAG, SCORE):
+                values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+                mean = float(np.nanmean(values)) if self.n and not np.isnan(values).all() else 0.0
+                std = float(np.nanstd(values)) if self.n else 0.0
+                if not std:
+                    continue
+                blocks.append(((np.nan_to_num(values, nan=mean) - mean) / std)[:, None])
+                self.columns[column] = (kind, dims, mean, std)
+                dims += 1
+            elif kind == CATEGORY:
+                codes, uniques = pd.factorize(df[column].map(_norm, na_action='ignore'))
+                if len(uniques) < 2 or len(uniques) > MAX_ONE_HOT:
+                    continue
+                one_hot = np.zeros((self.n, len(uniques)))
+                valid = codes >= 0
+                one_hot[np.flatnonzero(valid), codes[valid]] = ONE_HOT_SCALE
+                blocks.append(one_hot)
+                self.columns[column] = (kind, dims, 0.0, list(uniques))
+                dims += len(uniques)
+        self.vectors = np.hstack(blocks).astype(np.float32) if blocks else np.zeros((self.n, 0), dtype=np.float32)
+        norms = np.linalg.norm(self.vectors, axis=1)
+        self.unit = self.vectors / np.where(norms > 0, norms, 1)[:, None]
+
+        models = df['Model'].astype(str).to_numpy() if 'Model' in df.columns else np.array([str(i) for i in range(self.n)])
+        self.models = models
+        self.model_codes = pd.factorize(models)[0]
+        self.lookup = {_norm(column): column for column in self.columns}
+        self.positions: Dict[str, int] = {}
+        for position, model in enumerate(models):
+            self.positions.setdefault(_norm(model), position)
+
+        self._lock = threading.Lock()
+        self._memo: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        if self.n <= precompute_max:
+            self._precompute()
+
+    def _precompute(self, block: int = 1024):
+        for start in range(0, self.n, block):
+            similarities = self.unit[start:start + block] @ self.unit.T
+            for offset, row in enumerate(similarities):
+                position = start + offset
+                self._memo[position] = _top_k(row, self.neighbours, self._same_model(position))
+
+    def _same_model(self, position: int) -> np.ndarray:
+        return np.flatnonzero(self.model_codes == self.model_codes[position])
+
+    def position(self, model: str) -> Optional[int]:
+        return self.positions.get(_norm(model))
+
+    def similar(self, position: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(vị trí, cosine) của k sản phẩm gần position nhất, không gồm chính model đó."""
+        cached = self._memo.get(position)
+        if cached is None or (k > len(cached[0]) and len(cached[0]) == self.neighbours):
+            cached = _top_k(self.unit @ self.unit[position], max(k, self.neighbours), self._same_model(position))
+            with self._lock:
+                self._memo[position] = cached
+        return cached[0][:k], cached[1][:k]
+
+    def criteria_vector(self, criteria: Dict[str, Any], purposes: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Vector "lý tưởng" theo tiêu chí đã chọn và các chiều được chỉ định.
+
+        Khoảng (bucket) lấy điểm giữa (biên mở lấy chính biên), cờ/tính năng
+        lấy 1 hoặc 0, lựa chọn lấy one-hot của giá trị, purpose được chọn lấy
+        điểm 1. Các chiều không được chỉ định không tham gia khoảng cách.
+        """
+        target = np.zeros(self.vectors.shape[1], dtype=np.float32)
+        dims: List[int] = []
+
+        def set_value(column: str, value: float):
+            column = self.lookup.get(_norm(column), column)
+            if column in self.columns and self.columns[column][0] != CATEGORY:
+                _, dim, mean, std = self.columns[column]
+                target[dim] = (value - mean) / std
+                dims.append(dim)
+
+        for spec, value in active_criteria(self.category, criteria):
+            column = spec['column']
+            kind = spec['type']
+            if kind == 'flag':
+                set_value(column, 1.0 if _norm(value) == 'yes' else 0.0)
+            elif kind == 'feature':
+                set_value(column, 1.0)
+            elif kind == 'range':
+                low, high = next(b for label, b in spec['buckets'].items() if _norm(label) == _norm(value))
+                set_value(column, (low + high) / 2 if low is not None and high is not None else (low if high is None else high))
+            elif kind == 'choice' and column in self.columns and self.columns[column][0] == CATEGORY:
+                _, dim, _, uniques = self.columns[column]
+                if _norm(value) in uniques:
+                    target[dim + uniques.index(_norm(value))] = ONE_HOT_SCALE
+                dims.extend(range(dim, dim + len(uniques)))
+        for purpose in purposes:
+            set_value(purpose, 1.0)
+        return target, np.array(sorted(set(dims)), dtype=np.intp)
+
+    def nearest_to_criteria(self, criteria: Dict[str, Any], purposes: List[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(vị trí, khoảng cách) của k sản phẩm gần vector tiêu chí nhất (khoảng cách Euclid trên các chiều được chỉ định)."""
+        target, dims = self.criteria_vector(criteria, purposes)
+        if len(dims) == 0 or self.n == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        distances = np.sqrt(((self.vectors[:, dims] - target[dims]) ** 2).sum(axis=1))
+        top, negated = _top_k(-distances, k, np.empty(0, dtype=np.intp))
+        return top, -negated
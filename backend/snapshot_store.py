@@ -0,0 +1,116 @@
+"""Lưu/đọc các DataFrame của catalog ở dạng cột nhị phân, đọc bằng mmap.
+
+Bố cục file:
+    MAGIC (8 byte) | độ dài header (uint64 little-endian) | header JSON | dữ liệu các cột
+
+Mỗi cột số/bool được ghi nguyên buffer NumPy (căn lề 64 byte) và khi đọc chỉ
+là một view np.frombuffer trên vùng mmap, không copy và không parse lại. Cột
+chuỗi được ghi thành mã int32 + danh sách giá trị trong header (-1 là NaN).
+"""
+import json
+import mmap
+import os
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"RCSNAP01"
+ALIGN = 64
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _json_default(o):
+    if hasattr(o, "item"):
+        return o.item()
+    return str(o)
+
+
+def _encode_column(series: pd.Series) -> Tuple[Dict[str, Any], np.ndarray]:
+    dtype = series.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        spec = {
+            "kind": "category",
+            "categories": dtype.categories.tolist(),
+            "ordered": bool(dtype.ordered),
+        }
+        return spec, series.cat.codes.to_numpy().astype(np.int32)
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+        arr = np.ascontiguousarray(series.to_numpy())
+        return {"kind": "numeric"}, arr
+    # Cột object: lưu mã + bảng giá trị
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    return {"kind": "object", "categories": list(uniques)}, codes.astype(np.int32)
+
+
+def save_frames(path: str, frames: Dict[str, pd.DataFrame], meta: Dict[str, Any]) -> None:
+    """Ghi các DataFrame ra file; ghi vào file tạm rồi os.replace để tránh file dở dang."""
+    tables = {}
+    buffers = []
+    offset = 0
+    for name, df in frames.items():
+        columns = []
+        for col in df.columns:
+            spec, arr = _encode_column(df[col])
+            spec.update({"name": col, "dtype": arr.dtype.str, "count": int(arr.shape[0]), "offset": offset})
+            columns.append(spec)
+            buffers.append((offset, arr))
+            offset = _align(offset + arr.nbytes)
+        tables[name] = {"rows": int(len(df)), "columns": columns}
+
+    header = json.dumps({"meta": meta, "tables": tables}, default=_json_default, ensure_ascii=False).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for buf_offset, arr in buffers:
+            f.seek(data_start + buf_offset)
+            f.write(arr.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def _decode_column(buf, data_start: int, spec: Dict[str, Any]):
+    arr = np.frombuffer(buf, dtype=np.dtype(spec["dtype"]), count=spec["count"], offset=data_start + spec["offset"])
+    kind = spec["kind"]
+    if kind == "numeric":
+        return arr
+    if kind == "category":
+        return pd.Categorical.from_codes(arr, categories=spec["categories"], ordered=spec["ordered"])
+    values = np.empty(len(spec["categories"]) + 1, dtype=object)
+    values[:-1] = spec["categories"]
+    values[-1] = np.nan
+    return values[arr]
+
+
+def read_header(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        size = int.from_bytes(f.read(8), "little")
+        return json.loads(f.read(size))
+
+
+def load_frames(path: str) -> Tuple[Dict[str, pd.DataFrame], Dict[str, Any]]:
+    """Đọc file snapshot bằng mmap; cột số trỏ thẳng vào vùng nhớ của file."""
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buf[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a catalog snapshot")
+    size = int.from_bytes(buf[len(MAGIC):len(MAGIC) + 8], "little")
+    header = json.loads(buf[len(MAGIC) + 8:len(MAGIC) + 8 + size])
+    data_start = _align(len(MAGIC) + 8 + size)
+
+    frames = {}
+    for name, table in header["tables"].items():
+        data = {spec["name"]: _decode_column(buf, data_start, spec) for spec in table["columns"]}
+        frames[name] = pd.DataFrame(data, index=pd.RangeIndex(table["rows"]), copy=False)
+    return frames, header["meta"]
@@ -0,0 +1,150 @@
+import csv
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+DEFAULT_SHEET_URL = "https://docs.google.com/spreadsheets/d/1zDG2XgHJPbtanTS-KDB2gOsCUGBtFk92JJe5EuuN8BI/edit?gid=0#gid=0"
+# DEFAULT_KEYFILE = "C:\\Users\\Admin\\Downloads\\inventoryreader-454903-25f852b85ccf.json"
+DEFAULT_KEYFILE = "D:\\KLTN\\inventoryreader-454903-25f852b85ccf.json"
+
+
+class InventorySource:
+    """Nguồn dữ liệu inventory: trả về các dòng Model/Price/Colour/Condition/Series/Free Gift."""
+
+    name = "base"
+
+    def fetch_records(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def describe(self) -> str:
+        return self.name
+
+
+class GoogleSheetSource(InventorySource):
+    name = "gsheet"
+    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+    def __init__(self, keyfile: str = DEFAULT_KEYFILE, sheet_url: str = DEFAULT_SHEET_URL, worksheet: str = "Sheet1"):
+        self.keyfile = keyfile
+        self.sheet_url = sheet_url
+        self.worksheet = worksheet
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            # Import khi thật sự dùng Google Sheets: gspread/oauth2client chiếm phần lớn thời gian import
+            import gspread
+            from oauth2client.service_account import ServiceAccountCredentials
+
+            creds = ServiceAccountCredentials.from_json_keyfile_name(self.keyfile, self.scope)
+            self._client = gspread.authorize(creds)
+        return self._client
+
+    def fetch_records(self) -> List[Dict[str, Any]]:
+        sheet = self._get_client().open_by_url(self.sheet_url)
+        return sheet.worksheet(self.worksheet).get_all_records()
+
+    def describe(self) -> str:
+        return f"gsheet:{self.worksheet}"
+
+
+class FileSource(InventorySource):
+    """File CSV hoặc JSON (danh sách object, hoặc {"records": [...]}) xuất từ sheet."""
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch_records(self) -> List[Dict[str, Any]]:
+        if self.path.lower().endswith(".csv"):
+            with open(self.path, newline="", encoding="utf-8-sig") as f:
+                return list(csv.DictReader(f))
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("records", [])
+        return data
+
+    def describe(self) -> str:
+        return f"file:{self.path}"
+
+
+class MemorySource(InventorySource):
+    """Dữ liệu cố định trong bộ nhớ (test, benchmark)."""
+
+    name = "memory"
+
+    def __init__(self, records: Optional[List[Dict[str, Any]]] = None):
+        self.records = list(records or [])
+
+    def fetch_records(self) -> List[Dict[str, Any]]:
+        return [dict(r) for r in self.records]
+
+
+def _env_file() -> Optional[str]:
+    return os.environ.get("INVENTORY_FILE") or os.environ.get("INVENTORY_FIXTURE")
+
+
+def _env_kind() -> str:
+    """INVENTORY_SOURCE; không đặt thì là file nếu có INVENTORY_FILE/INVENTORY_FIXTURE, ngược lại gsheet."""
+    return os.environ.get("INVENTORY_SOURCE", "file" if _env_file() else "gsheet").lower()
+
+
+def source_from_env() -> InventorySource:
+    """Chọn nguồn inventory theo biến môi trường.
+
+    INVENTORY_SOURCE = gsheet (mặc định) | file | memory
+    INVENTORY_FILE / INVENTORY_FIXTURE: đường dẫn file cho nguồn file
+    GOOGLE_SERVICE_ACCOUNT_FILE, INVENTORY_SHEET_URL, INVENTORY_WORKSHEET: cấu hình Google Sheets
+    """
+    path = _env_file()
+    kind = _env_kind()
+    if kind == "file":
+        if not path:
+            raise ValueError("INVENTORY_FILE is required for the file inventory source")
+        return FileSource(path)
+    if kind == "memory":
+        return MemorySource()
+    if kind == "gsheet":
+        return GoogleSheetSource(
+            keyfile=os.environ.get("GOOGLE_SERVICE_ACCOUNT_FILE", DEFAULT_KEYFILE),
+            sheet_url=os.environ.get("INVENTORY_SHEET_URL", DEFAULT_SHEET_URL),
+            worksheet=os.environ.get("INVENTORY_WORKSHEET", "Sheet1"),
+        )
+    raise ValueError(f"Unknown INVENTORY_SOURCE: {kind}")
+
+
+def stores_from_env() -> Dict[str, InventorySource]:
+    """Nguồn inventory của từng cửa hàng (mỗi store một shard catalog) theo INVENTORY_STORES.
+
+    INVENTORY_STORES = "hcm=Sheet1,hanoi=Hanoi": store=worksheet trong INVENTORY_SHEET_URL,
+    hoặc store=đường dẫn file khi nguồn là file (chọn như source_from_env). Trống: một catalog
+    duy nhất (source_from_env).
+    """
+    spec = os.environ.get("INVENTORY_STORES", "").strip()
+    if not spec:
+        return {}
+    kind = _env_kind()
+    stores: Dict[str, InventorySource] = {}
+    for item in spec.split(","):
+        store, _, location = item.partition("=")
+        store = store.strip().lower()
+        location = location.strip()
+        if not store or store in stores:
+            raise ValueError(f"Invalid or duplicate store in INVENTORY_STORES: {item!r}")
+        if kind == "file":
+            if not location:
+                raise ValueError(f"INVENTORY_STORES needs a file path for store {store!r}")
+            stores[store] = FileSource(location)
+        elif kind == "memory":
+            stores[store] = MemorySource()
+        elif kind == "gsheet":
+            stores[store] = GoogleSheetSource(
+                keyfile=os.environ.get("GOOGLE_SERVICE_ACCOUNT_FILE", DEFAULT_KEYFILE),
+                sheet_url=os.environ.get("INVENTORY_SHEET_URL", DEFAULT_SHEET_URL),
+                worksheet=location or "Sheet1",
+            )
+        else:
+            raise ValueError(f"Unknown INVENTORY_SOURCE: {kind}")
+    return stores
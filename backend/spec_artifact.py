@@ -0,0 +1,84 @@
+"""Bảng thông số tĩnh (SPECS_CSV) biên dịch sẵn thành file cột nhị phân.
+
+    python spec_artifact.py                 # ghi ra SPECS_ARTIFACT_PATH
+    python spec_artifact.py --output specs.rcs
+
+Khi build, mỗi CSV được parse một lần, chuẩn hóa Model và áp schema (cờ uint8,
+số, điểm float32, categorical) rồi ghi bằng snapshot_store. Lúc khởi động chỉ
+cần mmap file này thay vì parse lại năm chuỗi CSV. Header lưu fingerprint của
+CSV và schema; file cũ (CSV/schema đã đổi) hoặc hỏng bị bỏ qua và tiến trình
+quay về parse CSV như trước.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+from io import StringIO
+from typing import Dict, Optional
+
+import pandas as pd
+
+from inventory_delta import normalize_models
+from schema import CATALOG_SCHEMA, INVENTORY_SCHEMA, TEXT_COPIES, apply_schema
+from snapshot_store import load_frames, save_frames
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_FORMAT = 1
+
+
+def fingerprint(specs_csv: Dict[str, str]) -> str:
+    """Băm nội dung CSV và schema: đổi một trong hai thì file biên dịch không còn dùng được."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps([ARTIFACT_FORMAT, INVENTORY_SCHEMA, CATALOG_SCHEMA, TEXT_COPIES], sort_keys=True).encode("utf-8"))
+    for category in sorted(specs_csv):
+        digest.update(category.encode("utf-8"))
+        digest.update(specs_csv[category].encode("utf-8"))
+    return digest.hexdigest()
+
+
+def parse_spec_table(category: str, text: str) -> pd.DataFrame:
+    specs_df = pd.read_csv(StringIO(text))
+    specs_df['Model'] = normalize_models(specs_df['Model'])
+    return apply_schema(specs_df, category)
+
+
+def compile_specs(path: str, specs_csv: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+    frames = {category: parse_spec_table(category, text) for category, text in specs_csv.items()}
+    save_frames(path, frames, {"kind": "specs", "fingerprint": fingerprint(specs_csv)})
+    return frames
+
+
+def load_specs(path: Optional[str], specs_csv: Dict[str, str]) -> Optional[Dict[str, pd.DataFrame]]:
+    """Thông số đã biên dịch nếu file tồn tại và khớp specs_csv; ngược lại None."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        frames, meta = load_frames(path)
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring spec artifact %s: %s", path, e)
+        return None
+    if meta.get("kind") != "specs" or meta.get("fingerprint") != fingerprint(specs_csv) or set(frames) != set(specs_csv):
+        logger.warning("Spec artifact %s is stale; parsing SPECS_CSV (rebuild with python spec_artifact.py)", path)
+        return None
+    return frames
+
+
+def main() -> int:
+    from main import SPECS_ARTIFACT_PATH, SPECS_CSV
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=SPECS_ARTIFACT_PATH, help="file đầu ra (mặc định SPECS_ARTIFACT_PATH)")
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("--output or SPECS_ARTIFACT_PATH is required")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    frames = compile_specs(args.output, SPECS_CSV)
+    logger.info("Compiled %d spec tables (%d rows) to %s", len(frames), sum(len(df) for df in frames.values()), args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
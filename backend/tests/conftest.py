@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+# Module của backend được import theo tên trần (như khi chạy uvicorn trong backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# main đọc cấu hình khi import: không gọi Google Sheets, không ghi snapshot ra đĩa
+os.environ.setdefault("INVENTORY_SOURCE", "memory")
+os.environ.setdefault("INVENTORY_STORES", "")
+os.environ["CATALOG_SNAPSHOT_PATH"] = ""
+
+
+@pytest.fixture
+def inventory():
+    """Inventory dạng Google Sheet cho mọi model trong SPECS_CSV."""
+    from benchmarks.synthetic import base_specs, synthetic_inventory
+    return synthetic_inventory(base_specs(), seed=7)
+
+
+@pytest.fixture(scope="session")
+def snapshot():
+    """Catalog đầy đủ (đã dựng chỉ mục) từ SPECS_CSV và inventory tổng hợp, dùng chung cho các test chỉ đọc."""
+    import main
+    from benchmarks.synthetic import base_specs, synthetic_inventory
+    from catalog import CatalogManager
+    from sources import MemorySource
+    source = MemorySource(synthetic_inventory(base_specs(), seed=7))
+    manager = CatalogManager(lambda: main.load_catalog(source), prepare=main.prepare_snapshot)
+    assert manager.refresh()
+    return manager.snapshot
@@ -0,0 +1,60 @@
+import json
+import random
+
+import pytest
+
+from result_cache import ResultCache
+
+
+def single(snapshot, request):
+    """Kết quả của một request khi gọi riêng lẻ (đường /recommend một store)."""
+    import main
+    category = request.category
+    price_range = main.category_index(snapshot, category).price_range
+    criteria = main.canonical_criteria(request.criteria, main.PURPOSES_PER_CATEGORY[category], price_range)
+    return main.build_recommendations(snapshot, category, criteria, request.limit, request.offset, facets=request.facets,
+                                      min_results=request.min_results)
+
+
+def batch_requests(snapshot):
+    import main
+    from benchmarks.synthetic import criteria_mix
+    rng = random.Random(9)
+    requests = []
+    for category in ['cameras', 'lenses', 'drones', 'gimbals', 'action_cameras']:
+        for criteria in criteria_mix(category, snapshot[category], 8, seed=4):
+            requests.append(main.RecommendationRequest(category=category, criteria=criteria, limit=rng.choice([None, 3, 10]),
+                                                       offset=rng.choice([0, 0, 2]), facets=rng.random() < 0.3,
+                                                       min_results=rng.choice([None, None, 5])))
+    rng.shuffle(requests)
+    return requests
+
+
+@pytest.fixture
+def empty_cache(monkeypatch):
+    import main
+    monkeypatch.setattr(main, 'result_cache', ResultCache())
+
+
+def test_batch_equals_single_requests(snapshot, empty_cache):
+    import main
+    requests = batch_requests(snapshot)
+    results = main.batch_recommendations({main.STORES[0]: snapshot}, requests)['results']
+    assert len(results) == len(requests)
+    for request, result in zip(requests, results):
+        assert json.dumps(result, default=str) == json.dumps(single(snapshot, request), default=str), request
+
+
+def test_batch_errors_stay_per_request(snapshot, empty_cache):
+    import main
+    requests = [
+        main.RecommendationRequest(category='cameras', criteria={'purposes': ['Travel']}, limit=3),
+        main.RecommendationRequest(category='cameras', criteria={'purposes': ['Travel'], 'Weight': 'Huge'}),
+        main.RecommendationRequest(category='telescopes', criteria={}),
+        main.RecommendationRequest(category='cameras', criteria={'purposes': ['Travel']}, store='nowhere'),
+        main.RecommendationRequest(category='cameras', criteria={'purposes': ['Vlogging']}, limit=3),
+    ]
+    results = main.batch_recommendations({main.STORES[0]: snapshot}, requests)['results']
+    assert [result.get('status_code') for result in results] == [None, 400, 400, 400, None]
+    for i in (0, 4):
+        assert json.dumps(results[i], default=str) == json.dumps(single(snapshot, requests[i]), default=str)
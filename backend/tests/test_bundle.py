@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from bundle import search
+
+
+def brute_force(index, budget, k, camera_scores, camera_ok, lens_scores, lens_ok, gimbal_scores=None, gimbal_ok=None):
+    """Duyệt mọi bộ máy ảnh + ống kính (+ gimbal) hợp lệ, điểm giảm dần rồi giá tăng dần."""
+    bundles = []
+    for camera in np.flatnonzero(camera_ok):
+        if index.camera_group[camera] < 0:
+            continue
+        for lens in index.groups[index.camera_group[camera]]:
+            if not lens_ok[lens]:
+                continue
+            price = index.camera_prices[camera] + index.lens_prices[lens]
+            if gimbal_scores is None:
+                if price <= budget:
+                    bundles.append((float(camera_scores[camera] + lens_scores[lens]), float(price)))
+                continue
+            weight = index.camera_weights[camera] + index.lens_weights[lens]
+            for gimbal in index.gimbal_order:
+                if gimbal_ok[gimbal] and price + index.gimbal_prices[gimbal] <= budget and index.gimbal_payload[gimbal] >= weight:
+                    bundles.append((float(camera_scores[camera] + lens_scores[lens] + gimbal_scores[gimbal]),
+                                    float(price + index.gimbal_prices[gimbal])))
+    bundles.sort(key=lambda bundle: (-bundle[0], bundle[1]))
+    return bundles[:k]
+
+
+def rounded(bundles):
+    return [(round(score, 5), round(price, 5)) for score, price in bundles]
+
+
+@pytest.mark.parametrize('with_gimbal', [False, True])
+def test_search_matches_brute_force(snapshot, with_gimbal):
+    import main
+    index = main.bundle_index(snapshot)
+    rng = np.random.default_rng(3)
+    cameras, lenses, gimbals = len(snapshot['cameras']), len(snapshot['lenses']), len(snapshot['gimbals'])
+    for trial in range(40):
+        camera_scores, lens_scores, gimbal_scores = rng.random(cameras), rng.random(lenses), rng.random(gimbals)
+        if trial % 3 == 0:
+            # Nhiều bộ hòa điểm: thứ tự phải theo giá tăng dần
+            camera_scores, lens_scores, gimbal_scores = (np.round(scores, 1) for scores in (camera_scores, lens_scores, gimbal_scores))
+        args = [camera_scores, rng.random(cameras) < 0.7, lens_scores, rng.random(lenses) < 0.7]
+        if with_gimbal:
+            args += [gimbal_scores, rng.random(gimbals) < 0.8]
+        budget = float(rng.choice([2e7, 4e7, 6e7, 9e7, 1.5e8, 3e8]))
+        k = int(rng.choice([1, 5, 10]))
+
+        found = search(index, budget, k, *args)
+        assert rounded((score, price) for score, price, *_ in found) == rounded(brute_force(index, budget, k, *args))
+        for _, price, camera, lens, gimbal in found:
+            assert price <= budget
+            assert lens in index.groups[index.camera_group[camera]]
+            if with_gimbal:
+                assert index.gimbal_payload[gimbal] >= index.camera_weights[camera] + index.lens_weights[lens]
+
+
+def test_search_without_usable_gimbal_is_empty(snapshot):
+    import main
+    index = main.bundle_index(snapshot)
+    cameras, lenses, gimbals = len(snapshot['cameras']), len(snapshot['lenses']), len(snapshot['gimbals'])
+    found = search(index, 3e8, 5, np.ones(cameras), np.ones(cameras, dtype=bool), np.ones(lenses), np.ones(lenses, dtype=bool),
+                   np.ones(gimbals), np.zeros(gimbals, dtype=bool))
+    assert found == []
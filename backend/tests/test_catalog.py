@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+
+from catalog import CatalogManager, CatalogNotReady
+from sources import MemorySource
+
+
+class FlakySource(MemorySource):
+    """MemorySource có thể bật lỗi để mô phỏng Google Sheets không phản hồi."""
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.failing = False
+        self.calls = 0
+
+    def fetch_records(self):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("sheet unavailable")
+        return super().fetch_records()
+
+
+@pytest.fixture
+def source(inventory):
+    return FlakySource(inventory)
+
+
+def manager(source, **kwargs):
+    import main
+    kwargs.setdefault('max_retries', 2)
+    return CatalogManager(lambda: main.load_catalog(source), backoff_base=0, backoff_max=0, **kwargs)
+
+
+def test_refresh_publishes_new_versions(source):
+    catalog = manager(source)
+    assert catalog.snapshot is None
+    assert catalog.refresh()
+    first = catalog.current()
+    assert first.version == 1 and set(first.specs_dfs) == {'cameras', 'lenses', 'drones', 'gimbals', 'action_cameras'}
+
+    source.records[0] = {**source.records[0], 'Price': '$1,000,000'}
+    assert catalog.refresh()
+    assert catalog.current().version == 2 and catalog.current() is not first
+    # Snapshot cũ không bị sửa: request đang chạy vẫn thấy một phiên bản nhất quán
+    assert first.version == 1
+    assert catalog.status()['version'] == 2 and catalog.status()['breaker'] == 'closed'
+
+
+def test_failed_refresh_keeps_last_good_snapshot(source):
+    catalog = manager(source)
+    assert catalog.refresh()
+    good = catalog.snapshot
+    source.failing = True
+    assert not catalog.refresh()
+    assert catalog.current() is good
+    status = catalog.status()
+    assert status['consecutive_failures'] == 1 and 'sheet unavailable' in status['last_error']
+
+
+def test_breaker_opens_then_probes_once(source):
+    catalog = manager(source, breaker_threshold=2, breaker_cooldown=3600)
+    source.failing = True
+    assert not catalog.refresh() and not catalog.refresh()
+    assert catalog.breaker_state == 'open'
+    calls = source.calls
+    # Breaker mở: không gọi nguồn dữ liệu
+    assert not catalog.refresh()
+    assert source.calls == calls
+
+    # Hết thời gian chờ: half-open chỉ thử một lần, lỗi thì mở lại
+    catalog.breaker_open_until = 0
+    assert catalog.breaker_state == 'half-open'
+    assert not catalog.refresh()
+    assert source.calls == calls + 1 and catalog.breaker_state == 'open'
+
+    catalog.breaker_open_until = 0
+    source.failing = False
+    assert catalog.refresh()
+    assert catalog.breaker_state == 'closed' and catalog.consecutive_failures == 0
+
+
+def test_current_raises_when_never_loaded(source):
+    source.failing = True
+    catalog = manager(source, refresh_interval=3600)
+    try:
+        with pytest.raises(CatalogNotReady, match='sheet unavailable'):
+            catalog.current(timeout=0.5)
+    finally:
+        catalog.stop(timeout=1)
+
+
+def test_unchanged_inventory_keeps_version(source):
+    import main
+    catalog = manager(source)
+    catalog.update = lambda previous: main.update_catalog(previous, source)
+    assert catalog.refresh()
+    snapshot = catalog.snapshot
+    assert not catalog.refresh()
+    assert catalog.snapshot is snapshot and catalog.last_update['mode'] == 'unchanged'
+
+
+def test_app_lifespan_starts_and_stops_background_threads(monkeypatch):
+    import main
+    calls = []
+    monkeypatch.setattr(main, 'start_catalog', lambda: calls.append('start'))
+    monkeypatch.setattr(main, 'stop_catalog', lambda: calls.append('stop'))
+
+    async def serve():
+        async with main.app.router.lifespan_context(main.app):
+            assert calls == ['start']
+
+    asyncio.run(serve())
+    assert calls == ['start', 'stop']
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+
+import pytest
+
+from concurrency import Overloaded, WorkerPool
+
+
+def test_rejects_beyond_workers_plus_queue():
+    pool = WorkerPool(workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(pool.run(gate.wait, 5))
+        second = asyncio.ensure_future(pool.run(gate.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(Overloaded):
+            await pool.run(gate.wait, 5)
+        gate.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(scenario())
+    assert pool.status()['in_flight'] == 0 and pool.status()['rejected'] == 1
+    pool.shutdown()
+
+
+def test_cancelled_caller_keeps_slot_until_thread_finishes():
+    pool = WorkerPool(workers=1, max_queue=0)
+    started, gate = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        gate.wait(5)
+
+    async def scenario():
+        task = asyncio.ensure_future(pool.run(work))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Luồng vẫn đang chạy: chỗ chưa được trả nên việc mới bị từ chối
+        assert pool.in_flight == 1
+        with pytest.raises(Overloaded):
+            await pool.run(work)
+        gate.set()
+        for _ in range(100):
+            if pool.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.in_flight == 0
+        assert await pool.run(lambda: 42) == 42
+
+    asyncio.run(scenario())
+    pool.shutdown()
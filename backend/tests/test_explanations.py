@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from explanations import NO_PURPOSE_TEXT, ExplanationEngine
+
+
+@pytest.fixture
+def cameras():
+    df = pd.DataFrame({
+        'Model': ['x-t5', 'x-a7'],
+        'Price': [40000000.0, 6000000.0],
+        'Weight (gram)': np.array([557, 320], dtype=np.int32),
+        'Resolution (MP)': [40.0, 24.0],
+        'ISO Max': np.array([12800, 6400], dtype=np.int32),
+        'Flipscreen': np.array([1, 1], dtype=np.uint8),
+        'Weathersealing': np.array([1, 0], dtype=np.uint8),
+        'Film Simulation': np.array([1, 1], dtype=np.uint8),
+        'External Mic Input': np.array([1, 0], dtype=np.uint8),
+        'IBIS': np.array([1, 0], dtype=np.uint8),
+        'USB-C': np.array([1, 1], dtype=np.uint8),
+        'WiFi': np.array([1, 1], dtype=np.uint8),
+        'Bluetooth': np.array([1, 1], dtype=np.uint8),
+    })
+    return ExplanationEngine(df, 'cameras')
+
+
+# Câu phải giống hệt generate_explanation trước khi vector hóa
+@pytest.mark.parametrize('position, purposes, expected', [
+    (1, ['Beginner'], "phù hợp cho người mới với giá 6000000 đồng, trọng lượng 320g, và màn hình lật 360o."),
+    (0, ['Professional'], "lý tưởng cho chuyên nghiệp với độ phân giải 40.0, ISO tối đa 12800, và chống chịu thời tiết."),
+    (0, ['Travel', 'Studio'], "phù hợp cho du lịch và studio với chống chịu thời tiết, có giả lập màu film, "
+                              "độ phân giải 40.0, và USB-C (hỗ trợ tethering)."),
+    (0, ['Sports'], "hoàn hảo cho thể thao với chống chịu thời tiết."),
+    (1, ['Sports'], "hoàn hảo cho thể thao với hiệu suất tối ưu cho chụp thể thao."),
+    (1, ['Daily Use'], "phù hợp cho daily use với các tính năng phù hợp với nhu cầu của bạn."),
+    (1, ['Beginner', 'Sports', 'Daily Use'], "phù hợp cho người mới, thể thao và daily use với giá 6000000 đồng, "
+                                             "trọng lượng 320g, và màn hình lật 360o."),
+    (1, ['Sports', 'Daily Use'], "phù hợp cho thể thao và daily use với nhiều tính năng phù hợp cho đa dạng nhu cầu của bạn."),
+    (0, [], NO_PURPOSE_TEXT),
+])
+def test_camera_explanations_match_baseline(cameras, position, purposes, expected):
+    assert cameras.explain([position], purposes) == [expected]
+
+
+def test_memo_is_keyed_by_purposes(cameras):
+    assert cameras.explain([0, 0], ['Sports']) == ["hoàn hảo cho thể thao với chống chịu thời tiết."] * 2
+    assert cameras.explain([0], ['Video'])[0].startswith("tuyệt vời cho video với có cổng mic ngoài")
+
+
+def test_lens_focal_rules_use_zoom_range_ends():
+    df = pd.DataFrame({
+        'Model': ['xf 16-55mm f/2.8 r lm wr', 'xf 50-140mm f/2.8 r lm ois wr', 'xf 56mm f/1.2 r wr', 'xf 8mm f/3.5 r wr', 'broken'],
+        'Focal Range (mm)': ['16-55', '50-140', '56', '8', '0'],
+    })
+    engine = ExplanationEngine(df, 'lenses')
+    landscape = engine.explain(range(5), ['Landscape'])
+    assert landscape[0] == "lý tưởng cho phong cảnh với góc rộng 16-55mm."
+    assert landscape[3] == "lý tưởng cho phong cảnh với góc rộng 8mm."
+    # Đầu rộng 50mm/56mm không phải góc rộng; ô 0 (thiếu dữ liệu) không đạt luật nào
+    assert landscape[1] == landscape[2] == landscape[4] == "lý tưởng cho phong cảnh với góc nhìn phù hợp cho chụp phong cảnh."
+    sports = engine.explain(range(5), ['Sports'])
+    assert sports[1] == "hoàn hảo cho thể thao với tiêu cự dài 50-140mm."
+    assert "tiêu cự dài" not in sports[0] and "tiêu cự dài" not in sports[4]
+    assert engine.explain([2], ['Portrait']) == ["hoàn hảo cho chân dung với tiêu cự chân dung 56mm."]
+
+
+@pytest.mark.parametrize('purposes, opening', [
+    (['Daily Use', 'Vlogging', 'Beginner'], "phù hợp cho daily use, vlogging và người mới với "),
+    (['beginner', 'Daily Use', 'vlogging'], "phù hợp cho người mới, daily use và vlogging với "),
+    ({'Vlogging': 2, 'Travel': 1}, "phù hợp cho vlogging và du lịch với "),
+])
+def test_recommend_explains_purposes_in_request_order(snapshot, purposes, opening):
+    import main
+    criteria = main.canonical_criteria({'purposes': purposes}, main.PURPOSES_PER_CATEGORY['cameras'])
+    result = main.build_recommendations(snapshot, 'cameras', criteria, limit=20)
+    assert result['recommendations']
+    for item in result['recommendations']:
+        assert item['explanation'].startswith(opening)
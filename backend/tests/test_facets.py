@@ -0,0 +1,29 @@
+import pytest
+
+from facets import facet_counts
+from filters import category_filters
+
+
+def total(snapshot, category, criteria):
+    import main
+    return main.build_recommendations(snapshot, category, main.canonical_criteria(criteria, main.PURPOSES_PER_CATEGORY[category])).get('total', 0)
+
+
+@pytest.mark.parametrize('category', ['cameras', 'lenses', 'drones', 'gimbals', 'action_cameras'])
+def test_facet_counts_match_brute_force(snapshot, category):
+    import main
+    from benchmarks.synthetic import criteria_mix
+    index = main.category_index(snapshot, category)
+    for raw in criteria_mix(category, snapshot[category], 6, seed=11):
+        criteria = main.canonical_criteria(raw, main.PURPOSES_PER_CATEGORY[category], index.price_range)
+        matrix = main.purpose_matrix(snapshot, category)
+        eligible = matrix.scores(matrix.weights(criteria.get('purposes'))) >= main.SCORE_THRESHOLD - main.SCORE_EPSILON
+        facets = facet_counts(index, criteria, eligible)
+        assert facets['matched'] == total(snapshot, category, criteria)
+        # Mỗi lựa chọn: số kết quả nếu đổi riêng tiêu chí đó sang lựa chọn này, các tiêu chí khác giữ nguyên
+        for spec in category_filters(category):
+            for option, count in facets['facets'][spec['criterion']].items():
+                changed = {**criteria, spec['criterion']: True if spec['type'] == 'feature' else option}
+                assert count == total(snapshot, category, changed), (spec['criterion'], option, raw)
+        unpriced = {key: value for key, value in criteria.items() if key != 'price'}
+        assert sum(facets['price']['counts']) == total(snapshot, category, unpriced)
@@ -0,0 +1,143 @@
+import random
+
+import pandas as pd
+import pytest
+
+from filters import CategoryIndex, InvalidCriteria, category_filters
+
+CATEGORIES = ['cameras', 'lenses', 'drones', 'gimbals', 'action_cameras']
+
+# Bản sao apply_filters trước khi có chỉ mục lọc (bỏ phần ghi CSV debug), dùng làm chuẩn so sánh
+RANGES = {
+    'cameras': {
+        'Weight': ('Weight (gram)', {'Light': (None, 400), 'Medium': (400, 600), 'Heavy': (600, None)}, ('ge', 'le')),
+        'Resolution': ('Resolution (MP)', {'Below 20MP': (None, 20), '20-30MP': (20, 30), 'Above 30MP': (30, None)}, ('ge', 'le')),
+        'ISO Max': ('ISO Max', {'General': (None, 12800), 'High': (12800, None)}, ('gt', 'le')),
+    },
+    'lenses': {
+        'Max Aperture': ('Max Aperture', {'Wide': (1.0, 1.8), 'Medium': (2, 2.8), 'Narrow': (3.5, 5.6)}, ('ge', 'le')),
+    },
+    'drones': {
+        'Weight': ('Weight (gram)', {'Light': (None, 250), 'Medium': (250, 900)}, ('ge', 'lt')),
+        'Max Flight Time': ('Max Flight Time (minutes)', {'General': (20, 30), 'Long': (30, None)}, ('gt', 'le')),
+        'Maximum Flight Speed (km/h)': ('Maximum Flight Speed (km/h)',
+                                        {'Slow': (None, 36), 'Moderate': (36, 54), 'Fast': (54, 72), 'Very Fast': (72, None)}, ('ge', 'le')),
+        'Control Range (km)': ('Control Range (km)', {'Short': (None, 9), 'Medium': (10, 15), 'Long': (15, None)}, ('ge', 'le')),
+    },
+    'gimbals': {
+        'Maximum Payload (kg)': ('Maximum Payload (kg)', {'0.3kg': (None, 0.3), '0.3-2kg': (0.3, 2), 'Above 2kg': (2, None)}, ('gt', 'le')),
+        'Battery Life (hours)': ('Battery Life (hours)', {'Below 10h': (None, 10), 'Above 10h': (11, None)}, ('ge', 'le')),
+    },
+    'action_cameras': {
+        'Weight': ('Weight (gram)', {'Light': (None, 100), 'Medium': (100, None)}, ('ge', 'le')),
+        'Battery Life (minutes)': ('Battery Life (minutes)',
+                                   {'Below 100 minutes': (None, 100), '100-150 minutes': (100, 150), 'Above 150 minutes': (150, None)}, ('ge', 'le')),
+    },
+}
+FLAGS = {
+    'cameras': {'4K Video': 'Quality 4K', 'Optical Viewfinder': 'Optical Viewfinder', 'Electronic Viewfinder (EVF)': 'Electronic Viewfinder (EVF)'},
+    'lenses': {'OIS': 'Image Stabilization (OIS)'},
+}
+FEATURES = {
+    'cameras': ['Weathersealing', 'IBIS', 'USB-C'],
+    'drones': ['Tracking', 'Orbit Mode', 'Vertical Video Recording'],
+    'gimbals': ['Time-lapse', 'Follow Mode', 'App Connectivity'],
+    'action_cameras': ['Time-lapse', 'Slow Motion', 'Water Resistance', 'Shock Resistance'],
+}
+COMPARE = {'ge': lambda a, b: a >= b, 'gt': lambda a, b: a > b, 'le': lambda a, b: a <= b, 'lt': lambda a, b: a < b}
+
+
+def legacy_apply_filters(df, category, criteria):
+    if criteria.get('Condition') and criteria['Condition'].lower() in ['new', 'used']:
+        df = df[df['Condition'].str.lower() == criteria['Condition'].lower()]
+    # Colour và Device Compatibility: dữ liệu viết thường, tiêu chí được hạ chữ thường
+    for key in ('Colour', 'Device Compatibility'):
+        if key in criteria and criteria[key] and key in df.columns:
+            df = df[df[key] == criteria[key].lower()]
+    for key in ('Design Style', 'Lens Type', 'Camera Resolution', 'Frames Per Sec'):
+        if key in criteria and key in df.columns:
+            df = df[df[key] == criteria[key]]
+    for key, (column, buckets, bounds) in RANGES.get(category, {}).items():
+        if key in criteria:
+            low, high = buckets[criteria[key]]
+            values = pd.to_numeric(df[column], errors='coerce')
+            keep = pd.Series(True, index=df.index)
+            if low:
+                keep &= COMPARE[bounds[0]](values, low)
+            if high:
+                keep &= COMPARE[bounds[1]](values, high)
+            df = df[keep]
+    for key, column in FLAGS.get(category, {}).items():
+        if key in criteria:
+            df = df[df[column] == (1 if criteria[key] == 'Yes' else 0)]
+    if category == 'cameras' and 'Flipscreen' in criteria:
+        if criteria['Flipscreen'] == 'Yes':
+            df = df[df['Flipscreen'] == 1]
+            if 'Flipscreen Type' in criteria:
+                df = df[df['Flipscreen Type'] == criteria['Flipscreen Type']]
+        else:
+            df = df[df['Flipscreen'] == 0]
+    if category == 'drones' and 'Obstacle Avoidance Sensor' in criteria:
+        sensor = df['Obstacle Avoidance Sensor'].str.strip().str.lower()
+        if criteria['Obstacle Avoidance Sensor'] == 'Yes':
+            df = df[sensor != 'no']
+        elif criteria['Obstacle Avoidance Sensor'] == 'No':
+            df = df[sensor == 'no']
+    if category == 'action_cameras' and 'Video Recording Capabilities' in criteria:
+        df = df[df['Video Recording Capabilities'].str.contains(criteria['Video Recording Capabilities'], na=False)]
+    for feature in FEATURES.get(category, []):
+        if criteria.get(feature):
+            df = df[df[feature] == 1]
+    min_price, max_price = int(criteria['price'][0]), int(criteria['price'][1])
+    return df[(df['Price'] >= min_price) & (df['Price'] <= max_price)]
+
+
+def random_criteria(df, category, rng):
+    """Tiêu chí như frontend gửi: giá trị lấy từ dữ liệu/nhãn bucket, luôn kèm khoảng giá."""
+    criteria = {}
+    for spec in rng.sample(category_filters(category), rng.randint(0, min(4, len(category_filters(category))))):
+        kind, column = spec['type'], spec['column']
+        if kind == 'range':
+            criteria[spec['criterion']] = rng.choice(list(spec['buckets']))
+        elif kind == 'feature':
+            criteria[spec['criterion']] = True
+        elif kind in ('flag', 'presence'):
+            criteria[spec['criterion']] = rng.choice(['Yes', 'No'])
+        elif kind == 'contains':
+            criteria[spec['criterion']] = rng.choice(['4K', '60fps', '5.3K', '120fps'])
+        elif column in df.columns:
+            criteria[spec['criterion']] = str(rng.choice(list(df[column].dropna().unique())))
+    # Flipscreen Type chỉ có hiệu lực khi Flipscreen = Yes
+    if 'Flipscreen Type' in criteria and rng.random() < 0.5:
+        criteria['Flipscreen'] = 'Yes'
+    low, high = df['Price'].min(), df['Price'].max()
+    cut = int(rng.uniform(low, high))
+    criteria['price'] = rng.choice([[int(low), int(high)], [int(low), cut], [cut, int(high)]])
+    return criteria
+
+
+@pytest.mark.parametrize('category', CATEGORIES)
+def test_index_matches_legacy_apply_filters(snapshot, category):
+    import main
+    df = snapshot[category]
+    index = main.category_index(snapshot, category)
+    rng = random.Random(category)
+    for _ in range(300):
+        criteria = random_criteria(df, category, rng)
+        expected = legacy_apply_filters(df, category, criteria)
+        assert main.apply_filters(df, category, criteria, index).index.equals(expected.index), criteria
+
+
+def test_intended_differences_from_legacy_filters():
+    df = pd.DataFrame({'Model': ['a', 'b', 'c'], 'Price': [100, 200, 300], 'Condition': ['New', 'New', 'Used'],
+                       'Design Style': ['mirrorless', 'compact', 'mirrorless'], 'Obstacle Avoidance Sensor': ['Omnidirectional', 'No', None]})
+    cameras = CategoryIndex(df, 'cameras')
+    # Tiêu chí phân loại không phân biệt hoa thường
+    assert cameras.mask({'Design Style': 'Mirrorless'}).tolist() == [True, False, True]
+    # Nhãn bucket không tồn tại là lỗi (400) thay vì bị bỏ qua
+    with pytest.raises(InvalidCriteria):
+        cameras.mask({'Weight': 'Huge'})
+    # "Yes" của cột presence không chọn dòng thiếu dữ liệu
+    drones = CategoryIndex(df, 'drones')
+    assert drones.mask({'Obstacle Avoidance Sensor': 'Yes'}).tolist() == [True, False, False]
+    assert drones.mask({'Obstacle Avoidance Sensor': 'No'}).tolist() == [False, True, False]
@@ -0,0 +1,110 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+import http_cache
+from http_cache import cache_control, compress, etag, etag_matches, negotiate_encoding
+from result_cache import ResultCache
+from sources import MemorySource
+
+
+def restart(monkeypatch, records):
+    """Mô phỏng process vừa khởi động: catalog tải lại từ đầu (phiên bản 1) và cache kết quả trống."""
+    import main
+    catalog = main.catalog_manager(MemorySource(records), prepare=main.prepare_snapshot)
+    assert catalog.refresh() and catalog.version == 1
+    monkeypatch.setitem(main.catalogs, main.STORES[0], catalog)
+    monkeypatch.setattr(main, 'result_cache', ResultCache())
+
+
+def recommend(if_none_match=None, accept_encoding=None, limit=5):
+    import main
+    request = main.RecommendationRequest(category='cameras', criteria={'purposes': ['Travel']}, limit=limit)
+    return asyncio.run(main.recommend(request, if_none_match=if_none_match, accept_encoding=accept_encoding))
+
+
+def test_etag_survives_restart_only_if_data_is_unchanged(monkeypatch, inventory):
+    restart(monkeypatch, inventory)
+    first = recommend()
+    tag = first.headers['ETag']
+    assert recommend(if_none_match=tag).status_code == 304
+
+    # Cùng dữ liệu sau khi khởi động lại (hoặc ở worker khác): ETag cũ vẫn đúng
+    restart(monkeypatch, [dict(record) for record in inventory])
+    assert recommend(if_none_match=tag).status_code == 304
+
+    # Giá đổi, phiên bản vẫn là 1: ETag phải đổi và client nhận lại body mới
+    changed = [dict(record) for record in inventory]
+    changed[0]['Price'] = '$1,000,000'
+    restart(monkeypatch, changed)
+    response = recommend(if_none_match=tag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != tag
+
+
+@pytest.mark.parametrize('header, matches', [
+    (None, False),
+    ('*', True),
+    ('W/"abc-key"', True),
+    ('"abc-key"', True),
+    ('W/"other-key", W/"abc-key"', True),
+    ('W/"abd-key"', False),
+])
+def test_etag_matches_weak_comparison(header, matches):
+    assert etag_matches(header, etag('abc', 'key')) is matches
+
+
+def test_304_and_compressed_responses_share_the_etag(monkeypatch, inventory):
+    restart(monkeypatch, inventory)
+    plain = recommend(limit=None)
+    assert 'Content-Encoding' not in plain.headers and len(plain.body) >= http_cache.COMPRESS_MIN_BYTES
+    assert plain.headers['Vary'] == 'Accept-Encoding' and plain.headers['Cache-Control'].startswith('private, max-age=')
+
+    zipped = recommend(accept_encoding='br;q=0, gzip', limit=None)
+    assert zipped.headers['Content-Encoding'] == 'gzip' and zipped.headers['Content-Length'] == str(len(zipped.body))
+    assert gzip.decompress(zipped.body) == plain.body
+    assert zipped.headers['ETag'] == plain.headers['ETag']
+
+    not_modified = recommend(if_none_match=plain.headers['ETag'], accept_encoding='gzip', limit=None)
+    assert not_modified.status_code == 304 and not not_modified.body
+    assert {name: not_modified.headers[name] for name in ('ETag', 'Vary')} == {'ETag': plain.headers['ETag'], 'Vary': 'Accept-Encoding'}
+
+    # Response nhỏ (dưới COMPRESS_MIN_BYTES) được gửi nguyên
+    monkeypatch.setattr(http_cache, 'COMPRESS_MIN_BYTES', len(plain.body) + 1)
+    assert 'Content-Encoding' not in recommend(accept_encoding='gzip', limit=None).headers
+    assert json.loads(plain.body)['total'] > 5
+
+
+@pytest.mark.parametrize('header, with_brotli, without_brotli', [
+    (None, None, None),
+    ('identity', None, None),
+    ('gzip', 'gzip', 'gzip'),
+    ('gzip, deflate, br', 'br', 'gzip'),
+    ('br;q=0.5, gzip;q=0.8', 'gzip', 'gzip'),
+    ('br;q=0, gzip;q=0', None, None),
+    ('*', 'br', 'gzip'),
+    ('*;q=0, gzip', 'gzip', 'gzip'),
+    ('gzip;q=abc', None, None),
+])
+def test_negotiate_encoding(monkeypatch, header, with_brotli, without_brotli):
+    monkeypatch.setattr(http_cache, 'brotli', object())
+    assert negotiate_encoding(header) == with_brotli
+    monkeypatch.setattr(http_cache, 'brotli', None)
+    assert negotiate_encoding(header) == without_brotli
+
+
+def test_compress_skips_small_bodies_and_round_trips():
+    body = json.dumps({'recommendations': [{'model': f'x-{i}'} for i in range(200)]}).encode()
+    assert compress(body, None) is None and compress(body[:10], 'gzip') is None
+    zipped = compress(body, 'gzip')
+    assert len(zipped) < len(body) and gzip.decompress(zipped) == body
+    # mtime=0: cùng body luôn cho cùng bytes nén
+    assert compress(body, 'gzip') == zipped
+
+
+def test_cache_control_until_next_refresh():
+    assert cache_control(None, 300, now=1000) == 'private, max-age=0, must-revalidate'
+    assert cache_control(900, 300, now=1000) == 'private, max-age=200, must-revalidate'
+    assert cache_control(500, 300, now=1000) == 'private, max-age=0, must-revalidate'
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from catalog import CatalogManager, CatalogSnapshot
+from sources import MemorySource
+
+
+def full_rebuild(records):
+    import main
+    snapshot = CatalogSnapshot(0, main.load_catalog(MemorySource(records)).specs_dfs)
+    main.prepare_snapshot(snapshot)
+    return snapshot
+
+
+def assert_same_catalog(patched, rebuilt):
+    import main
+    from benchmarks.synthetic import criteria_mix
+    for category, df in rebuilt.specs_dfs.items():
+        assert list(patched[category].dtypes) == list(df.dtypes), category
+        assert patched[category].equals(df), category
+        for criteria in criteria_mix(category, df, 20, seed=3):
+            a = main.build_recommendations(patched, category, main.canonical_criteria(criteria, main.PURPOSES_PER_CATEGORY[category]))
+            b = main.build_recommendations(rebuilt, category, main.canonical_criteria(criteria, main.PURPOSES_PER_CATEGORY[category]))
+            a.pop('version', None)
+            b.pop('version', None)
+            assert json.dumps(a, default=str) == json.dumps(b, default=str), (category, criteria)
+
+
+@pytest.fixture
+def catalog(inventory):
+    import main
+    source = MemorySource(inventory)
+    manager = CatalogManager(lambda: main.load_catalog(source), update=lambda previous: main.update_catalog(previous, source),
+                             prepare=main.prepare_snapshot)
+    assert manager.refresh()
+    return manager, source
+
+
+def lens_row(records):
+    return next(i for i, r in enumerate(records) if 'xf 35mm' in r['Model'].lower())
+
+
+def test_price_change_patches_one_category(catalog):
+    manager, source = catalog
+    previous = manager.snapshot
+    source.records[lens_row(source.records)]['Price'] = '$9,999,000'
+    assert manager.refresh()
+    snapshot = manager.snapshot
+    assert snapshot.origin == 'delta' and manager.last_update['categories'] == ['lenses']
+    # Category không đổi giữ phiên bản và cấu trúc dẫn xuất
+    assert snapshot.category_version('cameras') == previous.category_version('cameras')
+    assert snapshot.derived(('filter_index', 'cameras'), lambda: None) is previous.derived(('filter_index', 'cameras'), lambda: None)
+    assert snapshot.category_version('lenses') == snapshot.version
+    assert_same_catalog(snapshot, full_rebuild(source.records))
+
+
+@pytest.mark.parametrize('edit', ['remove', 'add_back', 'new_colour', 'unknown_model', 'duplicate'])
+def test_delta_equals_full_rebuild(catalog, edit):
+    manager, source = catalog
+    records = [dict(r) for r in source.records]
+    camera = next(i for i, r in enumerate(records) if r['Model'].strip().lower() == 'x-t5')
+    if edit == 'remove':
+        records.pop(camera)
+    elif edit == 'add_back':
+        removed = records.pop(camera)
+        source.records = list(records)
+        assert manager.refresh()
+        records.append(removed)
+    elif edit == 'new_colour':
+        records[camera]['Colour'] = 'Purple'
+    elif edit == 'unknown_model':
+        records.append({'Model': 'Totally new gadget', 'Price': '$1', 'Colour': 'Black', 'Condition': 'New', 'Series': 'X', 'Free Gift': ''})
+    elif edit == 'duplicate':
+        # Model trùng: dòng đầu tiên được giữ như khi dựng lại toàn bộ, nên không có phiên bản mới
+        records.append({**records[camera], 'Price': '$1,500,000'})
+    source.records = records
+    assert manager.refresh() == (edit != 'duplicate')
+    assert manager.snapshot.origin == ('source' if edit == 'duplicate' else 'delta')
+    assert_same_catalog(manager.snapshot, full_rebuild(records))
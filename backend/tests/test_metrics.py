@@ -0,0 +1,77 @@
+import asyncio
+import re
+
+from metrics import Registry, server_timing
+from result_cache import ResultCache
+from sources import MemorySource
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    registry = Registry()
+    latency = registry.histogram("stage_seconds", "Thời gian", ["stage"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        latency.observe(value, stage="filter")
+    latency.observe(0.2, stage="score")
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP stage_seconds Thời gian", "# TYPE stage_seconds histogram"]
+    assert lines[2:7] == [
+        'stage_seconds_bucket{stage="filter",le="0.1"} 2',
+        'stage_seconds_bucket{stage="filter",le="1"} 3',
+        'stage_seconds_bucket{stage="filter",le="+Inf"} 4',
+        'stage_seconds_sum{stage="filter"} 2.65',
+        'stage_seconds_count{stage="filter"} 4',
+    ]
+    assert 'stage_seconds_count{stage="score"} 1' in lines
+
+
+def test_counter_and_gauge_samples():
+    registry = Registry()
+    errors = registry.counter("errors_total", "Lỗi", ["category", "status"])
+    errors.inc(category='cameras', status='400')
+    errors.inc(2, category='cameras', status='400')
+    errors.inc(category='say "hi"\n', status='500')
+    rows = {('hcm', 'cameras'): 28}
+    registry.gauge("rows", "Số dòng", ["store", "category"], collect=lambda: rows)
+    text = registry.render()
+    assert 'errors_total{category="cameras",status="400"} 3\n' in text
+    assert 'errors_total{category="say \\"hi\\"\\n",status="500"} 1\n' in text
+    assert 'rows{store="hcm",category="cameras"} 28\n' in text
+    # Gauge có callback đọc giá trị lúc render
+    rows[('hcm', 'cameras')] = 30
+    assert 'rows{store="hcm",category="cameras"} 30\n' in registry.render()
+
+
+def test_server_timing_header():
+    assert server_timing({'filter': 0.0012, 'score': 0.0005}) == "filter;dur=1.200, score;dur=0.500"
+
+
+def sample(text, name):
+    match = re.search(rf'^{re.escape(name)} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_recommend_records_stage_metrics(monkeypatch, inventory):
+    import main
+    catalog = main.catalog_manager(MemorySource(inventory), prepare=main.prepare_snapshot)
+    assert catalog.refresh()
+    monkeypatch.setitem(main.catalogs, main.STORES[0], catalog)
+    monkeypatch.setattr(main, 'result_cache', ResultCache())
+
+    def scrape():
+        return asyncio.run(main.prometheus_metrics()).body.decode()
+
+    before = scrape()
+    request = main.RecommendationRequest(category='lenses', criteria={'purposes': ['Portrait']}, limit=5)
+    response = asyncio.run(main.recommend(request))
+    stages = dict(part.split(';dur=') for part in response.headers['Server-Timing'].split(', '))
+    assert {'filter', 'score', 'explain', 'format', 'serialize', 'total'} <= stages.keys()
+    # Lần hai lấy từ cache: thêm một lượt hit, không tính lại các bước
+    asyncio.run(main.recommend(request))
+
+    after = scrape()
+    for name, delta in [('recommend_request_seconds_count{endpoint="recommend"}', 2),
+                        ('recommend_stage_seconds_count{stage="filter",category="lenses"}', 1),
+                        ('recommend_cache_lookups_total{result="miss"}', 1),
+                        ('recommend_cache_lookups_total{result="hit"}', 1)]:
+        assert sample(after, name) - sample(before, name) == delta, name
+    assert sample(after, f'catalog_version{{store="{main.STORES[0]}"}}') == catalog.version
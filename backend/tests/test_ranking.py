@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from ranking import rank_order
+
+
+def full_order(scores, prices, model_rank):
+    return sorted(range(len(scores)), key=lambda i: (-scores[i], prices[i], model_rank[i]))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_top_k_equals_prefix_of_full_sort(seed):
+    rng = np.random.default_rng(seed)
+    n = 200
+    # Ít giá trị điểm/giá khác nhau để có nhiều phần tử hòa ở biên top-k
+    scores = rng.choice([0.5, 0.6, 0.75, 0.9], n).astype(np.float32)
+    prices = rng.choice([100.0, 200.0, 300.0], n)
+    model_rank = rng.permutation(n)
+    expected = full_order(scores, prices, model_rank)
+    assert rank_order(scores, prices, model_rank).tolist() == expected
+    for k in (0, 1, 7, 50, n, n + 5):
+        assert rank_order(scores, prices, model_rank, k).tolist() == expected[:k]
+
+
+@pytest.mark.parametrize('category', ['cameras', 'lenses', 'drones'])
+def test_pages_are_stable_and_disjoint(snapshot, category):
+    import main
+    from benchmarks.synthetic import criteria_mix
+    for criteria in criteria_mix(category, snapshot[category], 10, seed=2):
+        criteria = main.canonical_criteria(criteria, main.PURPOSES_PER_CATEGORY[category])
+        everything = main.build_recommendations(snapshot, category, criteria)
+        models = [item['model'] for item in everything.get('recommendations', [])]
+        pages = []
+        for offset in range(0, len(models) + 3, 3):
+            page = main.build_recommendations(snapshot, category, criteria, limit=3, offset=offset)
+            assert page.get('total', 0) == len(models)
+            pages.extend(item['model'] for item in page.get('recommendations', []))
+        # Ghép các trang liên tiếp được đúng danh sách đầy đủ: không trùng, không sót
+        assert pages == models, criteria
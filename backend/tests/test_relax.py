@@ -0,0 +1,90 @@
+import random
+from itertools import combinations
+
+import pytest
+
+from filters import active_criteria, category_filters, price_bounds
+from relax import relax_across, relax_criteria
+
+CATEGORIES = ['cameras', 'lenses', 'drones', 'gimbals', 'action_cameras']
+
+
+def random_criteria(snapshot, category, rng):
+    """purposes + 2-5 bộ lọc ngẫu nhiên (thường cho ít kết quả), đôi khi kèm khoảng giá."""
+    import main
+    index = main.category_index(snapshot, category)
+    criteria = {'purposes': rng.sample(main.PURPOSES_PER_CATEGORY[category], rng.randint(1, 2))}
+    for spec in rng.sample(category_filters(category), min(len(category_filters(category)), rng.randint(2, 5))):
+        kind = spec['type']
+        if kind == 'choice':
+            options = sorted(index.inverted.get(spec['column'], {}))
+            if options:
+                criteria[spec['criterion']] = rng.choice(spec.get('allowed') or options)
+        elif kind == 'range':
+            criteria[spec['criterion']] = rng.choice(list(spec['buckets']))
+        elif kind == 'feature':
+            criteria[spec['criterion']] = True
+        elif kind in ('flag', 'presence'):
+            criteria[spec['criterion']] = rng.choice(['Yes', 'No'])
+    if rng.random() < 0.5:
+        low, high = index.price_range
+        cut = rng.uniform(low, high)
+        criteria['price'] = [int(low), int(cut)] if rng.random() < 0.5 else [int(cut), int(high) + 1]
+    return main.canonical_criteria(criteria, main.PURPOSES_PER_CATEGORY[category], index.price_range)
+
+
+def total(snapshot, category, criteria, dropped=()):
+    import main
+    kept = {key: value for key, value in criteria.items() if key not in dropped}
+    return main.build_recommendations(snapshot, category, kept).get('total', 0)
+
+
+@pytest.mark.parametrize('category', CATEGORIES)
+def test_relaxation_is_minimal(snapshot, category):
+    import main
+    rng = random.Random(category)
+    index = main.category_index(snapshot, category)
+    matrix = main.purpose_matrix(snapshot, category)
+    requires = {spec['criterion']: spec['requires'][0] for spec in category_filters(category) if 'requires' in spec}
+    for _ in range(8):
+        criteria = random_criteria(snapshot, category, rng)
+        names = [spec['criterion'] for spec, _ in active_criteria(category, criteria)] + (['price'] if price_bounds(criteria) else [])
+        eligible = matrix.scores(matrix.weights(criteria.get('purposes'))) >= main.SCORE_THRESHOLD - main.SCORE_EPSILON
+        strict = total(snapshot, category, criteria)
+        for min_results in (1, 3, 10):
+            relaxation = relax_criteria(index, criteria, eligible, min_results)
+            target = min(min_results, total(snapshot, category, criteria, names))
+            if target == 0 or strict >= target:
+                assert relaxation is None
+                continue
+            # Vét cạn: nới tiêu chí cũng nới các tiêu chí phụ thuộc, kích thước tính theo tập đã đóng
+            best = None
+            for size in range(1, len(names) + 1):
+                for subset in combinations(names, size):
+                    closed = set(subset) | {name for name in names if requires.get(name) in subset}
+                    count = total(snapshot, category, criteria, closed)
+                    if count >= target and (best is None or (len(closed), -count) < best):
+                        best = (len(closed), -count)
+            assert relaxation is not None, criteria
+            assert (len(relaxation.relaxed), -relaxation.count) == best, (criteria, relaxation.relaxed)
+            assert relaxation.count == total(snapshot, category, criteria, relaxation.relaxed)
+            assert relaxation.strict_count == strict
+
+
+def test_relax_across_sums_shards(snapshot):
+    import main
+    rng = random.Random(5)
+    index = main.category_index(snapshot, 'cameras')
+    matrix = main.purpose_matrix(snapshot, 'cameras')
+    for _ in range(20):
+        criteria = random_criteria(snapshot, 'cameras', rng)
+        eligible = matrix.scores(matrix.weights(criteria.get('purposes'))) >= main.SCORE_THRESHOLD - main.SCORE_EPSILON
+        single = relax_criteria(index, criteria, eligible, 5)
+        # Hai shard giống nhau cần gấp đôi số kết quả: cùng tập nới, mỗi shard một nửa
+        shards = relax_across([index, index], criteria, [eligible, eligible], 10)
+        if single is None:
+            assert shards is None
+            continue
+        assert [shard.relaxed for shard in shards] == [single.relaxed] * 2
+        assert [shard.count for shard in shards] == [single.count] * 2
+        assert all((shard.mask == single.mask).all() for shard in shards)
@@ -0,0 +1,40 @@
+import pytest
+
+from filters import InvalidCriteria
+from result_cache import canonical_criteria
+
+PURPOSES = ['Beginner', 'Professional', 'Sports', 'Video', 'Daily Use', 'Travel', 'Vlogging', 'Studio']
+
+
+def test_equivalent_criteria_share_a_key():
+    a = canonical_criteria({'purposes': ['travel', 'Beginner', 'TRAVEL'], 'Weight': ' Light ', 'price': [0, 10 ** 9]}, PURPOSES, (2e6, 6e7))
+    b = canonical_criteria({'purposes': ['Travel', 'beginner'], 'Weight': 'light'}, PURPOSES, (2e6, 6e7))
+    assert a == b == {'purposes': ['Travel', 'Beginner'], 'Weight': 'light'}
+
+
+def test_purpose_order_is_kept():
+    # Câu giải thích liệt kê purposes theo thứ tự của request nên thứ tự là một phần của khóa
+    a = canonical_criteria({'purposes': ['Travel', 'Beginner']}, PURPOSES)
+    b = canonical_criteria({'purposes': ['Beginner', 'Travel']}, PURPOSES)
+    assert a['purposes'] == ['Travel', 'Beginner'] and b['purposes'] == ['Beginner', 'Travel']
+    assert list(canonical_criteria({'purposes': {'studio': 3, 'Video': 1}}, PURPOSES)['purposes']) == ['Studio', 'Video']
+
+
+@pytest.mark.parametrize('criteria', [
+    {'price': ['a', 5]},
+    {'price': [None, 5]},
+    {'price': [1, float('inf')]},
+    {'purposes': {'Travel': 'x'}},
+    {'purposes': {'Travel': float('inf')}},
+    {'purposes': {'Travel': 1, 'Vlogging': float('nan')}},
+    {'purposes': {'Travel': 'inf'}},
+    {'purposes': {'Travel': 1, 'Vlogging': -1}},
+    {'purposes': {'Travel': 10 ** 400}},
+])
+def test_invalid_values_raise_invalid_criteria(criteria):
+    with pytest.raises(InvalidCriteria):
+        canonical_criteria(criteria, PURPOSES, (2e6, 6e7))
+
+
+def test_zero_weight_drops_the_purpose():
+    assert canonical_criteria({'purposes': {'Travel': 2, 'Vlogging': 0, 'Studio': None}}, PURPOSES) == {'purposes': ['Travel']}
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from schema import apply_schema
+
+
+def test_schema_is_idempotent_and_keeps_focal_range():
+    raw = pd.DataFrame({'Model': ['xf 16-55mm', 'xf 56mm', 'broken'], 'Focal Length (mm)': ['16-55', '56', None],
+                        'Image Stabilization (OIS)': ['No', 'yes', None]})
+    typed = apply_schema(raw, 'lenses')
+    assert typed['Focal Length (mm)'].tolist() == [0, 56, 0]
+    assert typed['Focal Range (mm)'].tolist() == ['16-55', '56', None]
+    assert typed['Image Stabilization (OIS)'].tolist() == [0, 1, 0]
+    # Áp lại lên frame đã áp schema (vd. sau khi merge với inventory) không làm mất khoảng tiêu cự
+    assert apply_schema(typed, 'lenses').equals(typed)
+
+
+def details(snapshot, category):
+    import main
+    positions = np.arange(len(snapshot[category]))
+    return main.format_recommendations(snapshot, category, positions, np.zeros(len(positions)), None, {})
+
+
+def test_details_payload_types(snapshot):
+    cameras = details(snapshot, 'cameras')
+    # WiFi của máy ảnh giữ nguyên "Yes"/"No" như trước khi có schema; các cờ khác là 0/1
+    assert {item['details']['wifi'] for item in cameras} <= {'Yes', 'No'}
+    assert {item['details']['bluetooth'] for item in cameras} <= {0, 1}
+
+    lenses = {item['model']: item['details'] for item in details(snapshot, 'lenses')}
+    prime = next(spec for model, spec in lenses.items() if model.startswith('xf 35mm'))
+    zoom = next(spec for model, spec in lenses.items() if model.startswith('xf 16-55mm'))
+    assert prime['focal length (mm)'] == 35 and prime['focal range (mm)'] == '35'
+    assert zoom['focal length (mm)'] == 0 and zoom['focal range (mm)'] == '16-55'
@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scoring import SCORE_EPSILON, PurposeMatrix
+
+CATEGORIES = ['cameras', 'lenses', 'drones', 'gimbals', 'action_cameras']
+
+
+def reference_scores(df, purposes, weights=None):
+    """Trung bình có trọng số (float64) của các cột purpose, NaN tính là 0 như calculate_scores cũ."""
+    columns = {str(c).lower(): c for c in df.columns}
+    weights = weights or [1.0] * len(purposes)
+    values = np.stack([df[columns[p.lower()]].astype(float).fillna(0).to_numpy() for p in purposes])
+    return (np.array(weights)[:, None] * values).sum(axis=0) / sum(weights)
+
+
+@pytest.mark.parametrize('category', CATEGORIES)
+def test_matrix_scores_match_weighted_mean(snapshot, category):
+    import main
+    df = snapshot[category]
+    matrix = main.purpose_matrix(snapshot, category)
+    rng = random.Random(category)
+    for _ in range(20):
+        purposes = rng.sample(matrix.purposes, rng.randint(1, len(matrix.purposes)))
+        # Danh sách purposes: trung bình cộng như trước khi có ma trận
+        assert np.allclose(matrix.scores(matrix.weights(purposes)), reference_scores(df, purposes), atol=SCORE_EPSILON)
+        # Dict purpose -> trọng số: trung bình có trọng số, tên không phân biệt hoa thường
+        weights = [rng.choice([0.5, 1, 2, 3]) for _ in purposes]
+        selected = {p.upper(): w for p, w in zip(purposes, weights)}
+        assert np.allclose(matrix.scores(matrix.weights(selected)), reference_scores(df, purposes, weights), atol=SCORE_EPSILON)
+
+
+def test_weights_are_normalised_and_ignore_unknown_or_zero():
+    matrix = PurposeMatrix(pd.DataFrame({'Travel': [1.0, 0.0], 'Sport': [0.0, 1.0], 'Name': ['a', 'b']}), ['Travel', 'Sport', 'Name'])
+    # Cột không phải số không phải là purpose
+    assert matrix.purposes == ['Travel', 'Sport']
+    assert matrix.weights(None) is None and matrix.weights({'travel': 0}) is None
+    assert matrix.weights({'travel': 3, 'sport': 1, 'unknown': 5}).tolist() == [0.75, 0.25]
+    assert matrix.weights(['travel', 'sport']).tolist() == matrix.weights({'Travel': 2, 'Sport': 2}).tolist() == [0.5, 0.5]
+
+
+@pytest.mark.parametrize('category', ['cameras', 'drones'])
+def test_score_matrix_rows_equal_single_scores(snapshot, category):
+    import main
+    matrix = main.purpose_matrix(snapshot, category)
+    rng = random.Random(category)
+    selected = [None, []] + [{p: rng.choice([1, 2]) for p in rng.sample(matrix.purposes, rng.randint(1, 3))} for _ in range(10)]
+    batch = matrix.score_matrix(selected)
+    for row, purposes in zip(batch, selected):
+        # Cùng thứ tự cộng dồn nên bằng nhau từng bit, không chỉ gần đúng
+        assert np.array_equal(row, matrix.scores(matrix.weights(purposes)))
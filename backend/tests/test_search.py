@@ -0,0 +1,89 @@
+import math
+import random
+
+import pandas as pd
+import pytest
+
+from search import SEARCH_MIN_SCORE, SearchIndex, compact, trigrams
+
+
+def brute_force(index, query, limit, min_score=SEARCH_MIN_SCORE, category=None):
+    """Chấm điểm mọi mục không qua chỉ mục: tỉ lệ trigram chung, hòa thì Dice rồi tên model."""
+    grams = set(trigrams(query))
+    need = max(1, math.ceil(min_score * len(grams) - 1e-9))
+    scored = []
+    for i, model in enumerate(index.models):
+        if category is not None and index.categories[i] != category:
+            continue
+        names = set(trigrams(model))
+        shared = len(grams & names)
+        if shared >= need:
+            scored.append((-shared / len(grams), -2 * shared / (len(grams) + len(names)), model, i))
+    return [i for *_, i in sorted(scored)[:limit]]
+
+
+def typo(name, rng):
+    chars = list(name)
+    i = rng.randrange(len(chars))
+    edit = rng.choice(['drop', 'swap', 'replace', 'space'])
+    if edit == 'drop' and len(chars) > 3:
+        del chars[i]
+    elif edit == 'swap' and i + 1 < len(chars):
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    elif edit == 'replace':
+        chars[i] = rng.choice('abcdefghijklmnopqrstuvwxyz0123456789')
+    else:
+        chars.insert(i, ' ')
+    return ''.join(chars)
+
+
+def test_compact_trigrams():
+    assert compact(' X-T5 ') == 'xt5'
+    assert trigrams('X-T5') == ['$xt', 'xt5', 't5$']
+    assert trigrams('aaaa') == ['$aa', 'aaa', 'aa$']
+
+
+def test_index_matches_brute_force(snapshot):
+    import main
+    index = main.search_index(snapshot)
+    rng = random.Random(25)
+    models = list(index.models)
+    queries = [typo(rng.choice(models), rng) for _ in range(150)] + [rng.choice(models)[:rng.randint(2, 6)] for _ in range(50)]
+    queries += ['dji', 'osmo', 'mm', 'zzzz', 'x']
+    for query in queries:
+        for min_score, category in [(SEARCH_MIN_SCORE, None), (0.3, None), (SEARCH_MIN_SCORE, 'lenses')]:
+            positions, scores = index.match(query, 10, min_score, category)
+            assert positions.tolist() == brute_force(index, query, 10, min_score, category), (query, min_score, category)
+            assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_search_finds_misspelled_models(snapshot):
+    import main
+    index = main.search_index(snapshot)
+    for query, expected in [('xt5', 'x-t5'), ('X T5', 'x-t5'), ('xt-5', 'x-t5')]:
+        positions, scores = index.match(query, 3)
+        assert index.models[positions[0]] == expected and scores[0] == 1.0
+    results = index.results(*index.match('x-t5', 1))
+    assert results[0]['category'] == 'cameras' and results[0]['in_stock'] and results[0]['price'] > 0
+
+
+def test_spec_only_models_and_inventory_mismatches():
+    frames = {'cameras': pd.DataFrame({'Model': ['x-t5', 'x-h2s'], 'Price': [100.0, 200.0]}),
+              'lenses': pd.DataFrame({'Model': ['xf 35mm f1.4'], 'Price': [50.0]})}
+    specs = {'cameras': pd.DataFrame({'Model': ['x-t5', 'x-h2s', 'x-s20']}), 'lenses': pd.DataFrame({'Model': ['xf 35mm f1.4', 'xf 56mm f1.2']})}
+    index = SearchIndex(frames, specs)
+    assert index.n == 5
+    spec_only = index.results(*index.match('x-s20', 1))[0]
+    assert spec_only == {'category': 'cameras', 'model': 'x-s20', 'price': None, 'in_stock': False, 'score': 1.0}
+
+    report = index.mismatches(['x-t5', 'xt5 ', 'xf 35 mm f1.4', 'totally unknown', 'xt5 '])
+    assert [(item['inventory_model'], item['suggestion'] and item['suggestion']['model']) for item in report['inventory_unmatched']] == [
+        ('xt5 ', 'x-t5'), ('xf 35 mm f1.4', 'xf 35mm f1.4'), ('totally unknown', None)]
+    assert report['specs_without_inventory'] == {'cameras': 1, 'lenses': 1}
+
+
+@pytest.mark.parametrize('query', ['', '-', '  '])
+def test_query_without_letters_or_digits_matches_nothing(query):
+    index = SearchIndex({'cameras': pd.DataFrame({'Model': ['x-t5'], 'Price': [1.0]})})
+    positions, scores = index.match(query, 5)
+    assert len(positions) == len(scores) == 0
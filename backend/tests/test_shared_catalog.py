@@ -0,0 +1,62 @@
+import json
+import mmap
+import os
+
+import numpy as np
+import pytest
+
+from catalog import CatalogNotReady, CatalogSnapshot
+from shared_catalog import CURRENT, SharedCatalog, publish, read_pointer
+
+
+def is_mapped(values: np.ndarray) -> bool:
+    base = values
+    while isinstance(base, np.ndarray) and base.base is not None:
+        base = base.base
+    return isinstance(base, memoryview) and isinstance(base.obj, mmap.mmap)
+
+
+def test_attach_maps_published_catalog(snapshot, tmp_path):
+    import main
+    published = CatalogSnapshot(4, snapshot.specs_dfs, category_versions={**snapshot.category_versions, 'lenses': 2})
+    publish(str(tmp_path), published)
+    shared = SharedCatalog(str(tmp_path), prepare=main.prepare_snapshot)
+    assert shared.refresh() and not shared.refresh()
+    attached = shared.current()
+    assert attached.version == 4 and attached.origin == 'shared' and attached.category_version('lenses') == 2
+
+    for category, df in snapshot.specs_dfs.items():
+        assert list(attached[category].dtypes) == list(df.dtypes), category
+        assert attached[category].equals(df), category
+        # Cột số là view trên vùng nhớ của file, không phải bản sao riêng của worker
+        numeric = [column for column in df.columns if df[column].dtype.kind in 'iuf']
+        assert numeric and all(is_mapped(attached[category][column].to_numpy()) for column in numeric), category
+
+    criteria = main.canonical_criteria({'purposes': ['Travel', 'Vlogging']}, main.PURPOSES_PER_CATEGORY['cameras'])
+    expected = main.build_recommendations(snapshot, 'cameras', criteria, limit=10)
+    result = main.build_recommendations(attached, 'cameras', criteria, limit=10)
+    assert json.dumps({**result, 'version': 0}, default=str) == json.dumps({**expected, 'version': 0}, default=str)
+
+
+def test_follows_new_versions_and_prunes_old_files(snapshot, tmp_path):
+    shared = SharedCatalog(str(tmp_path))
+    for version in range(1, 6):
+        publish(str(tmp_path), CatalogSnapshot(version, snapshot.specs_dfs), keep=2)
+        assert shared.refresh() and shared.version == version
+    assert read_pointer(str(tmp_path))[0] == 5
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.rcs')) == ['catalog-00000004.rcs', 'catalog-00000005.rcs']
+
+
+def test_waits_for_loader_then_reports_missing_file(snapshot, tmp_path):
+    shared = SharedCatalog(str(tmp_path), poll_interval=60)
+    with pytest.raises(CatalogNotReady):
+        shared.current(timeout=0.01)
+    shared.stop()
+    assert 'No catalog published' in shared.last_error
+
+    # CURRENT trỏ tới file đã bị xóa: giữ phiên bản đang dùng và ghi lại lỗi
+    publish(str(tmp_path), CatalogSnapshot(1, snapshot.specs_dfs))
+    assert shared.refresh()
+    (tmp_path / CURRENT).write_text(json.dumps({'version': 2, 'file': 'catalog-00000002.rcs'}))
+    assert not shared.refresh()
+    assert shared.version == 1 and shared.last_error.startswith('FileNotFoundError')
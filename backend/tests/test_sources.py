@@ -0,0 +1,48 @@
+import pytest
+
+from sources import source_from_env, stores_from_env
+
+ENV = ("INVENTORY_SOURCE", "INVENTORY_FILE", "INVENTORY_FIXTURE", "INVENTORY_STORES")
+
+
+@pytest.fixture
+def env(monkeypatch):
+    for name in ENV:
+        monkeypatch.delenv(name, raising=False)
+
+    def configure(**values):
+        for name, value in values.items():
+            monkeypatch.setenv(name, value)
+
+    return configure
+
+
+@pytest.mark.parametrize('values, kind', [
+    ({}, 'gsheet'),
+    ({'INVENTORY_FILE': 'inventory.csv'}, 'file'),
+    ({'INVENTORY_FIXTURE': 'inventory.json'}, 'file'),
+    ({'INVENTORY_SOURCE': 'memory', 'INVENTORY_FILE': 'inventory.csv'}, 'memory'),
+    ({'INVENTORY_SOURCE': 'GSHEET', 'INVENTORY_FILE': 'inventory.csv'}, 'gsheet'),
+])
+def test_stores_choose_the_same_source_kind_as_a_single_catalog(env, values, kind):
+    env(**values)
+    assert source_from_env().name == kind
+    env(INVENTORY_STORES='hcm=hcm.csv, Hanoi=hanoi.csv')
+    stores = stores_from_env()
+    assert list(stores) == ['hcm', 'hanoi'] and {source.name for source in stores.values()} == {kind}
+    if kind == 'file':
+        assert [source.path for source in stores.values()] == ['hcm.csv', 'hanoi.csv']
+    elif kind == 'gsheet':
+        assert [source.worksheet for source in stores.values()] == ['hcm.csv', 'hanoi.csv']
+
+
+@pytest.mark.parametrize('spec', ['hcm=a.csv,hcm=b.csv', 'hcm=a.csv,=b.csv', 'hcm=a.csv,hanoi'])
+def test_invalid_store_specs(env, spec):
+    env(INVENTORY_FILE='inventory.csv', INVENTORY_STORES=spec)
+    with pytest.raises(ValueError):
+        stores_from_env()
+
+
+def test_no_stores_means_one_catalog(env):
+    env(INVENTORY_STORES=' ')
+    assert stores_from_env() == {}
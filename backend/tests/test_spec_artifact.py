@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from spec_artifact import compile_specs, load_specs, parse_spec_table
+
+
+@pytest.fixture(scope="module")
+def specs_csv():
+    import main
+    return dict(main.SPECS_CSV)
+
+
+def assert_same_frames(loaded, expected):
+    assert set(loaded) == set(expected)
+    for category, df in expected.items():
+        assert list(loaded[category].dtypes) == list(df.dtypes), category
+        assert loaded[category].equals(df), category
+
+
+def test_compiled_specs_equal_parsed_csv(specs_csv, tmp_path):
+    path = str(tmp_path / 'specs.rcs')
+    compiled = compile_specs(path, specs_csv)
+    parsed = {category: parse_spec_table(category, text) for category, text in specs_csv.items()}
+    assert_same_frames(compiled, parsed)
+    assert_same_frames(load_specs(path, specs_csv), parsed)
+
+
+@pytest.mark.parametrize('change', ['edited_csv', 'new_category', 'corrupt', 'missing'])
+def test_stale_or_broken_artifact_is_ignored(specs_csv, tmp_path, change):
+    path = tmp_path / 'specs.rcs'
+    compile_specs(str(path), specs_csv)
+    current = dict(specs_csv)
+    if change == 'edited_csv':
+        current['lenses'] = current['lenses'].strip().rsplit('\n', 1)[0]
+    elif change == 'new_category':
+        current['tripods'] = 'Model,Price\nT1,1\n'
+    elif change == 'corrupt':
+        path.write_bytes(b'not a snapshot' + path.read_bytes()[14:])
+    else:
+        path.unlink()
+    assert load_specs(str(path), current) is None
+
+
+def test_parse_specs_falls_back_to_csv_when_artifact_is_stale(specs_csv, tmp_path, monkeypatch):
+    import main
+    path = str(tmp_path / 'specs.rcs')
+    stale = dict(specs_csv, lenses=specs_csv['lenses'].strip().rsplit('\n', 1)[0])
+    compile_specs(path, stale)
+    monkeypatch.setattr(main, 'SPECS_ARTIFACT_PATH', path)
+    parsed = main.parse_specs()
+    assert_same_frames(parsed, {category: parse_spec_table(category, text) for category, text in specs_csv.items()})
+
+    compile_specs(path, specs_csv)
+    assert_same_frames(main.parse_specs(), parsed)
+
+
+def test_main_does_not_import_sheets_client():
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, INVENTORY_SOURCE='memory', INVENTORY_STORES='', CATALOG_SNAPSHOT_PATH='')
+    output = subprocess.run([sys.executable, '-c', 'import sys, main; print("gspread" in sys.modules, "oauth2client" in sys.modules)'],
+                            cwd=backend, env=env, capture_output=True, text=True, check=True).stdout
+    assert output.split() == ['False', 'False']
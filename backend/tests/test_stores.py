@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from catalog import CatalogSnapshot
+from sources import MemorySource
+
+CATEGORIES = ['cameras', 'lenses', 'drones', 'gimbals', 'action_cameras']
+
+
+def prepared(records):
+    import main
+    snapshot = CatalogSnapshot(1, main.load_catalog(MemorySource(records)).specs_dfs)
+    main.prepare_snapshot(snapshot)
+    return snapshot
+
+
+@pytest.fixture(scope="module")
+def shards():
+    """Inventory chia cho hai store (mỗi model ở đúng một store) và catalog một store chứa cả hai."""
+    from benchmarks.synthetic import base_specs, synthetic_inventory
+    records = synthetic_inventory(base_specs(), seed=7)
+    models = sorted({record['Model'].strip().lower() for record in records})
+    hanoi = set(models[::2])
+    split = {'hcm': [r for r in records if r['Model'].strip().lower() not in hanoi],
+             'hanoi': [r for r in records if r['Model'].strip().lower() in hanoi]}
+    return {store: prepared(part) for store, part in split.items()}, prepared(records)
+
+
+def merged(snapshots, category, criteria, limit=None, offset=0, min_results=None, facets=False):
+    import main
+    request = main.RecommendationRequest(category=category, criteria=criteria, store=list(snapshots), limit=limit, offset=offset,
+                                         min_results=min_results, facets=facets)
+    return main.build_store_recommendations(snapshots, category, criteria, request)
+
+
+def cases(snapshot, category):
+    import main
+    from benchmarks.synthetic import criteria_mix
+    for i, criteria in enumerate(criteria_mix(category, snapshot[category], 10, seed=6)):
+        yield main.canonical_criteria(criteria, main.PURPOSES_PER_CATEGORY[category]), [(None, 0), (4, 0), (3, 2)][i % 3]
+
+
+@pytest.mark.parametrize('category', CATEGORIES)
+def test_merged_stores_equal_one_catalog(shards, category):
+    import main
+    snapshots, union = shards
+    seen = set()
+    for criteria, (limit, offset) in cases(union, category):
+        expected = main.build_recommendations(union, category, criteria, limit, offset, facets=True)
+        result = merged(snapshots, category, criteria, limit, offset, facets=True)
+        if 'recommendations' not in expected:
+            assert 'recommendations' not in result and result['message'] == expected['message']
+            continue
+        assert result['total'] == expected['total'] and sum(result['stores'].values()) == expected['total']
+        assert [(item['model'], item['score'], item['price']) for item in result['recommendations']] == \
+               [(item['model'], item['score'], item['price']) for item in expected['recommendations']]
+        assert result['facets'] == expected['facets']
+        # Mỗi mục được format từ đúng store chứa model đó
+        for item in result['recommendations']:
+            assert item['model'] in set(snapshots[item['store']][category]['Model'])
+            seen.add(item['store'])
+    assert seen == set(snapshots)
+
+
+@pytest.mark.parametrize('category', ['cameras', 'lenses', 'drones'])
+def test_relaxation_is_shared_across_stores(shards, category):
+    import main
+    snapshots, union = shards
+    relaxed = 0
+    for criteria, (limit, offset) in cases(union, category):
+        expected = main.build_recommendations(union, category, criteria, limit, offset, min_results=8)
+        result = merged(snapshots, category, criteria, limit, offset, min_results=8)
+        assert result.get('relaxed') == expected.get('relaxed') and result.get('strict_total') == expected.get('strict_total')
+        assert result.get('total') == expected.get('total')
+        assert [item['model'] for item in result.get('recommendations', [])] == [item['model'] for item in expected.get('recommendations', [])]
+        relaxed += 'relaxed' in result
+    assert relaxed
+
+
+def test_fan_out_equals_sequential_merge(shards, monkeypatch):
+    import main
+    from result_cache import ResultCache
+    snapshots, union = shards
+    monkeypatch.setattr(main, 'result_cache', ResultCache())
+    for criteria, (limit, offset) in cases(union, 'cameras'):
+        request = main.RecommendationRequest(category='cameras', criteria=criteria, store=list(snapshots), limit=limit, offset=offset,
+                                             min_results=5, facets=True)
+        result = asyncio.run(main.fan_out(snapshots, 'key', 'cameras', criteria, request, {}))
+        assert result == merged(snapshots, 'cameras', criteria, limit, offset, min_results=5, facets=True)
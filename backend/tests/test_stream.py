@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from result_cache import ResultCache
+from sources import MemorySource
+
+
+@pytest.fixture
+def serve(monkeypatch, inventory):
+    """Catalog của store mặc định tải từ inventory tổng hợp, cache kết quả trống."""
+    import main
+    catalog = main.catalog_manager(MemorySource(inventory), prepare=main.prepare_snapshot)
+    assert catalog.refresh()
+    monkeypatch.setitem(main.catalogs, main.STORES[0], catalog)
+    monkeypatch.setattr(main, 'result_cache', ResultCache())
+    # Lô nhỏ để một response gồm nhiều lô
+    monkeypatch.setattr(main, 'STREAM_BATCH_SIZE', 4)
+    return catalog
+
+
+def streamed(request):
+    """Các chunk byte của response stream."""
+    import main
+
+    async def collect():
+        response = await main.recommend(request, stream=True)
+        assert response.media_type == main.NDJSON
+        return [chunk async for chunk in response.body_iterator]
+
+    return asyncio.run(collect())
+
+
+def lines(chunks):
+    body = b''.join(chunks)
+    # Mỗi dòng là một đối tượng JSON hoàn chỉnh kết thúc bằng \n, chunk không cắt giữa dòng
+    assert all(chunk.endswith(b'\n') for chunk in chunks) and body.endswith(b'\n')
+    return [json.loads(line) for line in body.decode('utf-8').splitlines()]
+
+
+def buffered(request):
+    import main
+    return json.loads(asyncio.run(main.recommend(request)).body)
+
+
+@pytest.mark.parametrize('limit, offset', [(None, 0), (6, 0), (5, 3)])
+def test_stream_matches_buffered_response(serve, limit, offset):
+    import main
+    request = main.RecommendationRequest(category='lenses', criteria={'purposes': ['Portrait', 'Landscape']}, limit=limit, offset=offset,
+                                         facets=True, min_results=3)
+    chunks = streamed(request)
+    header, *items = lines(chunks)
+    expected = buffered(request)
+    assert header == {key: value for key, value in expected.items() if key != 'recommendations'}
+    assert items == expected['recommendations']
+    assert len(chunks) == 1 + -(-len(items) // main.STREAM_BATCH_SIZE)
+
+
+def test_stream_without_results_sends_alternatives(serve):
+    import main
+    request = main.RecommendationRequest(category='cameras', criteria={'purposes': ['Travel'], 'price': [1, 2]})
+    header, empty = lines(streamed(request))
+    assert header['total'] == 0
+    assert empty == {key: value for key, value in buffered(request).items() if key in empty}
+    assert empty['message'] and 'alternatives' in empty
+
+
+def test_stream_reports_late_errors_in_band(serve, monkeypatch):
+    import main
+
+    def broken(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main, 'format_batch', broken)
+    request = main.RecommendationRequest(category='cameras', criteria={'purposes': ['Travel']})
+    header, error = lines(streamed(request))
+    assert header['total'] > 0
+    assert error == {'error': 'Error: boom', 'status_code': 500}
+
+
+def test_stream_rejects_several_stores(serve, monkeypatch):
+    import main
+    monkeypatch.setitem(main.catalogs, 'hanoi', serve)
+    request = main.RecommendationRequest(category='cameras', criteria={}, store=[main.STORES[0], 'hanoi'])
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(main.recommend(request, accept=main.NDJSON))
+    assert e.value.status_code == 400 and e.value.detail == "Streaming supports a single store"
@@ -0,0 +1,64 @@
+import pytest
+
+from catalog import CatalogSnapshot
+from replay_traces import replay
+from sources import MemorySource
+
+
+@pytest.fixture
+def traces(monkeypatch):
+    """Ghi vết mọi truy vấn vào danh sách thay vì hàng đợi ghi đĩa."""
+    import main
+    recorded = []
+    monkeypatch.setattr(main.tracer, 'sample_rate', 1.0)
+    monkeypatch.setattr(main.tracer, 'record', recorded.append)
+    return recorded
+
+
+@pytest.fixture(scope="module")
+def second_store():
+    import main
+    from benchmarks.synthetic import base_specs, synthetic_inventory
+    snapshot = CatalogSnapshot(0, main.load_catalog(MemorySource(synthetic_inventory(base_specs(), seed=11))).specs_dfs)
+    main.prepare_snapshot(snapshot)
+    return snapshot
+
+
+def requests(snapshot, category):
+    import main
+    from benchmarks.synthetic import criteria_mix
+    for i, criteria in enumerate(criteria_mix(category, snapshot[category], 12, seed=5)):
+        criteria = main.canonical_criteria(criteria, main.PURPOSES_PER_CATEGORY[category])
+        yield criteria, (5, 0) if i % 3 == 0 else (3, i % 4) if i % 3 == 1 else (None, 0), 10 if i % 2 else None
+
+
+@pytest.mark.parametrize('category', ['cameras', 'lenses'])
+def test_single_store_traces_replay_without_mismatches(snapshot, traces, category):
+    import main
+    for criteria, (limit, offset), min_results in requests(snapshot, category):
+        main.build_recommendations(snapshot, category, criteria, limit, offset, min_results=min_results, store='hcm')
+        main.rank_for_stream(snapshot, category, criteria, limit, offset, {}, min_results=min_results, store='hcm')
+    assert len(traces) == 24
+    assert all(trace['stores'] == ['hcm'] and {'limit', 'offset', 'min_results', 'relaxed'} <= trace.keys() for trace in traces)
+    assert any(trace['relaxed'] for trace in traces) and any(trace['offset'] for trace in traces)
+
+    report = replay(list(traces), {'hcm': snapshot.specs_dfs}, check=True)
+    assert report['mismatches'] == 0 and report['skipped'] == 0
+
+
+def test_merged_store_traces_replay_without_mismatches(snapshot, second_store, traces):
+    import main
+    snapshots = {'hcm': snapshot, 'hanoi': second_store}
+    for criteria, (limit, offset), min_results in requests(snapshot, 'cameras'):
+        request = main.RecommendationRequest(category='cameras', criteria=criteria, store=list(snapshots), limit=limit,
+                                             offset=offset, min_results=min_results)
+        main.build_store_recommendations(snapshots, 'cameras', criteria, request)
+    assert all(trace['stores'] == ['hcm', 'hanoi'] and len(trace['model_stores']) == len(trace['models']) for trace in traces)
+    assert {store for trace in traces for store in trace['model_stores']} == {'hcm', 'hanoi'}
+
+    report = replay(list(traces), {'hcm': snapshot.specs_dfs, 'hanoi': second_store.specs_dfs}, check=True)
+    assert report['mismatches'] == 0 and report['skipped'] == 0
+
+    # Đổi catalog của một store thì trang gộp khác vết
+    report = replay(list(traces), {'hcm': second_store.specs_dfs, 'hanoi': snapshot.specs_dfs}, check=True)
+    assert report['mismatches'] > 0
@@ -0,0 +1,107 @@
+"""Ghi vết truy vấn theo mẫu, ghi đĩa ở thread nền.
+
+Request chỉ đặt bản ghi vào một hàng đợi giới hạn (put_nowait, đầy thì bỏ),
+nên đường xử lý request không bao giờ chạm tới đĩa. Thread nền gom bản ghi và
+nối vào file NDJSON nén gzip theo ngày; mỗi lần ghi là một gzip member mới nên
+file chỉ được nối thêm và vẫn đọc liên tục được bằng gzip.open.
+"""
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueryTracer:
+    def __init__(self, directory: str, sample_rate: float = 0.0, queue_size: int = 10000, flush_interval: float = 1.0):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def should_sample(self) -> bool:
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def record(self, trace: Dict[str, Any]):
+        trace.setdefault("ts", time.time())
+        try:
+            self._queue.put_nowait(trace)
+            self.recorded += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _path(self, ts: float) -> str:
+        return os.path.join(self.directory, time.strftime("trace-%Y%m%d.ndjson.gz", time.gmtime(ts)))
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def flush(self):
+        batch = self._drain()
+        if not batch:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        lines = "".join(json.dumps(t, ensure_ascii=False, default=str) + "\n" for t in batch)
+        try:
+            with gzip.open(self._path(batch[0]["ts"]), "at", encoding="utf-8") as f:
+                f.write(lines)
+            self.written += len(batch)
+        except OSError as e:
+            logger.warning("Could not write %d query traces: %s", len(batch), e)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def start(self):
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="query-tracer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "queued": self._queue.qsize(),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "written": self.written,
+            "directory": self.directory,
+        }
+
+
+def read_traces(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)